@@ -1,23 +1,156 @@
 # creppl/__main__.py
 
-import sys
+import argparse
+import os
 
-from creppl.application import Application
 from creppl.ui.prompts import show_header
 from creppl.utils.helpers import verify_compiler
 
 
+def parse_args(argv=None):
+    """
+    Parses the command line arguments.
+
+    Parameters
+    ----------
+    argv: List[str]
+        The arguments, without the program name. Defaults to sys.argv[1:].
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(prog="creppl", description="C++ REPL (Read, Evaluate, Print, Loop)")
+    parser.add_argument("filename", nargs="?", default="main.cpp", help="the name of the session source file")
+    parser.add_argument("--resume", metavar="NAME", nargs="?", const="",
+                        help="resume a saved session, or the most recent one if NAME is omitted")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve sessions over JSON-RPC on stdio, or on --socket, instead of starting the REPL")
+    parser.add_argument("--socket", metavar="PATH", help="the unix socket to serve on with --serve")
+    parser.add_argument("--jobs", metavar="N", type=int, help="the maximum number of concurrent builds with --serve")
+    parser.add_argument("--profile-self", metavar="PATH", nargs="?", const="",
+                        help="profile creppl itself for the session and write a pstats file to PATH, or to "
+                             "~/.creppl/profiles if PATH is omitted")
+    parser.add_argument("--compare-launchers", metavar="RUNS", nargs="?", type=int, const=200,
+                        help="measure the time to start and reap a process with Popen, with posix_spawn and as the "
+                             "session program is run, over RUNS processes each (default 200), and exit")
+    return parser.parse_args(argv)
+
+
+def resume_snapshot(name: str):
+    """
+    Returns the saved session to resume, printing an error if it cannot be resumed.
+
+    Parameters
+    ----------
+    name: str
+        The name of the session file, or an empty string for the most recently saved session
+
+    Returns
+    -------
+    Optional[SessionSnapshot]
+        The snapshot, or None if there is no saved session of that name or its source file is gone
+    """
+
+    from creppl.io import WORKING_DIR
+    from creppl.io.snapshot import SessionSnapshot
+
+    if len(name) == 0:
+        name = SessionSnapshot.latest()
+        if name is None:
+            print("FileNotFoundError: No saved session to resume.")
+            return None
+    snapshot = SessionSnapshot(name)
+    if snapshot.load() is None:
+        print(f'FileNotFoundError: No saved session \"{snapshot.name}\".')
+        return None
+    if not os.path.isfile(f"{WORKING_DIR}/src/{snapshot.name}"):
+        print(f'FileNotFoundError: The source file of session \"{snapshot.name}\" no longer exists.')
+        return None
+    return snapshot
+
+
+def write_profile(profiler):
+    """
+    Writes the profile of a `--profile-self` session and prints its per-command breakdown.
+
+    Parameters
+    ----------
+    profiler: SessionProfiler
+        The profiler of the session
+    """
+
+    if profiler.stop():
+        print(profiler.report())
+        print(f'Profile written to "{profiler.path}"; read it with "python -m pstats" or a flame graph tool.')
+
+
+def print_launchers(runs: int):
+    """
+    Measures and prints the mean time to start, drain and reap a process with each launcher, for
+    `creppl --compare-launchers`.
+
+    Parameters
+    ----------
+    runs: int
+        The number of processes started by each launcher
+    """
+
+    from creppl.proc.process import compare_launchers, format_seconds
+
+    results = compare_launchers(max(1, runs))
+    fastest = min(results.values())
+    for name, seconds in results.items():
+        print(f"{name:<12} {format_seconds(seconds):>10} per process  ({seconds / fastest:.2f}x)")
+
+
 def main():
+    args = parse_args()
+
+    if args.compare_launchers is not None:
+        print_launchers(args.compare_launchers)
+        return
+
     verify_compiler()
 
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
-    else:
-        filename = "main.cpp"
+    if args.serve:
+        from creppl.server.rpc import Server
+
+        server = Server(args.jobs)
+        if args.socket is not None:
+            server.serve_unix(args.socket)
+        else:
+            server.serve_stdio()
+        return
+
+    from creppl.application import Application
+    from creppl.proc.warmup import start_warm_up
+
+    profiler = None
+    if args.profile_self is not None:
+        from creppl.utils.profiler import SessionProfiler
+
+        profiler = SessionProfiler(args.profile_self)
+        profiler.start()
 
     show_header()
-    app = Application(filename)
-    app.run()
+    # Overlaps the overwrite prompt and the start of the session
+    start_warm_up()
+    try:
+        if args.resume is None:
+            app = Application(args.filename, profiler=profiler)
+        else:
+            snapshot = resume_snapshot(args.resume)
+            if snapshot is None:
+                return
+            app = Application(snapshot.name, snapshot.load(), profiler)
+        app.run()
+        app.worker.wait()
+    finally:
+        if profiler is not None:
+            write_profile(profiler)
 
 
 if __name__ == "__main__":
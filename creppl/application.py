@@ -1,14 +1,35 @@
 # creppl/application.py
 
+import hashlib
 import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
 
 from creppl.io import DEFAULT_FILE_CONTENTS, WORKING_DIR
+from creppl.io.completion import Completer
+from creppl.io.headers import HeaderIndex
+from creppl.io.highlight import Highlighter
+from creppl.io.history import History
+from creppl.io.output import OutputTracker
 from creppl.io.terminal import Terminal
-from creppl.ui.prompts import get_input_prompt, overwrite_prompt, get_filename_prompt
+from creppl.io.watch import SourceWatcher
+from creppl.io.snapshot import MAX_HISTORY, SessionSnapshot
+from creppl.proc.build import ArtifactCache, DependencyTracker, OBJECT_DIR, compile_objects, compile_program, \
+    place_file
+from creppl.proc.worker import BuildWorker
+from creppl.proc.workspace import BuildWorkspace
+from creppl.tools.bench import BenchStore, format_report
+from creppl.ui.prompts import get_input_prompt, overwrite_prompt, get_filename_prompt, include_prompt
 from creppl.utils.errors import error_invalid_args
 from creppl.utils.helpers import *
+from creppl.utils.profiler import INPUT_LABEL, command_label
 from creppl.cmd.on_command import *
 
+"""Number of builds and runs kept for $stats"""
+STATS_HISTORY = 100
+
 
 class Application:
     """
@@ -25,15 +46,59 @@ class Application:
     __exec_name: str
         The name of the executable
     __exec_path: str
-        The absolute path of the executable
+        The absolute path of the executable in the build workspace
+    __keep_path: str
+        The absolute path the last executable is copied to when quitting
+    __exec_current: bool
+        Whether the executable in the build workspace was built from the current source
+    __units_lock: threading.Lock
+        Guards units, which the build worker and the watcher thread read
+    __watched_digests: Dict[str, str]
+        The digest of each watched file when $watch last noticed it, so saving a file without changes is ignored
     __filepath: str
         The absolute path of the source file
     __log_filename: str
         The filename of the proc_exec output log (Not common).
+    __stdin_noted: bool
+        Whether the user has been told that the program's standard input is empty
     fileio: FileIO
         Handles all file-related writing, reading, and cursor navigation.
+    completer: Completer
+        Provides Tab completion from the session's headers and source.
+    highlighter: Highlighter
+        Highlights the lines printed by $print color, caching their tokens.
     terminal: Terminal
         The terminal that obtains and handles user input
+    worker: BuildWorker
+        Compiles and runs the program in the background while the prompt stays live.
+    artifacts: ArtifactCache
+        The shared store of built executables, so unchanged source is never recompiled.
+    deps: DependencyTracker
+        The user headers included by the source, which are part of the build key.
+    units: List[str]
+        The absolute paths of the translation units attached with $add, which are linked with the source. Changed
+        on the main thread and copied by the other threads, under __units_lock.
+    objects: ArtifactCache
+        The shared store of the objects compiled from the attached units.
+    workspace: BuildWorkspace
+        The in-memory directory that receives the compiler's temporary files and the executables.
+    headers: HeaderIndex
+        The map from standard library names to their headers, for adding missing includes.
+    auto_include: str
+        Whether missing includes are added ("on"), offered ("ask") or ignored ("off"); set by $autoinclude.
+    output: OutputTracker
+        The output of the last run, so a run only shows what is new; see $out.
+    inputs: Deque[str]
+        The last MAX_HISTORY inputs of the session, saved with its snapshot.
+    stats: Deque[dict]
+        The resource usage of the last STATS_HISTORY builds and runs, shown by $stats.
+    show_time: bool
+        Whether the resource usage is printed after every run; toggled by $time.
+    profiler: SessionProfiler
+        Profiles the session with `creppl --profile-self`; otherwise None.
+    watcher: SourceWatcher
+        Rebuilds the program when the source, its headers or the attached units are saved by another program; started
+        by $watch.
     statement: str
         The input statement the user submits to the program.
 
@@ -43,47 +108,111 @@ class Application:
         Creates directories for the working, bin, and src paths, if they do not already exist.
     __validate_filename__(filename: str)
         Sets the filename and prompts the user for permission to overwrite an already-existing file.
+    __restore__(manifest: dict, history: History)
+        Restores the state of a saved session and reuses its executable if it is up to date.
+    __save_snapshot__()
+        Saves the state of the session, so it can be resumed with `creppl --resume`.
+    __auto_include__(statement: str)
+        Adds the standard headers that the statement needs and the session does not include yet to the preamble.
+    __note_stdin__(statement: str)
+        Tells the user, once per session, that the program's standard input is empty if the statement reads it.
     __append_bracket__()
         Deletes the last closing bracket in the file and appends a new closing bracket on the last line of the file.
+    __compile_units__() -> Tuple[int, bytes, List[Tuple[str, str]]]
+        Compiles the attached translation units to objects in parallel, reusing cached objects. Runs on the build
+        worker.
+    __precompile_units__()
+        Compiles the attached translation units ahead of the next build and prints their diagnostics, if any. Runs on
+        the build worker.
     __compile_and_execute__()
         Responsible for creating the subprocesses to compile and execute the C++ program and prints any output from
-        the subprocess.
+        the subprocess. Runs on the build worker.
+    __record_stats__(compile_usage: ProcessStats, run_usage: ProcessStats, returncode: int)
+        Adds the resource usage of a build and run to the $stats history and, if $time is on, prints it.
+    __run_tool__(tool: Any)
+        Runs an analysis command, such as $asm, $profile or $hot, and prints its report. Runs on the build worker.
+    __benchmark__(benchmark: Benchmark)
+        Builds and runs a $bench benchmark and prints its statistics. Runs on the build worker.
+    __watched_paths__() -> List[str]
+        Returns the files watched by $watch: the source, the user headers it includes and the attached units.
+    __files_changed__(paths: Set[str])
+        Rebuilds and runs the program after watched files were changed by another program. Runs on the watcher
+        thread.
+    __reload_source__()
+        Picks up changes made to the source by another program before the next input is handled.
+    __profile__(label: str)
+        Returns a context manager that accounts a block to label in the session profile, if there is one.
     handle_command(statement: str) -> tuple(str, str)
         Called if and only if the input statement by the user starts with the '$' command symbol, this function
         will strip the command from the statement and forward the statement and command to the appropriate
         'on_command' function to be handled.
     commit()
         Finalizes the statement and write by appends an endline to the statement and writes the statement to the
-        file at the current cursor position and calls the __append_bracket__() and __compile_and_execute__()
-        functions.
+        file at the current cursor position, calls the __append_bracket__() function and submits
+        __compile_and_execute__() to the build worker.
     req_quit()
         Prepares the program for quitting by performing a final write, compilation, and execution of the C++
         program and flags the __should_close variable.
     input(prompt="") -> str
-        Gets the next input from the user accompanied by an optional prompt.
+        Gets the next input from the user accompanied by an optional prompt. Ctrl+C cancels the build or program
+        that is running, if any.
     run()
         The main loop of the program.
     """
 
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, snapshot: dict = None, profiler=None):
         """
         Parameters
         ----------
         filename : str
             The filename to be used for the C++ source and executable.
+        snapshot: dict
+            The manifest of a saved session to resume, as returned by SessionSnapshot.load(). The source file is
+            kept as it is instead of being reset.
+        profiler: SessionProfiler
+            The profiler of the session, with `creppl --profile-self`
         """
 
         self.__should_close = True
         self.__bin_dir = WORKING_DIR + "/bin"
         self.__src_dir = WORKING_DIR + "/src"
         self.__prepare_filesystem__()
-        self.__validate_filename__(filename)
+        if snapshot is None:
+            self.__validate_filename__(filename)
+        else:
+            self.__filepath = self.__src_dir + "/" + filename
         self.__exec_name = filename.strip(".cpp")
-        self.__exec_path = self.__bin_dir + "/" + self.__exec_name
+        self.workspace = BuildWorkspace()
+        self.__exec_path = self.workspace.path(self.__exec_name)
+        self.__keep_path = self.__bin_dir + "/" + self.__exec_name
         self.__log_filename = "crepl-log.txt"
-        self.fileio = FileIO(self.__filepath)
-        self.terminal = Terminal()
+        self.__exec_current = False
+        self.__stdin_noted = False
+        self.fileio = FileIO(self.__filepath, reset=snapshot is None)
+        self.completer = Completer(self.fileio)
+        self.completer.refresh()
+        self.highlighter = Highlighter()
+        history = History(WORKING_DIR + "/history")
+        self.terminal = Terminal(history, self.completer)
+        self.profiler = profiler
+        self.worker = BuildWorker(profiler)
+        self.artifacts = ArtifactCache()
+        self.deps = DependencyTracker()
+        self.units = []
+        self.__units_lock = threading.Lock()
+        self.objects = ArtifactCache(OBJECT_DIR)
+        self.headers = HeaderIndex()
+        self.headers.load()
+        self.auto_include = "on"
+        self.output = OutputTracker()
+        self.inputs = deque(maxlen=MAX_HISTORY)
+        self.stats = deque(maxlen=STATS_HISTORY)
+        self.show_time = False
+        self.watcher = SourceWatcher(self.__watched_paths__, self.__files_changed__)
+        self.__watched_digests = {}
         self.statement = ""
+        if snapshot is not None:
+            self.__restore__(snapshot, history)
 
     def __prepare_filesystem__(self):
         """
@@ -122,6 +251,102 @@ class Application:
                 else:
                     filename = get_filename_prompt()
 
+    def __restore__(self, manifest: dict, history: History):
+        """
+        Restores the cursor, write mode, attached units and input history of a saved session. Its executable is
+        reused if neither the source, the units, the local headers nor the toolchain have changed, so nothing is
+        compiled until the session is edited.
+
+        Parameters
+        ----------
+        manifest: dict
+            The manifest returned by SessionSnapshot.load()
+        history: History
+            The input history of the terminal
+        """
+
+        self.fileio.set_cursor(manifest.get("cursor", self.fileio.get_cursor()))
+        self.fileio.set_write_mode(manifest.get("write_mode"))
+        for unit in manifest.get("units", {}):
+            if os.path.isfile(unit):
+                self.units.append(unit)
+            else:
+                print(f'FileNotFoundError: Attached file \"{unit}\" no longer exists.')
+        self.inputs.extend(manifest.get("history", []))
+        history.restore(self.inputs)
+
+        binary = SessionSnapshot.reusable_binary(manifest, self.__filepath, self.units)
+        headers = self.deps.dependencies(self.__filepath)
+        if binary is not None and all(self.deps.digest(path) == digest for path, digest in headers.items()):
+            place_file(binary, self.__exec_path)
+            self.__exec_current = True
+            print(f"Resumed {self.fileio.filename} at line {self.fileio.get_cursor()}; the last build is up to date.")
+        else:
+            print(f"Resumed {self.fileio.filename} at line {self.fileio.get_cursor()}; it is rebuilt on the next "
+                  f"statement.")
+
+    def __save_snapshot__(self):
+        """
+        Saves the state of the session, so it can be resumed with `creppl --resume`. The executable is only recorded
+        if it was built from the current source.
+        """
+
+        binary = self.__keep_path if self.__exec_current and os.path.exists(self.__keep_path) else None
+        try:
+            SessionSnapshot(self.fileio.filename).save(self.fileio, self.inputs, self.units, binary)
+        except OSError as _ex:
+            print(f'Exception: {_ex}.')
+
+    def __auto_include__(self, statement: str):
+        """
+        Adds the standard headers that the statement needs and the session does not include yet to the preamble,
+        after the last include directive, so the statement does not fail its first compile. Nothing is added until
+        the header index has been built.
+
+        Parameters
+        ----------
+        statement: str
+            The statement about to be committed
+        """
+
+        if self.auto_include == "off":
+            return
+        try:
+            with open(self.fileio.filepath, "r") as file:
+                source = file.read()
+        except OSError:
+            return
+        for name, header in self.headers.missing(statement, source):
+            if self.auto_include == "ask":
+                with self.terminal.suspended():
+                    if not include_prompt(header, name):
+                        continue
+            lines = source.split("\n")
+            line_num = 1 + max((idx + 1 for idx, line in enumerate(lines) if line.lstrip().startswith("#include")),
+                               default=0)
+            self.fileio.insert_line(line_num, f"#include {header}")
+            lines.insert(line_num - 1, f"#include {header}")
+            source = "\n".join(lines)
+            print(f"\033[2mAdded #include {header} for {name}.\033[0m")
+
+    def __note_stdin__(self, statement: str):
+        """
+        Tells the user, once per session, that the program's standard input is empty if the statement reads it.
+
+        The program runs on the build worker while the prompt keeps the terminal, so it reads from /dev/null and
+        std::cin is at end of file from the start.
+
+        Parameters
+        ----------
+        statement: str
+            The statement about to be committed
+        """
+
+        if not self.__stdin_noted and reads_stdin(statement):
+            self.__stdin_noted = True
+            print("\033[2mThe program runs in the background with an empty standard input, so std::cin and scanf() "
+                  "read end of file.\033[0m")
+
     def __append_bracket__(self):
         """
         Deletes the last closing bracket in the file and appends a new closing bracket on the last line of the file.
@@ -136,45 +361,82 @@ class Application:
         self.fileio.write(closing_bracket, "a+")
         self.fileio.set_cursor(file_cursor)
 
+    def __compile_units__(self):
+        """
+        Compiles the attached translation units to objects in parallel, reusing cached objects. Runs on the build
+        worker.
+
+        Returns
+        -------
+        Tuple[int, bytes, List[Tuple[str, str]]]
+            The first non-zero exit code of the compiler, or 0, its diagnostics, and the path and build key of each
+            object
+        """
+
+        directory = self.workspace.path("objects")
+        os.makedirs(directory, exist_ok=True)
+        with self.__units_lock:
+            units = list(self.units)
+        # Units with the same name in different directories get different objects
+        units = [(unit, f"{directory}/{hashlib.sha1(unit.encode()).hexdigest()[:12]}-"
+                        f"{os.path.splitext(os.path.basename(unit))[0]}.o") for unit in units]
+        return compile_objects(self.worker.run, units, self.objects, workspace=self.workspace, deps=self.deps)
+
+    def __precompile_units__(self):
+        """
+        Compiles the attached translation units ahead of the next build and prints their diagnostics, if any. Runs on
+        the build worker.
+        """
+
+        try:
+            _, stderr, _ = self.__compile_units__()
+        except OSError as e:
+            self.terminal.write_output(f'ChildProcessError: {e.strerror}.\n')
+            return
+        if len(stderr) > 0:
+            self.terminal.write_output(stderr.decode(errors="replace") + "\n")
+
     def __compile_and_execute__(self):
         """
         Responsible for creating the subprocesses to compile and execute the C++ program and prints any output from
         the subprocess.
 
+        This runs on the build worker, so output is written above the prompt through the terminal. If the build is
+        superseded by a newer commit or cancelled with Ctrl+C, its processes are killed and nothing is printed.
+
         Any errors or miscellaneous output that occur are written to the output log.
         """
 
         from datetime import datetime
 
-        # def __set_cpp_version__():
-        #     """
-        #     -std=c++11
-        #     -std=c++14
-        #     -std=c++17
-        #     -std=c++20
-        #     -std=c++23
-        #     """
-        #     pass
-
-        __STD_CPP__ = 17
-
         try:
-            output = proc_exec(["g++", f"-std=c++{__STD_CPP__}", "-o", self.__exec_path,
-                                self.fileio.filepath]).communicate()
-        except ChildProcessError as e:
-            print(f'ChildProcessError: {e.strerror}.')
+            self.__exec_current = False
+            returncode, stderr, objects = self.__compile_units__()
+            if returncode != 0:
+                self.terminal.write_output(stderr.decode(errors="replace") + "\n")
+                self.__record_stats__(self.worker.usage(), None, None)
+                return
+            if len(stderr) > 0:
+                self.terminal.write_output(stderr.decode(errors="replace"))
+            build = compile_program(self.worker.run, self.fileio.filepath, self.__exec_path, self.artifacts,
+                                    workspace=self.workspace, deps=self.deps, objects=objects)
+            output = build[1:3]
+            compile_usage = None if build[3] else self.worker.usage()
+        except OSError as e:
+            self.terminal.write_output(f'ChildProcessError: {e.strerror}.\n')
             return
         else:
             timestamp = datetime.timestamp(datetime.now())
             datetime = str(datetime.fromtimestamp(timestamp))
             if len(output[1].decode()) > 0:
                 err = output[1].decode()
-                print(err)
+                self.terminal.write_output(err + "\n")
+                self.__record_stats__(compile_usage, None, None)
                 with open(WORKING_DIR + self.__log_filename, "a+") as file:
                     try:
                         file.write(datetime + " [Error]: " + output[0].decode())
                     except Exception as _ex:
-                        print(f'Exception: {_ex}.')
+                        self.terminal.write_output(f'Exception: {_ex}.\n')
                         return
             else:
                 if len(output[0]) > 0:
@@ -182,11 +444,129 @@ class Application:
                         try:
                             file.write(datetime + " [Output]: " + output[0].decode())
                         except Exception as _ex:
-                            print(f'Exception: {_ex}.')
+                            self.terminal.write_output(f'Exception: {_ex}.\n')
                             return
 
-                output = proc_exec(f"/.{self.__exec_path}")
-                print(output.stdout.read().decode())
+                self.__exec_current = True
+                output = self.worker.run([f"/.{self.__exec_path}"], measure=True)
+                shown = self.output.render(output[1].decode(errors="replace"))
+                if len(shown) > 0:
+                    self.terminal.write_output(shown)
+                self.__record_stats__(compile_usage, self.worker.usage(), output[0])
+
+    def __record_stats__(self, compile_usage, run_usage, returncode):
+        """
+        Adds the resource usage of a build and run to the $stats history and, if $time is on, prints it.
+
+        Parameters
+        ----------
+        compile_usage: ProcessStats
+            The resources used by the compiler, or None if the executable came from the cache
+        run_usage: ProcessStats
+            The resources used by the program, or None if it was not run
+        returncode: int
+            The exit code of the program, or None if it was not run
+        """
+
+        self.stats.append({"time": time.time(), "line": self.fileio.get_cursor(), "returncode": returncode,
+                           "compile": compile_usage.to_dict() if compile_usage is not None else None,
+                           "run": run_usage.to_dict() if run_usage is not None else None})
+        if self.show_time:
+            compile_str = "cached" if compile_usage is None else compile_usage.summary()
+            status = f"compile: {compile_str}"
+            if run_usage is not None:
+                status += f"\n    run: {run_usage.summary()}"
+            self.terminal.write_output(f"\033[2m{status}\033[0m\n")
+
+    def __benchmark__(self, benchmark):
+        """
+        Builds and runs a benchmark, prints its statistics with the change from the previous benchmark of this session
+        and stores the result. Runs on the build worker.
+
+        Parameters
+        ----------
+        benchmark: Benchmark
+            The benchmark returned by on_command_bench()
+        """
+
+        self.terminal.write_output(f"Benchmarking {benchmark.label[:60]} ...\n")
+        try:
+            result = benchmark.run(self.worker.run, self.workspace, self.artifacts)
+        except (OSError, RuntimeError) as _ex:
+            self.terminal.write_output(f"{type(_ex).__name__}: {_ex}\n")
+            return
+        store = BenchStore(self.fileio.filename)
+        baseline = store.last()
+        store.add(result)
+        self.terminal.write_output(format_report(result, baseline) + "\n")
+
+    def __run_tool__(self, tool):
+        """
+        Runs an analysis command and prints its report. Runs on the build worker.
+
+        Parameters
+        ----------
+        tool: Any
+            An object with a run(run: Callable, workspace: BuildWorkspace) -> str method, e.g. Disassembly
+        """
+
+        try:
+            report = tool.run(self.worker.run, self.workspace)
+        except (OSError, RuntimeError) as _ex:
+            self.terminal.write_output(f"{type(_ex).__name__}: {_ex}\n")
+            return
+        self.terminal.write_output(report + "\n")
+
+    def __watched_paths__(self):
+        """
+        Returns the files watched by $watch: the source, the user headers it included at its last successful build
+        and the attached units.
+        """
+
+        with self.__units_lock:
+            units = list(self.units)
+        return [self.fileio.filepath, *self.deps.dependencies(self.fileio.filepath), *units]
+
+    def __files_changed__(self, paths):
+        """
+        Rebuilds and runs the program after watched files were changed by another program. Runs on the watcher
+        thread.
+
+        The file is only read here: the line index and cursor are updated by __reload_source__() on the main thread,
+        and nothing is written to the file, so the changes are never overwritten. The build reuses the cached
+        executable and objects if the contents did not actually change.
+
+        Parameters
+        ----------
+        paths: Set[str]
+            The absolute paths of the files that changed
+        """
+
+        changed = []
+        for path in paths:
+            digest = self.deps.digest(path)
+            if self.__watched_digests.get(path) == digest:
+                # Saved without changes, e.g. touched
+                continue
+            self.__watched_digests[path] = digest
+            # The file is also written by creppl itself; those writes are already in the line index
+            if path != self.fileio.filepath or self.fileio.changed_on_disk():
+                changed.append(path)
+        if len(changed) == 0:
+            return
+        names = ", ".join(sorted(os.path.basename(path) for path in changed))
+        self.terminal.write_output(f"\033[2m{names} changed on disk; rebuilding ...\033[0m\n")
+        self.worker.submit(self.__compile_and_execute__)
+
+    def __reload_source__(self):
+        """
+        Picks up changes made to the source by another program, so the next statement is written into the new
+        contents at the same line of code instead of overwriting them.
+        """
+
+        if self.fileio.reload():
+            print(f"\033[2m{self.fileio.filename} changed on disk; the cursor is on line "
+                  f"{self.fileio.get_cursor()}.\033[0m")
 
     def handle_command(self, statement: str):
         """
@@ -234,6 +614,22 @@ class Application:
                     line_cursor = self.fileio.get_cursor()
                     self.__append_bracket__()
                     self.fileio.set_cursor(line_cursor)
+            elif cmd == Command.ADD:
+                with self.__units_lock:
+                    added = on_command_add(self.fileio, self.units, statement, kwargs)
+                if added:
+                    self.worker.submit(self.__precompile_units__)
+                statement = None
+            elif cmd == Command.REMOVE:
+                with self.__units_lock:
+                    on_command_remove(self.units, statement, kwargs)
+                statement = None
+            elif cmd == Command.DEPS:
+                if has_args(statement, kwargs):
+                    error_invalid_args(statement, kwargs)
+                    statement = None
+                else:
+                    on_command_deps(self.fileio, self.deps)
             elif cmd in (Command.INSERT, Command.REPLACE):
                 on_command_set_write_mode(self.fileio, cmd, statement, kwargs)
                 if statement is None:
@@ -248,23 +644,78 @@ class Application:
             elif cmd == Command.GOTO:
                 on_command_goto(self.fileio, statement, kwargs)
             elif cmd == Command.PRINT:
+                on_command_print(self.fileio, statement, kwargs, self.highlighter, self.terminal.page)
+                statement = None
+            elif cmd == Command.CTIME:
                 if has_args(statement, kwargs):
                     error_invalid_args(statement, kwargs)
                     statement = None
                 else:
-                    on_command_print(self.fileio)
+                    self.worker.submit(self.__run_tool__, on_command_ctime(self.fileio))
+            elif cmd == Command.HOT:
+                if has_args(statement, kwargs):
+                    error_invalid_args(statement, kwargs)
+                    statement = None
+                else:
+                    self.worker.submit(self.__run_tool__, on_command_hot(self.fileio))
             elif cmd == Command.RESET:
                 if has_args(statement, kwargs):
                     error_invalid_args(statement, kwargs)
                     statement = None
                 else:
                     on_command_reset(self.fileio, DEFAULT_FILE_CONTENTS)
+            elif cmd == Command.ASM:
+                disassembly = on_command_asm(self.fileio, statement, kwargs)
+                if disassembly is not None:
+                    self.worker.submit(self.__run_tool__, disassembly)
+                statement = None
+            elif cmd == Command.PROFILE:
+                profile = on_command_profile(self.fileio, statement, kwargs)
+                if profile is not None:
+                    self.worker.submit(self.__run_tool__, profile)
+                statement = None
+            elif cmd == Command.MATRIX:
+                matrix = on_command_matrix(self.fileio, self.units, statement, kwargs)
+                if matrix is not None:
+                    self.terminal.write_output(f"Building {len(matrix.cells)} combinations ...\n")
+                    self.worker.submit(self.__run_tool__, matrix)
+                statement = None
+            elif cmd == Command.BENCH:
+                benchmark = on_command_bench(self.fileio, statement, kwargs)
+                if benchmark is not None:
+                    self.worker.submit(self.__benchmark__, benchmark)
+                statement = None
+            elif cmd == Command.TIME:
+                show_time = on_command_time(self.show_time, statement, kwargs)
+                if show_time is not None:
+                    self.show_time = show_time
+                statement = None
+            elif cmd == Command.OUT:
+                on_command_out(self.output, statement, kwargs)
+                statement = None
+            elif cmd == Command.AUTOINCLUDE:
+                auto_include = on_command_autoinclude(self.auto_include, statement, kwargs)
+                if auto_include is not None:
+                    self.auto_include = auto_include
+                statement = None
+            elif cmd == Command.STATS:
+                on_command_stats(list(self.stats), statement, kwargs)
+                statement = None
+            elif cmd == Command.WATCH:
+                watching = on_command_watch(self.watcher.watching(), statement, kwargs)
+                if watching:
+                    self.watcher.start()
+                elif watching is not None:
+                    self.watcher.stop()
+                statement = None
             elif cmd == Command.HELP:
                 if has_args(statement, kwargs):
                     error_invalid_args(statement, kwargs)
                     statement = None
                 else:
-                    if on_command_help() is None:
+                    with self.terminal.suspended():
+                        help_result = on_command_help()
+                    if help_result is None:
                         self.req_quit()
             elif cmd == Command.QUIT:
                 if has_args(statement, kwargs):
@@ -279,7 +730,8 @@ class Application:
     def commit(self):
         """
         Finalizes the statement and write by appends an endline to the statement and writes the statement to the file
-        at the current cursor position and calls the __append_bracket__() and __compile_and_execute__() functions.
+        at the current cursor position, calls the __append_bracket__() function and submits __compile_and_execute__()
+        to the build worker, superseding any build that is still running.
         """
 
         self.statement += '\n'
@@ -287,24 +739,44 @@ class Application:
         self.statement = ""
 
         self.__append_bracket__()
-        self.__compile_and_execute__()
+        self.worker.submit(self.__compile_and_execute__)
 
     def req_quit(self):
         """
         Prepares the program for quitting by performing a final write, compilation, and execution of the C++ program
-        and flags the __should_close variable.
+        and flags the __should_close variable. The final executable is copied from the build workspace to the bin
+        directory.
+
+        The terminal is returned to its original state while waiting, so Ctrl+C can still cancel the final run.
         """
 
+        self.watcher.stop()
+        self.__reload_source__()
         self.statement = ""
         self.commit()
+        with self.terminal.suspended():
+            try:
+                self.worker.wait()
+            except KeyboardInterrupt:
+                self.worker.cancel()
+        self.workspace.keep(self.__exec_name, self.__keep_path)
+        self.__save_snapshot__()
         print("")
         self.__should_close = True
 
+    def __profile__(self, label: str):
+        """
+        Returns a context manager that accounts a block to label in the session profile, if there is one.
+        """
+
+        return self.profiler.command(label) if self.profiler is not None else nullcontext()
+
     def input(self, prompt=""):
         """
         Gets the next input from the user accompanied by an optional prompt.
 
-        If a KeyboardInterrupt exception is caught, req_quit() is called.
+        If a KeyboardInterrupt exception is caught while a build or program is running, only that build or program is
+        cancelled. Otherwise, or if the input stream is closed, req_quit() is called.
         Parameter
         ---------
         prompt: str
@@ -313,28 +785,49 @@ class Application:
         Returns
         -------
         str
-            A string containing user input
+            A string containing user input, or None if no input was entered
         """
 
         try:
             input_str = next(self.terminal.input(prompt))
             return input_str
         except KeyboardInterrupt:
+            if self.worker.cancel():
+                print("Cancelled.")
+            else:
+                self.req_quit()
+        except EOFError:
             self.req_quit()
 
     def run(self):
         """
         The main loop of the program.
+
+        The terminal stays in raw mode for the whole loop and is released when the loop exits, even on error.
         """
 
         self.__should_close = False
-        while not self.__should_close:
-            prompt = get_input_prompt(self.fileio.get_cursor())
-            self.statement = self.input(prompt)
-            if self.__should_close:
-                break
-            if self.statement.startswith("$"):
-                self.statement, error = self.handle_command(self.statement)
-                if self.__should_close or self.statement is None or error:
+        try:
+            while not self.__should_close:
+                prompt = get_input_prompt(self.fileio.get_cursor())
+                with self.__profile__(INPUT_LABEL):
+                    self.statement = self.input(prompt)
+                if self.__should_close:
+                    break
+                if self.statement is None:
                     continue
-            self.commit()
+                if len(self.statement) > 0:
+                    self.inputs.append(self.statement)
+                self.__reload_source__()
+                with self.__profile__(command_label(self.statement)):
+                    if self.statement.startswith("$"):
+                        self.statement, error = self.handle_command(self.statement)
+                        if self.__should_close or self.statement is None or error:
+                            continue
+                    self.__auto_include__(self.statement)
+                    self.__note_stdin__(self.statement)
+                    self.commit()
+        finally:
+            self.watcher.stop()
+            self.worker.cancel()
+            self.terminal.release()
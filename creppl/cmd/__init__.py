@@ -7,12 +7,26 @@ class Command(enum.auto):
     """
     Global Terminal commands accessed by the program
     """
+    ADD = "add"
+    ASM = "asm"
+    AUTOINCLUDE = "autoinclude"
+    BENCH = "bench"
     DEL = "del"
+    DEPS = "deps"
     GOTO = "goto"
     HELP = "help"
     CLS = "cls"
+    CTIME = "ctime"
+    HOT = "hot"
     INSERT = "ins"
+    MATRIX = "matrix"
+    OUT = "out"
     PRINT = "print"
+    PROFILE = "profile"
     QUIT = "quit"
+    REMOVE = "remove"
     REPLACE = "rep"
     RESET = "reset"
+    STATS = "stats"
+    TIME = "time"
+    WATCH = "watch"
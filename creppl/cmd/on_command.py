@@ -1,16 +1,133 @@
 # creppl/cmd/on_command.py
 
+import os
 import sys
 
 from creppl.cmd import Command
 from creppl.io.fileio import FileIO
 from creppl.ui.prompts import show_header
-from creppl.utils.helpers import file_reset
+from creppl.utils.helpers import file_reset, split_command_args
 
 """Minimum number of arguments required for commands"""
 MIN_KWARGS = 2
 
 
+"""Number of lines shown above and below the cursor by $print around"""
+AROUND_LINES = 10
+
+"""Width of the line number column of $print"""
+GUTTER_WIDTH = 4
+
+
+"""Extensions of the C++ sources that $add accepts"""
+SOURCE_EXTENSIONS = (".cpp", ".cc", ".cxx", ".c++", ".C")
+
+
+def on_command_add(fileio: FileIO, units, statement, kwargs):
+    """
+    Attaches translation units to the session, or lists them if no file is given. Each unit is compiled to its own
+    object and linked with the file.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object reference
+    units: List[str]
+        The absolute paths of the attached units, which is modified in place
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args}); args are the paths of the files, relative to the
+        current directory or to the directory of the file
+
+    Returns
+    -------
+    bool
+        True if a unit was added
+    """
+
+    paths = split_command_args(statement, kwargs)
+    if len(paths) == 0:
+        if len(units) == 0:
+            print("No translation units attached. Use $add file.cpp to attach one.")
+        for unit in units:
+            print(f"  {unit}")
+        return False
+
+    added = False
+    for path in paths:
+        path = os.path.expanduser(path)
+        if not os.path.isabs(path) and not os.path.exists(path):
+            path = os.path.join(os.path.dirname(fileio.filepath), path)
+        path = os.path.abspath(path)
+        if not path.endswith(SOURCE_EXTENSIONS):
+            print(f'InvalidArgumentError: "{path}" is not a C++ source file.')
+        elif not os.path.isfile(path):
+            print(f'FileNotFoundError: No such file: "{path}".')
+        elif path == os.path.abspath(fileio.filepath):
+            print(f'InvalidArgumentError: "{path}" is the session file.')
+        elif path in units:
+            print(f"{os.path.basename(path)} is already attached.")
+        else:
+            units.append(path)
+            added = True
+            print(f"Attached {path}.")
+    return added
+
+
+def on_command_ctime(fileio: FileIO):
+    """
+    Prepares a report of where the compiler spends its time on the session.
+
+    The report is built by the caller, normally on the build worker.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object reference
+
+    Returns
+    -------
+    CompileTimeReport
+        The report
+    """
+
+    from creppl.tools.ctime import CompileTimeReport
+
+    with open(fileio.filepath, "r") as file:
+        return CompileTimeReport(file.read(), os.path.dirname(fileio.filepath))
+
+
+def on_command_deps(fileio: FileIO, deps):
+    """
+    Prints the user headers included by the file, as recorded by its last successful build, and whether each has
+    changed since.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object reference
+    deps: DependencyTracker
+        The dependency tracker of the session
+    """
+
+    from datetime import datetime
+
+    recorded = deps.dependencies(fileio.filepath)
+    if len(recorded) == 0:
+        print("No tracked dependencies. Headers included with #include \"...\" are tracked after a successful build.")
+        return
+    for path in sorted(recorded):
+        digest = deps.digest(path)
+        if digest == "missing":
+            print(f"  {'missing':<19}  {'':>8}  {path}")
+            continue
+        stat = os.stat(path)
+        modified = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+        status = "" if digest == recorded[path] else "  (changed, rebuilds on next run)"
+        print(f"  {modified}  {stat.st_size:>8}  {path}{status}")
+
+
 def on_command_del(fileio: FileIO, statement, kwargs):
     """
     Deletes the lines from the file indicated by the kwargs.
@@ -62,6 +179,133 @@ def on_command_del(fileio: FileIO, statement, kwargs):
     fileio.set_cursor(line_num)
 
 
+def on_command_asm(fileio: FileIO, statement, kwargs):
+    """
+    Prepares the assembly listing of a function of the session.
+
+    The arguments are an optional function name (default "main") and up to two optimisation levels (default -O2), in
+    any order. With two levels, the listings are compared side by side. The listing is built by the caller, normally
+    on the build worker.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object to reference
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[Disassembly]
+        The listing, or None if the arguments are invalid
+    """
+
+    from creppl.tools import DEFAULT_OPT_LEVEL, OPT_LEVELS
+    from creppl.tools.asm import Disassembly
+
+    function = None
+    opt_levels = []
+    for arg in split_command_args(statement, kwargs):
+        if arg.startswith("-O"):
+            if arg not in OPT_LEVELS:
+                print(f'InvalidArgumentError: Unrecognized argument \"{arg}\" for command \"${kwargs[0]}\". '
+                      f'Optimisation level must be one of: {", ".join(OPT_LEVELS)}.')
+                return None
+            opt_levels.append(arg)
+        elif function is None and arg.replace("::", "").replace("_", "").isalnum():
+            function = arg
+        else:
+            print(f'InvalidArgumentError: Unrecognized argument \"{arg}\" for command \"${kwargs[0]}\". '
+                  f'Arguments must be a function name and up to two optimisation levels.')
+            return None
+    if len(opt_levels) > 2:
+        print(f'InvalidArgumentError: Command \"${kwargs[0]}\" compares at most two optimisation levels.')
+        return None
+
+    with open(fileio.filepath, "r") as file:
+        source = file.read()
+    return Disassembly(source, function or "main", opt_levels or [DEFAULT_OPT_LEVEL])
+
+
+def on_command_autoinclude(mode: str, statement, kwargs):
+    """
+    Sets whether missing standard headers are included automatically, after asking, or not at all.
+
+    Parameters
+    ----------
+    mode: str
+        The current mode, one of AUTOINCLUDE_MODES
+    statement: str
+        The user input statement: "on", "ask", "off", or None to print the current mode
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[str]
+        The new mode, or None if the arguments are invalid
+    """
+
+    from creppl.io.headers import AUTOINCLUDE_MODES
+
+    if kwargs[1] is not None or (statement is not None and statement.strip().lower() not in AUTOINCLUDE_MODES):
+        args = statement if kwargs[1] is None else kwargs[1]
+        print(f'InvalidArgumentError: Unrecognized argument \"{args}\" for command \"${kwargs[0]}\". '
+              f'Argument must be \"on\", \"ask\" or \"off\".')
+        return None
+    if statement is not None:
+        mode = statement.strip().lower()
+    print({"on": "Missing standard headers are included automatically.",
+           "ask": "Missing standard headers are included after asking.",
+           "off": "Missing standard headers are not included."}[mode])
+    return mode
+
+
+def on_command_bench(fileio: FileIO, statement, kwargs):
+    """
+    Prepares a microbenchmark of the statements in the command, or of the body of main() if there are none.
+
+    An optimisation level (e.g. "-O3") may be given before the statements; the default is -O2. The benchmark is
+    built and run by the caller, normally on the build worker.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object to reference
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[Benchmark]
+        The benchmark, or None if the arguments are invalid
+    """
+
+    from creppl.tools import DEFAULT_OPT_LEVEL, OPT_LEVELS
+    from creppl.tools.bench import Benchmark
+
+    args = split_command_args(statement, kwargs, maxsplit=1)
+    opt_level = DEFAULT_OPT_LEVEL
+    if len(args) > 0 and args[0].startswith("-O"):
+        if args[0] not in OPT_LEVELS:
+            print(f'InvalidArgumentError: Unrecognized argument \"{args[0]}\" for command \"${kwargs[0]}\". '
+                  f'Optimisation level must be one of: {", ".join(OPT_LEVELS)}.')
+            return None
+        opt_level = args.pop(0)
+
+    with open(fileio.filepath, "r") as file:
+        source = file.read()
+    benchmark = Benchmark(source, " ".join(args) if len(args) > 0 else None, opt_level)
+    if len(benchmark.label) == 0:
+        print(f'ValueError: Nothing to benchmark. Pass the statements to \"${kwargs[0]}\" or write them in main().')
+        return None
+    return benchmark
+
+
 def on_command_cls():
     """
     Clears the screen of the terminal
@@ -102,20 +346,109 @@ def on_command_goto(fileio: FileIO, statement, kwargs):
     fileio.set_cursor(line_num)
 
 
-def on_command_print(fileio: FileIO):
+def on_command_hot(fileio: FileIO):
     """
-    Prints the contents of the file prepended by a line number.
+    Prepares the execution counts of the lines of the session, to be shown like $print with heat colouring.
 
-    Parameter
-    ---------
+    The program is built and run with coverage by the caller, normally on the build worker.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object reference
+
+    Returns
+    -------
+    Coverage
+        The coverage run
+    """
+
+    from creppl.tools.coverage import Coverage
+
+    with open(fileio.filepath, "r") as file:
+        return Coverage(file.read())
+
+
+def on_command_print(fileio: FileIO, statement=None, kwargs=None, highlighter=None, page=None):
+    """
+    Prints the lines of the file prepended by their line numbers: all of them, the lines n-m, or AROUND_LINES lines
+    above and below the cursor ("around").
+
+    Only the lines that are printed are read, through the line points of the fileio. With "color", the lines are
+    syntax highlighted by the highlighter, which caches the tokens of every line, and the cursor's line number is
+    shown in bold.
+
+    Parameters
+    ----------
     fileio: FileIO
         The FileIO object reference
+    statement: str
+        The user input statement: "around", "color", or both
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args}), where args is "n" or "n-m"
+    highlighter: Highlighter
+        Highlights the lines with "color"
+    page: Callable[[Callable[[int, int, int], List[str]], int, int], None]
+        Shows the lines a screen at a time, e.g. Terminal.page. If None, the lines are printed as they are.
     """
 
-    with open(fileio.filepath, 'r') as file:
-        for count, line in enumerate(file):
-            print(f"{count + 1}".center(4) + f"| {line}", end="")
-        file.close()
+    last = fileio.get_line_count()
+    if last > 1 and len(fileio.get_line(last)) == 0:
+        # The file ends with an endline
+        last -= 1
+    first = 1
+    words = split_command_args(statement, kwargs) if kwargs is not None else []
+    color = "color" in words and highlighter is not None
+    for word in words:
+        if word == "around":
+            first = max(1, fileio.get_cursor() - AROUND_LINES)
+            last = min(last, fileio.get_cursor() + AROUND_LINES)
+        elif word != "color":
+            line_set = word.split("-")
+            if len(line_set) > MIN_KWARGS or not all(arg.isnumeric() for arg in line_set) or int(line_set[0]) < 1:
+                print(f'InvalidArgumentError: Unrecognized argument \"{word}\" for command \"${kwargs[0]}\". '
+                      f'Argument must be a line number n, a range n-m, \"around\" or \"color\".')
+                return
+            start, end = int(line_set[0]), int(line_set[-1])
+            if start > last or end < start:
+                print(f'InvalidArgumentError: Lines \"{word}\" are not in the file, which has {last} lines.')
+                return
+            first, last = start, min(last, end)
+
+    states = {1: False}
+
+    def __comment_open__(line_num: int):
+        """Returns whether a block comment is open at the start of a line, lexing only the lines not seen yet"""
+        known = max(num for num in states if num <= line_num)
+        in_comment = states[known]
+        for num, line in enumerate(fileio.get_lines(known, line_num - 1), known):
+            in_comment = highlighter.tokens(line.expandtabs(4), in_comment)[1]
+            states[num + 1] = in_comment
+        return in_comment
+
+    def __format_lines__(start: int, end: int, width=None):
+        """Returns the lines from start to end prepended by their line numbers, each cut to width characters"""
+        end = min(end, last)
+        lines = []
+        in_comment = __comment_open__(start) if color else False
+        text_width = None if width is None else max(0, width - GUTTER_WIDTH - 2)
+        for line_num, line in enumerate(fileio.get_lines(start, end), start):
+            number = f"{line_num}".center(GUTTER_WIDTH)
+            line = line.expandtabs(4) if color or width is not None else line
+            if color:
+                if line_num == fileio.get_cursor():
+                    number = f"\033[1m{number}\033[0m"
+                line, in_comment = highlighter.render(line, in_comment, text_width)
+                states[line_num + 1] = in_comment
+            elif text_width is not None:
+                line = line[:text_width]
+            lines.append(f"{number}| {line}")
+        return lines
+
+    if page is None:
+        print("\n".join(__format_lines__(first, last)))
+    else:
+        page(__format_lines__, first, last)
 
 
 def on_command_help():
@@ -128,8 +461,6 @@ def on_command_help():
         None if a KeyboardInterrupt was detected. Otherwise, not None
     """
 
-    from creppl.io.terminal import KeyCode
-
     __MAX_LINE_LENGTH__ = 80
 
     def __print_description__(__s, col=0, max_len=__MAX_LINE_LENGTH__):
@@ -150,7 +481,7 @@ def on_command_help():
         length = 0
         idx = 0
         while idx < len(__s):
-            if __s[idx] == chr(KeyCode.ESC):
+            if __s[idx] == "\033":
                 idx = __find_first_alpha__(__s, idx + 1)
             else:
                 length += 1
@@ -180,8 +511,15 @@ def on_command_help():
     print()
 
     __print_description__(
-        "\033[6GAt this time, creppl uses GNU GCC with C++ 17 to compile and execute the program. The ability to "
-        "change the compiler and/or standard C++ library may be an added feature in a future release.\n", 6,
+        "\033[6GThe session is compiled and executed with GNU GCC and C++ 17. To try it with other C++ standards, "
+        "compilers such as clang++, or optimisation levels, use $matrix, which builds and runs every combination "
+        "side by side.\n", 6,
+        __MAX_LINE_LENGTH__ + 25)
+    print()
+
+    __print_description__(
+        "\033[6GThe program is compiled and run in the background, so the prompt stays live while it runs. It has "
+        "no terminal to read from: its standard input is empty, and std::cin reads end of file.\n", 6,
         __MAX_LINE_LENGTH__ + 25)
     print()
 
@@ -221,11 +559,125 @@ def on_command_help():
     __print_description__(cmd_cls_body, 25)
 
     # $print
-    cmd_print_title = "\033[6G\033[1m$print\033[0m"
-    cmd_print_body = "\033[25GPrint the contents of the file."
+    cmd_print_title = "\033[6G\033[1m$print\033[0m \033[1m\033[3mn-m\033[0m|\033[1m\033[3maround\033[0m " \
+                      "\033[1m\033[3mcolor\033[0m"
+    cmd_print_body = "\033[25GPrint the contents of the file, the lines n-m*, or the lines around the cursor " \
+                     "(around), with syntax highlighting if color is given. Output taller than the screen is shown a page at a " \
+                     "time: Space and b page, Up and Down scroll, q quits."
     print(cmd_print_title, end="")
     __print_description__(cmd_print_body, 25)
 
+    # $out
+    cmd_out_title = "\033[6G\033[1m$out\033[0m \033[1m\033[3mnew\033[0m|\033[1m\033[3mfull\033[0m"
+    cmd_out_body = "\033[25GPrint the whole output of the last run. By default, a run only shows the output that is " \
+                   "new since the previous run, or the lines that changed; $out full shows the whole output of every " \
+                   "run and $out new goes back to the default."
+    print(cmd_out_title, end="")
+    __print_description__(cmd_out_body, 25)
+
+    # $autoinclude
+    cmd_autoinclude_title = "\033[6G\033[1m$autoinclude\033[0m \033[1m\033[3mon\033[0m|\033[1m\033[3mask\033[0m|" \
+                            "\033[1m\033[3moff\033[0m"
+    cmd_autoinclude_body = "\033[25GBefore a statement is compiled, add the standard headers it needs that are not " \
+                           "included yet, e.g. <vector> for std::vector (on, the default), ask first (ask), or " \
+                           "never (off)."
+    print(cmd_autoinclude_title, end="")
+    __print_description__(cmd_autoinclude_body, 25)
+
+    # $bench
+    cmd_bench_title = "\033[6G\033[1m$bench\033[0m \033[1m\033[3m-On\033[0m \033[1m\033[3mcode\033[0m"
+    cmd_bench_body = "\033[25GBenchmark \033[3mcode\033[0m, or the body of main() if \033[3mcode\033[0m is " \
+                     "omitted, at optimisation level \033[3m-On\033[0m (default -O2). The body of main() runs once " \
+                     "first as setup. Use DoNotOptimize(\033[3mvalue\033[0m) to keep results alive. Prints the mean," \
+                     " median, 99th percentile and standard deviation per iteration, and the change from the " \
+                     "previous $bench."
+    print(cmd_bench_title, end="")
+    __print_description__(cmd_bench_body, 25)
+
+    # $asm
+    cmd_asm_title = "\033[6G\033[1m$asm\033[0m \033[1m\033[3mf\033[0m \033[1m\033[3m-On\033[0m " \
+                    "\033[1m\033[3m-Om\033[0m"
+    cmd_asm_body = "\033[25GPrint the assembly of function \033[3mf\033[0m (default main) at optimisation level " \
+                   "\033[3m-On\033[0m (default -O2), without directives and unused labels. With a second level " \
+                   "\033[3m-Om\033[0m, the two listings are shown side by side."
+    print(cmd_asm_title, end="")
+    __print_description__(cmd_asm_body, 25)
+
+    # $profile
+    cmd_profile_title = "\033[6G\033[1m$profile\033[0m \033[1m\033[3mn\033[0m \033[1m\033[3m-On\033[0m"
+    cmd_profile_body = "\033[25GBuild the program with gprof instrumentation at optimisation level " \
+                       "\033[3m-On\033[0m (default -O2), run it, and print the \033[3mn\033[0m functions " \
+                       "(default 10) that take the most time, with the line that defines them, their callers and " \
+                       "callees, and the hottest lines. Programs that run for less than 10 ms have call counts only."
+    print(cmd_profile_title, end="")
+    __print_description__(cmd_profile_body, 25)
+
+    # $matrix
+    cmd_matrix_title = "\033[6G\033[1m$matrix\033[0m \033[1m\033[3mstd\033[0m \033[1m\033[3mcompiler\033[0m " \
+                       "\033[1m\033[3m-On\033[0m"
+    cmd_matrix_body = "\033[25GBuild and run the program in parallel with every combination of the given standards " \
+                      "(e.g. c++14 c++20), compilers (g++, clang++) and optimisation levels, and print their " \
+                      "compile times, run times, exit codes and outputs side by side, with compile errors. Without " \
+                      "arguments, every standard from C++11 to C++23 is built with every installed compiler at -O2."
+    print(cmd_matrix_title, end="")
+    __print_description__(cmd_matrix_body, 25)
+
+    # $ctime
+    cmd_ctime_title = "\033[6G\033[1m$ctime\033[0m"
+    cmd_ctime_body = "\033[25GCompile the file with timing and print where the compiler spends its time: by " \
+                     "phase, by pass and by included header, with suggestions for the costliest includes."
+    print(cmd_ctime_title, end="")
+    __print_description__(cmd_ctime_body, 25)
+
+    # $deps
+    cmd_deps_title = "\033[6G\033[1m$deps\033[0m"
+    cmd_deps_body = "\033[25GList the local headers the file includes. A change to any of them causes a rebuild."
+    print(cmd_deps_title, end="")
+    __print_description__(cmd_deps_body, 25)
+
+    # $time
+    cmd_time_title = "\033[6G\033[1m$time\033[0m \033[1m\033[3mon\033[0m|\033[1m\033[3moff\033[0m"
+    cmd_time_body = "\033[25GShow the wall time and CPU time of the compiler and the program, and the peak memory " \
+                    "and page faults of the program, after every run."
+    print(cmd_time_title, end="")
+    __print_description__(cmd_time_body, 25)
+
+    # $watch
+    cmd_watch_title = "\033[6G\033[1m$watch\033[0m \033[1m\033[3mon\033[0m|\033[1m\033[3moff\033[0m"
+    cmd_watch_body = "\033[25GRebuild and run the program whenever the file, a header it includes or an attached " \
+                     "file is saved in another editor. The changes are picked up before the next statement is " \
+                     "written, so they are never overwritten."
+    print(cmd_watch_title, end="")
+    __print_description__(cmd_watch_body, 25)
+
+    # $stats
+    cmd_stats_title = "\033[6G\033[1m$stats\033[0m \033[1m\033[3mn\033[0m"
+    cmd_stats_body = "\033[25GPrint the resource usage of the last \033[3mn\033[0m runs (default 10)."
+    print(cmd_stats_title, end="")
+    __print_description__(cmd_stats_body, 25)
+
+    # $hot
+    cmd_hot_title = "\033[6G\033[1m$hot\033[0m"
+    cmd_hot_body = "\033[25GRun the program with coverage and print the contents of the file with the number of " \
+                   "times each line was executed. The hottest lines are coloured red; lines that never ran are " \
+                   "marked #####."
+    print(cmd_hot_title, end="")
+    __print_description__(cmd_hot_body, 25)
+
+    # $add
+    cmd_add_title = "\033[6G\033[1m$add\033[0m \033[1m\033[3mfile\033[0m"
+    cmd_add_body = "\033[25GAttach the C++ source \033[3mfile\033[0m to the session, or list the attached files " \
+                   "if \033[3mfile\033[0m is omitted. Attached files are compiled in parallel to objects that are " \
+                   "cached, so a change to the session only relinks them."
+    print(cmd_add_title, end="")
+    __print_description__(cmd_add_body, 25)
+
+    # $remove
+    cmd_remove_title = "\033[6G\033[1m$remove\033[0m \033[1m\033[3mfile\033[0m"
+    cmd_remove_body = "\033[25GDetach \033[3mfile\033[0m from the session."
+    print(cmd_remove_title, end="")
+    __print_description__(cmd_remove_body, 25)
+
     # $quit
     cmd_quit_title = "\033[6G\033[1m$quit\033[0m"
     cmd_quit_body = "\033[25GQuit the program."
@@ -240,10 +692,144 @@ def on_command_help():
         return None
 
 
+def on_command_matrix(fileio: FileIO, units, statement, kwargs):
+    """
+    Prepares a build matrix of the session program.
+
+    The arguments are any number of language standards (e.g. "c++20", "-std=c++20" or "20"), compilers and
+    optimisation levels, in any order. The matrix is built and run by the caller, normally on the build worker.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object to reference
+    units: List[str]
+        The absolute paths of the attached translation units
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[Matrix]
+        The matrix, or None if the arguments are invalid
+    """
+
+    import shutil
+
+    from creppl.tools import OPT_LEVELS
+    from creppl.tools.matrix import COMPILERS, MAX_CELLS, STANDARDS, Matrix, default_matrix
+
+    standards, compilers, opt_levels = [], [], []
+    for arg in split_command_args(statement, kwargs):
+        standard = arg[len("-std="):] if arg.startswith("-std=") else arg
+        standard = "c++" + standard if standard.isdigit() else standard
+        if standard in STANDARDS:
+            if standard not in standards:
+                standards.append(standard)
+        elif arg in COMPILERS:
+            if shutil.which(arg) is None:
+                print(f'FileNotFoundError: The compiler "{arg}" is not installed.')
+                return None
+            if arg not in compilers:
+                compilers.append(arg)
+        elif arg in OPT_LEVELS:
+            if arg not in opt_levels:
+                opt_levels.append(arg)
+        else:
+            print(f'InvalidArgumentError: Unrecognized argument "{arg}" for command "${kwargs[0]}". '
+                  f'Arguments must be standards ({", ".join(STANDARDS)}), compilers ({", ".join(COMPILERS)}) and '
+                  f'optimisation levels ({", ".join(OPT_LEVELS)}).')
+            return None
+
+    standards, compilers, opt_levels = default_matrix(standards, compilers, opt_levels)
+    cells = len(standards) * len(compilers) * len(opt_levels)
+    if cells > MAX_CELLS:
+        print(f'InvalidArgumentError: The matrix has {cells} builds; "${kwargs[0]}" builds at most {MAX_CELLS}.')
+        return None
+    with open(fileio.filepath, "r") as file:
+        source = file.read()
+    return Matrix(source, os.path.dirname(fileio.filepath), units, standards, compilers, opt_levels)
+
+
+def on_command_out(output, statement, kwargs):
+    """
+    Prints the whole output of the last run, or sets whether runs show only their new output or all of it.
+
+    Parameters
+    ----------
+    output: OutputTracker
+        The output of the last run and the output mode
+    statement: str
+        The user input statement: "new", "full", or None to print the whole output of the last run
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+    """
+
+    from creppl.io.output import OUTPUT_MODES
+
+    if kwargs[1] is not None or (statement is not None and statement.strip().lower() not in OUTPUT_MODES):
+        args = statement if kwargs[1] is None else kwargs[1]
+        print(f'InvalidArgumentError: Unrecognized argument \"{args}\" for command \"${kwargs[0]}\". '
+              f'Argument must be \"new\" or \"full\".')
+        return
+    if statement is None:
+        print(output.last if len(output.last) > 0 else "No output yet.")
+        return
+    output.mode = statement.strip().lower()
+    print("Every run shows its whole output." if output.mode == "full" else
+          "Runs show only the output that is new since the previous run.")
+
+
+def on_command_profile(fileio: FileIO, statement, kwargs):
+    """
+    Prepares a gprof profile of the session program.
+
+    The arguments are an optional number of functions to report (default 10) and an optimisation level (default -O2),
+    in any order. The profile is built and run by the caller, normally on the build worker.
+
+    Parameters
+    ----------
+    fileio: FileIO
+        The FileIO object to reference
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[Profile]
+        The profile, or None if the arguments are invalid
+    """
+
+    from creppl.tools import DEFAULT_OPT_LEVEL, OPT_LEVELS
+    from creppl.tools.profile import DEFAULT_TOP, Profile
+
+    top = DEFAULT_TOP
+    opt_level = DEFAULT_OPT_LEVEL
+    for arg in split_command_args(statement, kwargs):
+        if arg.isnumeric() and int(arg) > 0:
+            top = int(arg)
+        elif arg in OPT_LEVELS:
+            opt_level = arg
+        else:
+            print(f'InvalidArgumentError: Unrecognized argument \"{arg}\" for command \"${kwargs[0]}\". '
+                  f'Arguments must be the number of functions to report and an optimisation level.')
+            return None
+
+    with open(fileio.filepath, "r") as file:
+        source = file.read()
+    return Profile(source, top, opt_level)
+
+
 def on_command_quit(fileio: FileIO):
     """
     Appends a '\n' to the file
 
+    The line points of the fileio are updated, so the write is not taken for a change made by another program.
+
     Parameter
     ---------
     fileio: FileIO
@@ -255,6 +841,139 @@ def on_command_quit(fileio: FileIO):
             file.write("\n}")
         except Exception as _ex:
             print(f'Exception: {_ex}.')
+    fileio.update()
+
+
+def on_command_stats(history, statement, kwargs):
+    """
+    Prints the resource usage of the most recent builds and runs, oldest first.
+
+    Parameters
+    ----------
+    history: List[dict]
+        The recorded builds and runs, oldest first, as recorded by the Application
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args}); args is the number of entries to print (default 10)
+    """
+
+    from creppl.proc.process import format_seconds, format_size
+
+    if statement is not None or (kwargs[1] is not None and not kwargs[1].isnumeric()):
+        args = statement if kwargs[1] is None else kwargs[1]
+        print(f'InvalidArgumentError: Unrecognized argument \"{args}\" for command \"${kwargs[0]}\". '
+              f'Argument must be the number of entries to print.')
+        return
+    count = int(kwargs[1]) if kwargs[1] is not None else 10
+    if len(history) == 0 or count == 0:
+        print("No runs recorded yet.")
+        return
+
+    print(f"{'line':>5} {'compile':>9} {'run wall':>9} {'user':>9} {'sys':>9} {'max rss':>10} {'faults':>11} "
+          f"{'exit':>5}")
+    for entry in history[-count:]:
+        build, run = entry["compile"], entry["run"]
+        compile_str = format_seconds(build["wall"]) if build is not None else "cached"
+        if run is None:
+            print(f"{entry['line']:>5} {compile_str:>9} {'-':>9}")
+            continue
+        measured = run["max_rss"] is not None
+        rss = format_size(run["max_rss"]) if measured else "-"
+        faults = f"{run['minor_faults']}/{run['major_faults']}" if measured else "-"
+        print(f"{entry['line']:>5} {compile_str:>9} {format_seconds(run['wall']):>9} {format_seconds(run['user']):>9} "
+              f"{format_seconds(run['sys']):>9} {rss:>10} {faults:>11} "
+              f"{entry['returncode']:>5}")
+
+
+def on_command_time(enabled: bool, statement, kwargs):
+    """
+    Turns the resource usage line printed after every run on or off.
+
+    Parameters
+    ----------
+    enabled: bool
+        Whether the line is currently printed
+    statement: str
+        The user input statement: "on", "off", or None to print the current setting
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[bool]
+        The new setting, or None if the arguments are invalid
+    """
+
+    if kwargs[1] is not None or (statement is not None and statement.strip().lower() not in ("on", "off")):
+        args = statement if kwargs[1] is None else kwargs[1]
+        print(f'InvalidArgumentError: Unrecognized argument \"{args}\" for command \"${kwargs[0]}\". '
+              f'Argument must be \"on\" or \"off\".')
+        return None
+    if statement is not None:
+        enabled = statement.strip().lower() == "on"
+    print(f"Resource usage is {'on' if enabled else 'off'}.")
+    return enabled
+
+
+def on_command_watch(watching: bool, statement, kwargs):
+    """
+    Turns watch mode on or off. In watch mode, the program is rebuilt and run whenever the source file, a header it
+    includes or an attached unit is saved by another program, such as an editor.
+
+    Parameters
+    ----------
+    watching: bool
+        Whether watch mode is currently on
+    statement: str
+        The user input statement: "on", "off", or None to print the current setting
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+
+    Returns
+    -------
+    Optional[bool]
+        The new setting, or None if the arguments are invalid
+    """
+
+    if kwargs[1] is not None or (statement is not None and statement.strip().lower() not in ("on", "off")):
+        args = statement if kwargs[1] is None else kwargs[1]
+        print(f'InvalidArgumentError: Unrecognized argument \"{args}\" for command \"${kwargs[0]}\". '
+              f'Argument must be \"on\" or \"off\".')
+        return None
+    if statement is not None:
+        watching = statement.strip().lower() == "on"
+    print(f"Watch mode is {'on' if watching else 'off'}.")
+    return watching
+
+
+def on_command_remove(units, statement, kwargs):
+    """
+    Detaches translation units from the session.
+
+    Parameters
+    ----------
+    units: List[str]
+        The absolute paths of the attached units, which is modified in place
+    statement: str
+        The user input statement
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args}); args are the paths or filenames of the units
+    """
+
+    paths = split_command_args(statement, kwargs)
+    if len(paths) == 0:
+        print(f'InvalidArgumentError: Missing argument for command "${kwargs[0]}". Argument must be the file to '
+              f'remove.')
+        return
+    for path in paths:
+        matches = [unit for unit in units
+                   if unit == os.path.abspath(os.path.expanduser(path)) or os.path.basename(unit) == path]
+        if len(matches) == 0:
+            print(f'InvalidArgumentError: "{path}" is not attached.')
+        for unit in matches:
+            units.remove(unit)
+            print(f"Detached {unit}.")
 
 
 def on_command_set_write_mode(fileio: FileIO, mode: Command, statement, kwargs):
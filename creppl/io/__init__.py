@@ -1,10 +1,13 @@
 # creppl/io/__init__.py
 
-from creppl.proc import process
+import os
+import pwd
 
 """Global variables to be accessed by the program"""
 
-USER = process.proc_exec('whoami').stdout.read().decode().strip('\n')
+USER = pwd.getpwuid(os.geteuid()).pw_name
 WORKING_DIR = f"/home/{USER}/.creppl"
 DEFAULT_FILENAME = "main.cpp"
 DEFAULT_FILE_CONTENTS = "#include <iostream>\n\nint main() {\n\n}\n"
+COMPILER = "g++"
+CPP_STANDARD = 17
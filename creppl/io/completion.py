@@ -0,0 +1,301 @@
+# creppl/io/completion.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from creppl.io import COMPILER, CPP_STANDARD, WORKING_DIR
+from creppl.io.fileio import FileIO
+from creppl.proc.process import proc_exec
+from creppl.utils.helpers import toolchain_id
+
+"""Directory of the on-disk symbol indexes"""
+CACHE_DIR = WORKING_DIR + "/cache"
+
+"""C++ keywords offered for unqualified completion"""
+KEYWORDS = (
+    "alignas", "alignof", "auto", "bool", "break", "case", "catch", "char", "class", "const", "constexpr", "continue",
+    "decltype", "default", "delete", "do", "double", "else", "enum", "explicit", "extern", "false", "float", "for",
+    "friend", "if", "inline", "int", "long", "mutable", "namespace", "new", "noexcept", "nullptr", "operator",
+    "private", "protected", "public", "return", "short", "signed", "sizeof", "static", "static_assert", "static_cast",
+    "struct", "switch", "template", "this", "throw", "true", "try", "typedef", "typename", "union", "unsigned", "using",
+    "virtual", "void", "volatile", "while",
+)
+
+_LITERAL = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+_INCLUDE = re.compile(r'^\s*#\s*include\s*([<"][^>"]+[>"])', re.MULTILINE)
+_TOKEN = re.compile(r"[A-Za-z_]\w*|[{}]")
+_IDENT = re.compile(r"\b[A-Za-z_]\w*\b")
+_WORD_BEFORE = re.compile(r"((?:[A-Za-z_]\w*::)*)([A-Za-z_]\w*)?$")
+
+
+def parse_includes(source: str):
+    """
+    Returns the include directives of a C++ source, in order.
+
+    Parameters
+    ----------
+    source: str
+        The C++ source
+
+    Returns
+    -------
+    Tuple[str]
+        The bracketed or quoted header names, e.g. ('<iostream>', '"util.h"')
+    """
+
+    return tuple(_INCLUDE.findall(source))
+
+
+def scan_namespaces(text: str):
+    """
+    Collects the public identifiers declared in a preprocessed translation unit, grouped by top-level namespace.
+
+    Identifiers that start with an underscore are reserved for the implementation and are skipped. Linkage
+    specifications such as 'extern "C++" {' do not open a scope, so the names a namespace inside one declares,
+    including those it brings in with using-declarations such as 'using ::abs;', are recorded under the namespace.
+
+    Parameters
+    ----------
+    text: str
+        The preprocessor output
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        Sorted identifiers keyed by namespace name, with "" for the global namespace
+    """
+
+    scopes: Dict[str, set] = {"": set()}
+    # Each open brace records the top-level namespace it belongs to and whether it opens a linkage specification
+    stack: List[Tuple[str, bool]] = []
+    pending_namespace = None
+    expect_name = False
+    current = ""
+    previous = None
+
+    for token in _TOKEN.findall(_LITERAL.sub(" ", text)):
+        if token == "{":
+            linkage = previous == "extern"
+            top_level = all(entry[1] for entry in stack)
+            if pending_namespace is not None and top_level:
+                current = pending_namespace
+            elif pending_namespace is not None:
+                current = stack[-1][0]
+            stack.append((current, linkage))
+            pending_namespace = None
+            expect_name = False
+        elif token == "}":
+            if stack:
+                stack.pop()
+            current = stack[-1][0] if stack else ""
+        elif token == "namespace":
+            expect_name = True
+            pending_namespace = current
+        elif expect_name:
+            expect_name = False
+            if all(entry[1] for entry in stack):
+                pending_namespace = token
+        elif token[0] != "_":
+            scopes.setdefault(current, set()).add(token)
+        previous = token
+
+    return {scope: sorted(names) for scope, names in scopes.items()}
+
+
+class Completer:
+    """
+    Completes identifiers for the Terminal from the session's headers and source.
+
+    Header symbols come from the preprocessed output of the session's include directives. The index is built once per
+    include set and toolchain, in a background thread, and is stored in ~/.creppl/cache and memoised, so candidates()
+    only ever does lookups and never runs the compiler. Until the index for the current include set is available,
+    completion falls back to the keywords and the identifiers of the session source.
+
+    Attributes
+    ----------
+    __fileio: FileIO
+        The session file to take identifiers and includes from.
+    __flags: List[str]
+        The compiler flags the headers are preprocessed with.
+    __indexes: Dict[Tuple[Tuple[str], Tuple[str]], Dict[str, List[str]]]
+        The memoised header indexes, keyed by flags and include set. They are shared by every Completer in the
+        process.
+    __building: set
+        The keys of the indexes being built.
+    __session: Tuple[Tuple[int, int], List[str], Tuple[str], bool]
+        The file stat the session was read at, its sorted identifiers, its includes and whether it is 'using namespace
+        std'.
+    __lock: threading.Lock
+        Guards __indexes and __building.
+
+    Methods
+    -------
+    cache_key(includes: Tuple[str]) -> str
+        Returns the cache key of the header index for an include set.
+    refresh()
+        Builds the header index for the current include set in the background, if needed.
+    candidates(line: str, index: int) -> Tuple[int, List[str]]
+        Returns the completions of the word before index.
+    """
+
+    __indexes: Dict[Tuple[Tuple[str], Tuple[str]], Dict[str, List[str]]] = {}
+    __building = set()
+    __lock = threading.Lock()
+
+    def __init__(self, fileio: FileIO, flags=None):
+        """
+        Parameters
+        ----------
+        fileio: FileIO
+            The session file
+        flags: List[str]
+            The compiler flags used to preprocess the headers
+        """
+
+        self.__fileio = fileio
+        self.__flags = list(flags) if flags is not None else [f"-std=c++{CPP_STANDARD}"]
+        self.__session = (None, [], (), False)
+
+    def __read_session__(self):
+        """
+        Returns the identifiers, includes and 'using namespace std' flag of the session source, re-reading it only when
+        it has changed.
+        """
+
+        try:
+            stat = os.stat(self.__fileio.filepath)
+        except OSError:
+            return [], (), False
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self.__session[0] != key:
+            with open(self.__fileio.filepath, "r", errors="replace") as file:
+                source = file.read()
+            self.__session = (key, sorted(set(_IDENT.findall(source))), parse_includes(source),
+                              "using namespace std" in source)
+        return self.__session[1:]
+
+    def cache_key(self, includes: Tuple[str]):
+        """
+        Returns the cache key of the header index for an include set.
+
+        Parameters
+        ----------
+        includes: Tuple[str]
+            The include directives
+
+        Returns
+        -------
+        str
+            A hex digest of the toolchain, flags and sorted includes
+        """
+
+        data = "\n".join([toolchain_id(COMPILER)] + self.__flags + sorted(includes))
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def __build__(self, includes: Tuple[str]):
+        """
+        Loads the header index from disk, or builds and stores it.
+        """
+
+        path = f"{CACHE_DIR}/symbols-{self.cache_key(includes)}.json"
+        index = None
+        try:
+            with open(path, "r") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+        if index is None:
+            source = "".join(f"#include {include}\n" for include in includes)
+            cwd = os.path.dirname(self.__fileio.filepath) or None
+            try:
+                proc = proc_exec([COMPILER, *self.__flags, "-E", "-P", "-x", "c++", "-"], stdin=True, cwd=cwd)
+                output = proc.communicate(source.encode())[0].decode(errors="replace")
+            except OSError:
+                output = ""
+            index = scan_namespaces(output)
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}"
+                with open(tmp_path, "w") as file:
+                    json.dump(index, file)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+        with self.__lock:
+            memo = (tuple(self.__flags), includes)
+            self.__indexes[memo] = index
+            self.__building.discard(memo)
+
+    def refresh(self):
+        """
+        Builds the header index for the current include set in the background, if needed.
+
+        Returns
+        -------
+        Optional[Dict[str, List[str]]]
+            The header index, if it is already available
+        """
+
+        includes = tuple(sorted(set(self.__read_session__()[1])))
+        memo = (tuple(self.__flags), includes)
+        with self.__lock:
+            index = self.__indexes.get(memo)
+            if index is not None or memo in self.__building:
+                return index
+            self.__building.add(memo)
+        threading.Thread(target=self.__build__, args=(includes,), name="creppl-symbols", daemon=True).start()
+        return None
+
+    def candidates(self, line: str, index: int):
+        """
+        Returns the completions of the word before index.
+
+        A word qualified with 'ns::' is completed from the names declared in namespace ns. After '.' or '->' any known
+        name is offered; otherwise keywords, global names and the session identifiers are.
+
+        Parameters
+        ----------
+        line: str
+            The input line
+        index: int
+            The cursor position in line
+
+        Returns
+        -------
+        Tuple[int, List[str]]
+            The position where the completed word starts and the sorted candidates
+        """
+
+        head = line[:index]
+        match = _WORD_BEFORE.search(head)
+        qualifier = match.group(1).split("::")[0] if match.group(1) else None
+        prefix = match.group(2) or ""
+        start = match.start(2) if match.group(2) else index
+        if len(prefix) == 0 and qualifier is None:
+            return start, []
+
+        session, _, using_std = self.__read_session__()
+        headers = self.refresh() or {}
+        before = head[:match.start()].rstrip()
+
+        if qualifier is not None:
+            pools = [headers.get(qualifier, [])]
+        elif before.endswith(".") or before.endswith("->"):
+            pools = [session] + list(headers.values())
+        else:
+            pools = [sorted(KEYWORDS), headers.get("", []), headers.get("std", []) if using_std else [], session]
+
+        found = set()
+        for pool in pools:
+            pos = bisect_left(pool, prefix)
+            while pos < len(pool) and pool[pos].startswith(prefix):
+                found.add(pool[pos])
+                pos += 1
+        return start, sorted(found)
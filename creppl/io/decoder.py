@@ -0,0 +1,295 @@
+# creppl/io/decoder.py
+
+import codecs
+
+
+class Key:
+    """
+    Names of the non-printable keys reported by KeyDecoder
+    """
+    ENTER = "enter"
+    BKSP = "backspace"
+    DEL = "delete"
+    TAB = "tab"
+    ESC = "escape"
+    SIGINT = "sigint"
+    EOF = "eof"
+    CLS = "clear"
+    SEARCH = "search"
+    CANCEL = "cancel"
+    UP = "up"
+    DOWN = "down"
+    RIGHT = "right"
+    LEFT = "left"
+    HOME = "home"
+    END = "end"
+    INSERT = "insert"
+    PAGE_UP = "page-up"
+    PAGE_DOWN = "page-down"
+    KILL_END = "kill-end"
+    KILL_START = "kill-start"
+    KILL_WORD = "kill-word"
+    YANK = "yank"
+    TEXT = "text"
+    PASTE = "paste"
+
+
+class KeyEvent:
+    """
+    A single decoded key press or a run of text.
+
+    Attributes
+    ----------
+    key: str
+        One of the Key names
+    text: str
+        The text of a Key.TEXT or Key.PASTE event, otherwise an empty string
+    ctrl: bool
+        True if the key was modified with Ctrl
+    alt: bool
+        True if the key was modified with Alt/Meta
+    """
+
+    __slots__ = ("key", "text", "ctrl", "alt")
+
+    def __init__(self, key: str, text="", ctrl=False, alt=False):
+        self.key = key
+        self.text = text
+        self.ctrl = ctrl
+        self.alt = alt
+
+    def __eq__(self, other):
+        return isinstance(other, KeyEvent) and (self.key, self.text, self.ctrl, self.alt) == (
+            other.key, other.text, other.ctrl, other.alt)
+
+    def __repr__(self):
+        return f"KeyEvent({self.key!r}, {self.text!r}, ctrl={self.ctrl}, alt={self.alt})"
+
+
+"""C0 control characters and the keys they map to"""
+CONTROL_KEYS = {
+    "\r": Key.ENTER,
+    "\n": Key.ENTER,
+    "\x7f": Key.BKSP,
+    "\x08": Key.BKSP,
+    "\t": Key.TAB,
+    "\x03": Key.SIGINT,
+    "\x04": Key.EOF,
+    "\x0c": Key.CLS,
+    "\x12": Key.SEARCH,
+    "\x07": Key.CANCEL,
+    "\x01": Key.HOME,
+    "\x05": Key.END,
+    "\x02": Key.LEFT,
+    "\x06": Key.RIGHT,
+    "\x0b": Key.KILL_END,
+    "\x15": Key.KILL_START,
+    "\x17": Key.KILL_WORD,
+    "\x19": Key.YANK,
+}
+
+"""Final bytes of 'CSI [params] final' and 'SS3 final' sequences"""
+FINAL_KEYS = {
+    "A": Key.UP,
+    "B": Key.DOWN,
+    "C": Key.RIGHT,
+    "D": Key.LEFT,
+    "H": Key.HOME,
+    "F": Key.END,
+}
+
+"""Numeric parameters of 'CSI n ~' sequences"""
+TILDE_KEYS = {
+    "1": Key.HOME,
+    "2": Key.INSERT,
+    "3": Key.DEL,
+    "4": Key.END,
+    "5": Key.PAGE_UP,
+    "6": Key.PAGE_DOWN,
+    "7": Key.HOME,
+    "8": Key.END,
+}
+
+"""Bracketed paste delimiters"""
+PASTE_BEGIN = "200"
+PASTE_END = "\033[201~"
+
+# Decoder states
+_GROUND = 0
+_ESC = 1
+_CSI = 2
+_SS3 = 3
+_PASTE = 4
+
+
+class KeyDecoder:
+    """
+    A state machine that turns raw terminal input into KeyEvents.
+
+    Bytes are fed in whole chunks, as returned by os.read(). UTF-8 is decoded incrementally, so a multibyte character
+    may be split across chunks. CSI ('ESC [') and SS3 ('ESC O') sequences are looked up in FINAL_KEYS and TILDE_KEYS,
+    and an xterm modifier parameter (e.g. 'ESC [1;5C') sets the ctrl/alt flags. Text between the bracketed paste
+    delimiters is reported as a single Key.PASTE event, and consecutive printable characters are merged into a single
+    Key.TEXT event.
+
+    Attributes
+    ----------
+    __utf8: IncrementalDecoder
+        Decodes the incoming bytes
+    __state: int
+        The current state of the machine
+    __seq: List[str]
+        The characters of the escape sequence or paste being collected
+
+    Methods
+    -------
+    feed(data: bytes) -> List[KeyEvent]
+        Decodes a chunk of input.
+    flush() -> List[KeyEvent]
+        Resolves an incomplete escape sequence once no more input is pending.
+    pending() -> bool
+        Returns whether an escape sequence is waiting for more input.
+    """
+
+    def __init__(self):
+        self.__utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.__state = _GROUND
+        self.__seq = []
+
+    def pending(self):
+        """
+        Returns whether an escape sequence is waiting for more input.
+
+        Returns
+        -------
+        bool
+            True if the decoder is inside an escape sequence, otherwise False
+        """
+
+        return self.__state in (_ESC, _CSI, _SS3)
+
+    def flush(self):
+        """
+        Resolves an incomplete escape sequence once no more input is pending.
+
+        A lone ESC is reported as Key.ESC; an unfinished CSI or SS3 sequence is dropped.
+
+        Returns
+        -------
+        List[KeyEvent]
+            The resolved events
+        """
+
+        events = []
+        if self.__state == _ESC:
+            events.append(KeyEvent(Key.ESC))
+        if self.__state != _PASTE:
+            self.__state = _GROUND
+            self.__seq = []
+        return events
+
+    def feed(self, data: bytes):
+        """
+        Decodes a chunk of input.
+
+        Parameters
+        ----------
+        data: bytes
+            The raw bytes read from the terminal
+
+        Returns
+        -------
+        List[KeyEvent]
+            The events completed by this chunk, in order
+        """
+
+        events = []
+        text = []
+
+        def flush_text():
+            if text:
+                events.append(KeyEvent(Key.TEXT, "".join(text)))
+                text.clear()
+
+        for char in self.__utf8.decode(data):
+            state = self.__state
+            if state == _GROUND:
+                if char == "\033":
+                    flush_text()
+                    self.__state = _ESC
+                elif char in CONTROL_KEYS:
+                    flush_text()
+                    events.append(KeyEvent(CONTROL_KEYS[char]))
+                elif char.isprintable():
+                    text.append(char)
+            elif state == _ESC:
+                if char == "[":
+                    self.__state = _CSI
+                elif char == "O":
+                    self.__state = _SS3
+                elif char == "\033":
+                    events.append(KeyEvent(Key.ESC))
+                else:
+                    self.__state = _GROUND
+                    if char in CONTROL_KEYS:
+                        events.append(KeyEvent(CONTROL_KEYS[char], alt=True))
+                    else:
+                        events.append(KeyEvent(Key.TEXT, char, alt=True))
+            elif state == _CSI:
+                if "\x30" <= char <= "\x3f":
+                    self.__seq.append(char)
+                else:
+                    self.__state = _GROUND
+                    params = "".join(self.__seq)
+                    self.__seq = []
+                    if char == "~" and params == PASTE_BEGIN:
+                        self.__state = _PASTE
+                    else:
+                        event = self.__decode_csi__(params, char)
+                        if event is not None:
+                            events.append(event)
+            elif state == _SS3:
+                self.__state = _GROUND
+                if char in FINAL_KEYS:
+                    events.append(KeyEvent(FINAL_KEYS[char]))
+            else:
+                self.__seq.append(char)
+                if char == "~" and "".join(self.__seq[-len(PASTE_END):]) == PASTE_END:
+                    paste = "".join(self.__seq[:-len(PASTE_END)])
+                    self.__seq = []
+                    self.__state = _GROUND
+                    events.append(KeyEvent(Key.PASTE, paste.replace("\r\n", "\n").replace("\r", "\n")))
+
+        flush_text()
+        return events
+
+    @staticmethod
+    def __decode_csi__(params: str, final: str):
+        """
+        Looks up a complete CSI sequence.
+
+        Parameters
+        ----------
+        params: str
+            The parameter bytes, e.g. "1;5" or "3"
+        final: str
+            The final byte, e.g. "C" or "~"
+
+        Returns
+        -------
+        Optional[KeyEvent]
+            The event, or None if the sequence is not a known key
+        """
+
+        fields = params.split(";")
+        modifier = 0
+        if len(fields) > 1 and fields[1].isdigit():
+            modifier = int(fields[1]) - 1
+
+        if final == "~":
+            key = TILDE_KEYS.get(fields[0])
+        else:
+            key = FINAL_KEYS.get(final)
+        if key is None:
+            return None
+        return KeyEvent(key, ctrl=bool(modifier & 4), alt=bool(modifier & 2))
@@ -0,0 +1,718 @@
+# creppl/io/editor.py
+
+from bisect import bisect_right
+from typing import List
+
+
+def is_word_char(char: str):
+    """
+    Returns whether char is part of a word for word motion and deletion: a letter, a digit or an underscore.
+
+    Parameters
+    ----------
+    char: str
+        A single character
+
+    Returns
+    -------
+    bool
+        True if char is a word character, otherwise False
+    """
+
+    return char.isalnum() or char == "_"
+
+
+class GapBuffer:
+    """
+    A text buffer with a gap at the cursor.
+
+    The characters are kept in a list with an unused region, the gap, at the cursor. Inserting or deleting at the
+    cursor only moves the edges of the gap, so it takes constant amortised time however long the text is; moving the
+    cursor costs the distance moved. The gap is doubled when it runs out.
+
+    Attributes
+    ----------
+    __MIN_GAP__: int
+        The smallest gap allocated when the buffer grows
+    __chars: List[str]
+        The characters, with the gap between __start and __end
+    __start: int
+        The index of the first character of the gap, which is the cursor position
+    __end: int
+        The index of the first character after the gap
+
+    Methods
+    -------
+    cursor() -> int
+        Returns the cursor position.
+    move(position: int)
+        Moves the cursor, and the gap with it.
+    insert(text: str)
+        Inserts text at the cursor and moves the cursor after it.
+    delete_before(count: int) -> str
+        Deletes up to count characters before the cursor and returns them.
+    delete_after(count: int) -> str
+        Deletes up to count characters after the cursor and returns them.
+    char(index: int) -> str
+        Returns the character at index.
+    slice(start: int, end: int) -> str
+        Returns the text between two positions.
+    text() -> str
+        Returns the whole text.
+    """
+
+    __MIN_GAP__ = 64
+
+    def __init__(self, text=""):
+        """
+        Parameters
+        ----------
+        text: str
+            The initial text. The cursor is placed at its end.
+        """
+
+        self.__chars: List[str] = list(text) + [""] * self.__MIN_GAP__
+        self.__start = len(text)
+        self.__end = len(self.__chars)
+
+    def __len__(self):
+        return len(self.__chars) - (self.__end - self.__start)
+
+    def cursor(self):
+        """
+        Returns the cursor position.
+
+        Returns
+        -------
+        int
+            The number of characters before the cursor
+        """
+
+        return self.__start
+
+    def move(self, position: int):
+        """
+        Moves the cursor, and the gap with it. The position is clamped to the text.
+
+        Parameters
+        ----------
+        position: int
+            The new cursor position
+        """
+
+        position = max(0, min(len(self), position))
+        chars = self.__chars
+        if position < self.__start:
+            count = self.__start - position
+            chars[self.__end - count:self.__end] = chars[position:self.__start]
+            self.__start -= count
+            self.__end -= count
+        elif position > self.__start:
+            count = position - self.__start
+            chars[self.__start:self.__start + count] = chars[self.__end:self.__end + count]
+            self.__start += count
+            self.__end += count
+
+    def __grow__(self, needed: int):
+        """
+        Widens the gap to at least needed characters.
+        """
+
+        size = max(needed, len(self), self.__MIN_GAP__)
+        self.__chars[self.__end:self.__end] = [""] * size
+        self.__end += size
+
+    def insert(self, text: str):
+        """
+        Inserts text at the cursor and moves the cursor after it.
+
+        Parameters
+        ----------
+        text: str
+            The text to insert
+        """
+
+        if self.__end - self.__start < len(text):
+            self.__grow__(len(text))
+        self.__chars[self.__start:self.__start + len(text)] = text
+        self.__start += len(text)
+
+    def delete_before(self, count: int):
+        """
+        Deletes up to count characters before the cursor and returns them.
+
+        Parameters
+        ----------
+        count: int
+            The number of characters
+
+        Returns
+        -------
+        str
+            The deleted text
+        """
+
+        count = min(count, self.__start)
+        deleted = "".join(self.__chars[self.__start - count:self.__start])
+        self.__start -= count
+        return deleted
+
+    def delete_after(self, count: int):
+        """
+        Deletes up to count characters after the cursor and returns them.
+
+        Parameters
+        ----------
+        count: int
+            The number of characters
+
+        Returns
+        -------
+        str
+            The deleted text
+        """
+
+        count = min(count, len(self.__chars) - self.__end)
+        deleted = "".join(self.__chars[self.__end:self.__end + count])
+        self.__end += count
+        return deleted
+
+    def char(self, index: int):
+        """
+        Returns the character at index.
+
+        Parameters
+        ----------
+        index: int
+            The position of the character in the text
+
+        Returns
+        -------
+        str
+            The character, or an empty string if index is out of range
+        """
+
+        if index < 0 or index >= len(self):
+            return ""
+        return self.__chars[index] if index < self.__start else self.__chars[index + self.__end - self.__start]
+
+    def slice(self, start: int, end: int):
+        """
+        Returns the text between two positions.
+
+        Parameters
+        ----------
+        start: int
+            The position of the first character
+        end: int
+            The position after the last character
+
+        Returns
+        -------
+        str
+            The text
+        """
+
+        start, end = max(0, start), min(len(self), end)
+        if start >= end:
+            return ""
+        gap = self.__end - self.__start
+        if end <= self.__start:
+            return "".join(self.__chars[start:end])
+        if start >= self.__start:
+            return "".join(self.__chars[start + gap:end + gap])
+        return "".join(self.__chars[start:self.__start]) + "".join(self.__chars[self.__end:end + gap])
+
+    def text(self):
+        """
+        Returns the whole text.
+
+        Returns
+        -------
+        str
+            The text
+        """
+
+        return self.slice(0, len(self))
+
+
+class LineEditor:
+    """
+    The editing core of the Terminal's input line, on a GapBuffer.
+
+    The text may span several lines. Besides insertion and deletion, the editor supports word-wise motion and deletion,
+    motion to the start and end of a line and between lines, and a kill buffer: text deleted by the kill operations
+    can be yanked back, and consecutive kills are joined. The editor records the lowest position changed since the
+    last call to take_dirty(), so a display only redraws from there.
+
+    Attributes
+    ----------
+    __buffer: GapBuffer
+        The text
+    __line_starts: List[int]
+        The position of the first character of each line, in order
+    __dirty: Optional[int]
+        The lowest position changed since the last take_dirty(), or None
+    __kill: str
+        The text of the last kills
+    __killing: bool
+        True if the last operation was a kill, so the next kill is joined to it
+
+    Methods
+    -------
+    text() -> str
+        Returns the text.
+    cursor() -> int
+        Returns the cursor position.
+    set(text: str, cursor: int)
+        Replaces the text.
+    slice(start: int, end: int) -> str
+        Returns part of the text.
+    insert(text: str)
+        Inserts text at the cursor.
+    replace(start: int, end: int, text: str)
+        Replaces the text between two positions.
+    backspace()
+        Deletes the character before the cursor.
+    delete()
+        Deletes the character at the cursor.
+    move(position: int)
+        Moves the cursor.
+    left(), right()
+        Moves the cursor by one character.
+    word_left(), word_right()
+        Moves the cursor to the start of the previous word or the end of the next word.
+    home(), end()
+        Moves the cursor to the start or end of its line.
+    up() -> bool, down() -> bool
+        Moves the cursor to the line above or below, keeping its column where possible.
+    kill_start(), kill_end()
+        Deletes from the start of the line to the cursor, or from the cursor to the end of the line.
+    kill_word_back(), kill_word_forward()
+        Deletes the word before or after the cursor.
+    yank()
+        Inserts the killed text at the cursor.
+    line_count() -> int
+        Returns the number of lines.
+    line_start(line: int) -> int
+        Returns the position of the first character of a line.
+    line_length(line: int) -> int
+        Returns the number of characters of a line.
+    position(index: int) -> Tuple[int, int]
+        Returns the line and column of a position.
+    take_dirty() -> Optional[int]
+        Returns the lowest position changed since the last call and resets it.
+    """
+
+    def __init__(self, text=""):
+        """
+        Parameters
+        ----------
+        text: str
+            The initial text. The cursor is placed at its end.
+        """
+
+        self.__buffer = GapBuffer()
+        self.__line_starts = [0]
+        self.__dirty = None
+        self.__kill = ""
+        self.__killing = False
+        self.insert(text)
+
+    def __len__(self):
+        return len(self.__buffer)
+
+    def __mark__(self, position: int):
+        self.__dirty = position if self.__dirty is None else min(self.__dirty, position)
+
+    def __inserted__(self, position: int, text: str):
+        """
+        Updates the line starts after text was inserted at position.
+        """
+
+        starts = self.__line_starts
+        idx = bisect_right(starts, position)
+        for pos in range(idx, len(starts)):
+            starts[pos] += len(text)
+        if "\n" in text:
+            new = [position + offset + 1 for offset, char in enumerate(text) if char == "\n"]
+            starts[idx:idx] = new
+
+    def __deleted__(self, start: int, end: int):
+        """
+        Updates the line starts after the text between start and end was deleted.
+        """
+
+        starts = self.__line_starts
+        first = bisect_right(starts, start)
+        last = bisect_right(starts, end)
+        del starts[first:last]
+        for pos in range(first, len(starts)):
+            starts[pos] -= end - start
+
+    def text(self):
+        """
+        Returns the text.
+
+        Returns
+        -------
+        str
+            The text
+        """
+
+        return self.__buffer.text()
+
+    def cursor(self):
+        """
+        Returns the cursor position.
+
+        Returns
+        -------
+        int
+            The number of characters before the cursor
+        """
+
+        return self.__buffer.cursor()
+
+    def slice(self, start: int, end: int):
+        """
+        Returns part of the text.
+
+        Parameters
+        ----------
+        start: int
+            The position of the first character
+        end: int
+            The position after the last character
+
+        Returns
+        -------
+        str
+            The text
+        """
+
+        return self.__buffer.slice(start, end)
+
+    def set(self, text: str, cursor=None):
+        """
+        Replaces the text.
+
+        Parameters
+        ----------
+        text: str
+            The new text
+        cursor: int
+            The new cursor position, or None for the end of the text
+        """
+
+        self.__buffer = GapBuffer()
+        self.__line_starts = [0]
+        self.insert(text)
+        self.__dirty = 0
+        if cursor is not None:
+            self.move(cursor)
+
+    def insert(self, text: str):
+        """
+        Inserts text at the cursor and moves the cursor after it.
+
+        Parameters
+        ----------
+        text: str
+            The text to insert
+        """
+
+        if len(text) == 0:
+            return
+        position = self.cursor()
+        self.__buffer.insert(text)
+        self.__inserted__(position, text)
+        self.__mark__(position)
+        self.__killing = False
+
+    def __delete__(self, start: int, end: int):
+        """
+        Deletes the text between start and end, leaves the cursor at start and returns the deleted text.
+        """
+
+        start, end = max(0, start), min(len(self), end)
+        if start >= end:
+            return ""
+        self.__buffer.move(end)
+        deleted = self.__buffer.delete_before(end - start)
+        self.__deleted__(start, end)
+        self.__mark__(start)
+        return deleted
+
+    def __kill_range__(self, start: int, end: int, backward: bool):
+        """
+        Deletes the text between start and end into the kill buffer. A kill right after another one is joined to it,
+        before the killed text if backward, otherwise after it.
+        """
+
+        killing = self.__killing
+        deleted = self.__delete__(start, end)
+        if not killing:
+            self.__kill = deleted
+        elif backward:
+            self.__kill = deleted + self.__kill
+        else:
+            self.__kill += deleted
+        self.__killing = True
+
+    def replace(self, start: int, end: int, text: str):
+        """
+        Replaces the text between two positions and moves the cursor after the new text.
+
+        Parameters
+        ----------
+        start: int
+            The position of the first character to replace
+        end: int
+            The position after the last character to replace
+        text: str
+            The new text
+        """
+
+        self.__delete__(start, end)
+        self.move(start)
+        self.insert(text)
+
+    def backspace(self):
+        """
+        Deletes the character before the cursor.
+        """
+
+        self.__delete__(self.cursor() - 1, self.cursor())
+        self.__killing = False
+
+    def delete(self):
+        """
+        Deletes the character at the cursor.
+        """
+
+        self.__delete__(self.cursor(), self.cursor() + 1)
+        self.__killing = False
+
+    def move(self, position: int):
+        """
+        Moves the cursor.
+
+        Parameters
+        ----------
+        position: int
+            The new position; it is clamped to the text
+        """
+
+        self.__buffer.move(position)
+        self.__killing = False
+
+    def left(self):
+        """
+        Moves the cursor one character to the left.
+        """
+
+        self.move(self.cursor() - 1)
+
+    def right(self):
+        """
+        Moves the cursor one character to the right.
+        """
+
+        self.move(self.cursor() + 1)
+
+    def __word_start__(self):
+        position = self.cursor()
+        while position > 0 and not is_word_char(self.__buffer.char(position - 1)):
+            position -= 1
+        while position > 0 and is_word_char(self.__buffer.char(position - 1)):
+            position -= 1
+        return position
+
+    def __word_end__(self):
+        position = self.cursor()
+        while position < len(self) and not is_word_char(self.__buffer.char(position)):
+            position += 1
+        while position < len(self) and is_word_char(self.__buffer.char(position)):
+            position += 1
+        return position
+
+    def word_left(self):
+        """
+        Moves the cursor to the start of the word before it.
+        """
+
+        self.move(self.__word_start__())
+
+    def word_right(self):
+        """
+        Moves the cursor to the end of the word after it.
+        """
+
+        self.move(self.__word_end__())
+
+    def line_count(self):
+        """
+        Returns the number of lines.
+
+        Returns
+        -------
+        int
+            The number of lines, at least 1
+        """
+
+        return len(self.__line_starts)
+
+    def line_start(self, line: int):
+        """
+        Returns the position of the first character of a line.
+
+        Parameters
+        ----------
+        line: int
+            The line, where 0 is the first
+
+        Returns
+        -------
+        int
+            The position
+        """
+
+        return self.__line_starts[line]
+
+    def line_length(self, line: int):
+        """
+        Returns the number of characters of a line, without its endline.
+
+        Parameters
+        ----------
+        line: int
+            The line, where 0 is the first
+
+        Returns
+        -------
+        int
+            The length of the line
+        """
+
+        starts = self.__line_starts
+        end = starts[line + 1] - 1 if line + 1 < len(starts) else len(self)
+        return end - starts[line]
+
+    def position(self, index: int):
+        """
+        Returns the line and column of a position.
+
+        Parameters
+        ----------
+        index: int
+            The position in the text
+
+        Returns
+        -------
+        Tuple[int, int]
+            The line, where 0 is the first, and the column within it
+        """
+
+        line = bisect_right(self.__line_starts, index) - 1
+        return line, index - self.__line_starts[line]
+
+    def home(self):
+        """
+        Moves the cursor to the start of its line.
+        """
+
+        line, _ = self.position(self.cursor())
+        self.move(self.__line_starts[line])
+
+    def end(self):
+        """
+        Moves the cursor to the end of its line.
+        """
+
+        line, _ = self.position(self.cursor())
+        self.move(self.__line_starts[line] + self.line_length(line))
+
+    def up(self):
+        """
+        Moves the cursor to the line above, keeping its column where possible.
+
+        Returns
+        -------
+        bool
+            False if the cursor is on the first line and did not move, otherwise True
+        """
+
+        line, column = self.position(self.cursor())
+        if line == 0:
+            return False
+        self.move(self.__line_starts[line - 1] + min(column, self.line_length(line - 1)))
+        return True
+
+    def down(self):
+        """
+        Moves the cursor to the line below, keeping its column where possible.
+
+        Returns
+        -------
+        bool
+            False if the cursor is on the last line and did not move, otherwise True
+        """
+
+        line, column = self.position(self.cursor())
+        if line + 1 >= self.line_count():
+            return False
+        self.move(self.__line_starts[line + 1] + min(column, self.line_length(line + 1)))
+        return True
+
+    def kill_start(self):
+        """
+        Deletes from the start of the line to the cursor into the kill buffer.
+        """
+
+        _, column = self.position(self.cursor())
+        self.__kill_range__(self.cursor() - column, self.cursor(), True)
+
+    def kill_end(self):
+        """
+        Deletes from the cursor to the end of the line into the kill buffer. At the end of a line, the endline is
+        deleted, joining the next line.
+        """
+
+        line, _ = self.position(self.cursor())
+        end = self.__line_starts[line] + self.line_length(line)
+        self.__kill_range__(self.cursor(), end if end > self.cursor() else end + 1, False)
+
+    def kill_word_back(self):
+        """
+        Deletes the word before the cursor into the kill buffer.
+        """
+
+        self.__kill_range__(self.__word_start__(), self.cursor(), True)
+
+    def kill_word_forward(self):
+        """
+        Deletes the word after the cursor into the kill buffer.
+        """
+
+        self.__kill_range__(self.cursor(), self.__word_end__(), False)
+
+    def yank(self):
+        """
+        Inserts the killed text at the cursor.
+        """
+
+        self.insert(self.__kill)
+
+    def take_dirty(self):
+        """
+        Returns the lowest position changed since the last call and resets it.
+
+        Returns
+        -------
+        Optional[int]
+            The position, or None if nothing changed
+        """
+
+        dirty, self.__dirty = self.__dirty, None
+        return dirty
@@ -15,7 +15,10 @@ class FileIO:
     Attributes
     ----------
     __line_points: Dictionary(int, int)
-        Stores the line number and the index of the line number relative to the file
+        Stores the line number and the byte offset of the beginning of the line in the file
+    __snapshot: Tuple[Tuple[int, int, int], bytes]
+        The modification time, size and inode of the file and its contents when the line points were last updated.
+        It is replaced as a whole, so changed_on_disk() can compare against it from another thread.
     __curr_line: int
         The line number of the current line
     filename: str
@@ -34,6 +37,10 @@ class FileIO:
     __update_line_count__()
     __rectify_cursor_bounds__()
     update()
+    changed_on_disk() -> bool
+        Returns whether the file was changed by another program since the last update.
+    reload() -> bool
+        Updates the line points and cursor after the file was changed by another program.
     set_filename(filename: str)
     set_cursor(line_num: int)
     get_cursor() -> int
@@ -41,10 +48,14 @@ class FileIO:
     get_write_mode() -> Command
     get_current_line() -> str
     get_line(line_num: int)-> str
+    get_lines(start: int, end: int) -> List[str]
+        Returns the lines from start to end, reading only those lines of the file.
     get_line_count() -> int
         The number of lines in the file delimited by a '\n'.
     write(__s, mode: str)
         Writes output to the file and calls update().
+    insert_line(line_num: int, __s: str)
+        Inserts a line before line_num, keeping the cursor on the same line of code.
     erase_last_char(char: str)
         Deletes the last occurrence of the char in the file
     delete_lines(start: int, size: int)
@@ -53,15 +64,19 @@ class FileIO:
         Compares the number of lines to the line_num parameter.
     """
 
-    def __init__(self, filepath=WORKING_DIR + DEFAULT_FILENAME):
+    def __init__(self, filepath=WORKING_DIR + DEFAULT_FILENAME, reset=True):
         """
         Parameters
         ----------
         filepath: str
             The path of the output file
+        reset: bool
+            Whether the file is reset to the default contents. If False, the existing file is opened as it is, e.g. to
+            resume a session, and the cursor is placed on the last line.
         """
 
         self.__line_points = {}
+        self.__snapshot = (None, b"")
         self.__curr_line = 0
         self.filename = ""
         self.filepath = filepath
@@ -73,7 +88,11 @@ class FileIO:
             self.filename = filepath[slash + 1:]
         else:
             self.filename = filepath
-        self.__reset__()
+        if reset:
+            self.__reset__()
+        else:
+            self.update()
+            self.__curr_line = max(1, self.line_count - 2)
 
     def __reset__(self):
         """
@@ -84,26 +103,46 @@ class FileIO:
         self.update()
         self.__curr_line = self.line_count - 2
 
-    def __update_line_points__(self):
+    def __read__(self):
         """
-        Updates the line point coordinates of the file
+        Returns the contents of the file and its modification time, size and inode.
+        """
+
+        with open(self.filepath, "rb") as file:
+            stat = os.fstat(file.fileno())
+            return file.read(), (stat.st_mtime_ns, stat.st_size, stat.st_ino)
 
-        Coordinates (X,Y) where X is the line number, and Y is the file buffer index to the beginning of the line
+    def __update_line_points__(self, content=None, first_line=1):
         """
+        Updates the line point coordinates of the file
+
+        Coordinates (X,Y) where X is the line number, and Y is the byte offset of the beginning of the line. The
+        points of the lines before first_line are kept.
 
-        self.__line_points.clear()
-        self.__line_points[1] = 0
-        line_num = 2
-        index = 1
-        with open(self.filepath, "r") as file:
-            while True:
-                char = file.read(1)
-                if not char:
-                    break
-                if char == '\n':
-                    self.__line_points[line_num] = index + 1
-                    line_num += 1
-                index += 1
+        Parameters
+        ----------
+        content: bytes
+            The contents of the file, if they have been read already; the caller then updates the snapshot
+        first_line: int
+            The first line whose point is updated
+        """
+
+        if content is None:
+            content, stat = self.__read__()
+            self.__snapshot = (stat, content)
+        index = self.__line_points.get(first_line)
+        if first_line <= 1 or index is None:
+            first_line, index = 1, 0
+        for line_num in [line for line in self.__line_points if line > first_line]:
+            del self.__line_points[line_num]
+        self.__line_points[first_line] = index
+        line_num = first_line
+        while True:
+            index = content.find(b"\n", index) + 1
+            if index == 0:
+                break
+            line_num += 1
+            self.__line_points[line_num] = index
 
     def __update_line_count__(self):
         """
@@ -132,6 +171,83 @@ class FileIO:
         self.__update_line_count__()
         self.__rectify_cursor_bounds__()
 
+    def changed_on_disk(self):
+        """
+        Returns whether the file was changed by another program, such as an editor, since the last update. The
+        contents are compared only if the modification time, size or inode changed, so saving the file without
+        changing it is not a change.
+
+        Nothing is modified, so it may be called from another thread, e.g. a SourceWatcher; reload() picks up the
+        change on the thread that writes the file.
+
+        Returns
+        -------
+        bool
+            True if the contents of the file differ from those the line points were built from, otherwise False
+        """
+
+        snapshot_stat, snapshot_content = self.__snapshot
+        try:
+            stat = os.stat(self.filepath)
+            if (stat.st_mtime_ns, stat.st_size, stat.st_ino) == snapshot_stat:
+                return False
+            content, _ = self.__read__()
+        except OSError:
+            return False
+        return content != snapshot_content
+
+    def reload(self):
+        """
+        Updates the line points and cursor if the file was changed by another program, so the next write applies to
+        the new contents. The file is read only if its modification time, size or inode changed.
+
+        Only the points after the first changed line are updated. The cursor stays on the same line of code: it moves
+        with the lines after the change, and a cursor inside the changed lines is placed after them, so the next
+        statement follows the new code.
+
+        Returns
+        -------
+        bool
+            True if the contents changed, otherwise False
+        """
+
+        snapshot_stat, snapshot_content = self.__snapshot
+        try:
+            stat = os.stat(self.filepath)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size, stat.st_ino) == snapshot_stat:
+            return False
+        try:
+            content, stat = self.__read__()
+        except OSError as e:
+            print(f'OSError: Cannot read "{self.filepath}": {e.strerror}.')
+            return False
+        self.__snapshot = (stat, content)
+        if content == snapshot_content:
+            return False
+        old_lines = snapshot_content.split(b"\n")
+        new_lines = content.split(b"\n")
+        prefix = 0
+        while prefix < min(len(old_lines), len(new_lines)) and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        common = min(len(old_lines), len(new_lines)) - prefix
+        while suffix < common and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+
+        cursor = self.__curr_line
+        if cursor > len(old_lines) - suffix:
+            cursor += len(new_lines) - len(old_lines)
+        elif cursor > prefix:
+            cursor = len(new_lines) - suffix + 1
+        # The lines before the first changed one end with the same endlines, so their points are still right
+        self.__update_line_points__(content, min(prefix, len(old_lines) - 1, len(new_lines) - 1) + 1)
+        self.__update_line_count__()
+        self.__curr_line = max(1, cursor)
+        self.__rectify_cursor_bounds__()
+        return True
+
     def set_filename(self, filename: str):
         """
         Sets the filename of the output file.
@@ -223,13 +339,43 @@ class FileIO:
             A '\n' delimited string if the line exists, otherwise an empty string
         """
 
-        line = ""
+        line = b""
         if self.has_line(line_num):
             index = self.__line_points[line_num]
-            with open(self.filepath, "r") as file:
+            with open(self.filepath, "rb") as file:
                 file.seek(index)
                 line = file.readline()
-        return line[:-1]
+        return line.decode(errors="replace").rstrip("\n")
+
+    def get_lines(self, start: int, end: int):
+        """
+        Returns the '\n' delimited strings of the lines from start to end. The line points are used to read only
+        those lines of the file.
+
+        Parameters
+        ----------
+        start: int
+            The line number of the first line
+        end: int
+            The line number of the last line, included
+
+        Returns
+        -------
+        List[str]
+            The lines of the range that exist in the file
+        """
+
+        start = max(1, start)
+        end = min(end, self.line_count)
+        if start > end:
+            return []
+        with open(self.filepath, "rb") as file:
+            file.seek(self.__line_points[start])
+            if self.has_line(end + 1):
+                data = file.read(self.__line_points[end + 1] - self.__line_points[start] - 1)
+            else:
+                data = file.read()
+        return data.decode(errors="replace").split("\n")[:end - start + 1]
 
     def get_line_count(self):
         """
@@ -278,7 +424,8 @@ class FileIO:
                 lines = file.readlines()
                 line_index = self.__curr_line - 1
                 if line_index < len(lines):
-                    self.__curr_line += 1
+                    # A statement may span several lines; the cursor moves past all of them
+                    self.__curr_line += max(1, len(__s.splitlines()))
                     for line in __s.splitlines(True):
                         __update_line__(lines, line_index, line)
                         line_index += 1
@@ -303,6 +450,32 @@ class FileIO:
                     print(f'Exception: {_ex}.')
         self.update()
 
+    def insert_line(self, line_num: int, __s: str):
+        """
+        Inserts a line before line_num, keeping the cursor on the same line of code. The write mode is not used or
+        reset.
+
+        Parameters
+        ----------
+        line_num: int
+            The line number the new line gets
+        __s: str
+            The line, without the endline
+        """
+
+        with open(self.filepath, "r+") as file:
+            lines = file.readlines()
+            lines.insert(max(0, line_num - 1), __s + "\n")
+            file.seek(0)
+            file.truncate(0)
+            try:
+                file.writelines(lines)
+            except Exception as _ex:
+                print(f'Exception: {_ex}.')
+        if self.__curr_line >= line_num:
+            self.__curr_line += 1
+        self.update()
+
     def erase_last_char(self, char: str):
         """
         Deletes the last occurrence of the char in the file
@@ -366,7 +539,4 @@ class FileIO:
             True if the file contains the line, otherwise False
         """
 
-        for line in self.__line_points.keys():
-            if line == line_num:
-                return True
-        return False
+        return line_num in self.__line_points
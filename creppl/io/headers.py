@@ -0,0 +1,305 @@
+# creppl/io/headers.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from creppl.io import COMPILER, CPP_STANDARD
+from creppl.io.completion import CACHE_DIR, KEYWORDS, parse_includes, scan_namespaces
+from creppl.proc.process import proc_exec
+from creppl.utils.helpers import toolchain_id
+
+"""Settings of $autoinclude: add missing includes, ask first, or do nothing"""
+AUTOINCLUDE_MODES = ("on", "ask", "off")
+
+"""Standard library headers that are indexed; headers the toolchain does not have are skipped"""
+STANDARD_HEADERS = (
+    "<algorithm>", "<any>", "<array>", "<atomic>", "<bitset>", "<cassert>", "<cctype>", "<cfloat>", "<charconv>",
+    "<chrono>", "<climits>", "<cmath>", "<complex>", "<condition_variable>", "<cstddef>", "<cstdint>", "<cstdio>",
+    "<cstdlib>", "<cstring>", "<ctime>", "<deque>", "<exception>", "<filesystem>", "<forward_list>", "<fstream>",
+    "<functional>", "<future>", "<initializer_list>", "<iomanip>", "<ios>", "<iostream>", "<istream>", "<iterator>",
+    "<limits>", "<list>", "<locale>", "<map>", "<memory>", "<mutex>", "<new>", "<numeric>", "<optional>", "<ostream>",
+    "<queue>", "<random>", "<ratio>", "<regex>", "<set>", "<shared_mutex>", "<sstream>", "<stack>", "<stdexcept>",
+    "<string>", "<string_view>", "<system_error>", "<thread>", "<tuple>", "<type_traits>", "<typeinfo>",
+    "<unordered_map>", "<unordered_set>", "<utility>", "<valarray>", "<variant>", "<vector>",
+)
+
+"""The header to include for names whose usual home is not the smallest header that declares them, and for names the
+preprocessed declarations do not show, such as macros and nested namespaces"""
+CANONICAL_HEADERS = {
+    **dict.fromkeys(("cout", "cin", "cerr", "clog", "endl"), "<iostream>"),
+    **dict.fromkeys(("setw", "setprecision", "setfill", "put_time", "quoted"), "<iomanip>"),
+    **dict.fromkeys(("sort", "stable_sort", "min", "max", "minmax", "min_element", "max_element", "find", "find_if",
+                     "reverse", "fill", "copy", "count", "count_if", "transform", "unique", "lower_bound",
+                     "upper_bound", "binary_search", "next_permutation", "all_of", "any_of", "none_of", "clamp"),
+                    "<algorithm>"),
+    **dict.fromkeys(("accumulate", "iota", "partial_sum", "inner_product", "gcd", "lcm", "reduce"), "<numeric>"),
+    **dict.fromkeys(("pair", "make_pair", "move", "forward", "swap", "exchange"), "<utility>"),
+    **dict.fromkeys(("unique_ptr", "shared_ptr", "weak_ptr", "make_unique", "make_shared"), "<memory>"),
+    **dict.fromkeys(("function", "bind", "hash", "less", "greater", "plus", "minus"), "<functional>"),
+    **dict.fromkeys(("string", "to_string", "getline", "stoi", "stol", "stoll", "stod"), "<string>"),
+    **dict.fromkeys(("stringstream", "istringstream", "ostringstream"), "<sstream>"),
+    **dict.fromkeys(("ifstream", "ofstream", "fstream"), "<fstream>"),
+    **dict.fromkeys(("runtime_error", "logic_error", "invalid_argument", "out_of_range"), "<stdexcept>"),
+    **dict.fromkeys(("int8_t", "int16_t", "int32_t", "int64_t", "uint8_t", "uint16_t", "uint32_t", "uint64_t"),
+                    "<cstdint>"),
+    **dict.fromkeys(("sqrt", "pow", "sin", "cos", "tan", "exp", "log", "floor", "ceil", "fabs", "round"), "<cmath>"),
+    **dict.fromkeys(("printf", "scanf", "puts", "fprintf", "snprintf"), "<cstdio>"),
+    **dict.fromkeys(("rand", "srand", "exit", "malloc", "free"), "<cstdlib>"),
+    **dict.fromkeys(("memcpy", "memset", "strlen", "strcmp"), "<cstring>"),
+    "priority_queue": "<queue>",
+    "numeric_limits": "<limits>",
+    "make_tuple": "<tuple>",
+    "chrono": "<chrono>",
+    "filesystem": "<filesystem>",
+    "this_thread": "<thread>",
+}
+
+"""Macros, which are used unqualified, and their headers"""
+MACRO_HEADERS = {
+    "assert": "<cassert>",
+    **dict.fromkeys(("INT_MAX", "INT_MIN", "LLONG_MAX", "LLONG_MIN", "UINT_MAX", "CHAR_BIT"), "<climits>"),
+    **dict.fromkeys(("EXIT_SUCCESS", "EXIT_FAILURE", "RAND_MAX"), "<cstdlib>"),
+}
+
+# Comments and literals, which are skipped when looking for names; a literal may contain "//" and a comment quotes
+_IGNORED = re.compile(r'//[^\n]*|/\*.*?(?:\*/|$)|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL)
+_QUALIFIED = re.compile(r"(?<![\w:])std::([A-Za-z_]\w*)")
+# An unqualified name that is used as a template, called, qualified or followed by a declarator
+_UNQUALIFIED = re.compile(r"(?<![\w:.>])([A-Za-z_]\w*)(?=\s*[<(]|::|\s+[A-Za-z_*&])")
+_IDENT = re.compile(r"\b[A-Za-z_]\w*\b")
+_LINE_MARKER = re.compile(r'^# \d+ "[^"]*/([^/"]+)"', re.MULTILINE)
+
+
+class HeaderIndex:
+    """
+    A map from the names of the standard library to the headers that declare them, for suggesting missing includes.
+
+    Every header of STANDARD_HEADERS is preprocessed alone, and the names it declares in namespace std and the
+    standard headers it includes are recorded. The map is built once per toolchain, in parallel and in a background
+    thread, and stored in ~/.creppl/cache; it is memoised and shared by every HeaderIndex in the process.
+
+    The header of a name is its entry in CANONICAL_HEADERS, the header named after it (e.g. <vector>) or the smallest
+    header that declares it. A name needs an include if its header is neither included by the session nor by one of
+    the session's headers. Checking headers rather than names keeps forward declarations, such as those of <iosfwd>,
+    from counting as definitions; only names without a header of their own, such as size_t, are accepted from any
+    header that declares them.
+
+    Attributes
+    ----------
+    __flags: List[str]
+        The compiler flags the headers are preprocessed with
+    __maps: Dict[str, Dict[str, List[str]]]
+        The memoised maps from name to providing headers, by cache key
+    __sizes: Dict[str, Dict[str, int]]
+        The number of names each header declares, by cache key
+    __closures: Dict[str, Dict[str, List[str]]]
+        The standard headers each header includes, itself included, by cache key
+    __building: set
+        The cache keys of the maps being built
+    __lock: threading.Lock
+        Guards __maps, __sizes, __closures and __building
+
+    Methods
+    -------
+    cache_key() -> str
+        Returns the cache key of the map for the toolchain and flags.
+    load()
+        Loads or builds the map in the background, if needed.
+    ready() -> bool
+        Returns whether the map is available.
+    header_for(name: str) -> Optional[str]
+        Returns the header to include for a name of namespace std.
+    missing(statement: str, source: str) -> List[Tuple[str, str]]
+        Returns the names used by a statement that none of the session's includes provides, with their headers.
+    """
+
+    __maps = {}
+    __sizes = {}
+    __closures = {}
+    __building = set()
+    __lock = threading.Lock()
+
+    def __init__(self, flags=None):
+        """
+        Parameters
+        ----------
+        flags: List[str]
+            The compiler flags used to preprocess the headers
+        """
+
+        self.__flags = list(flags) if flags is not None else [f"-std=c++{CPP_STANDARD}"]
+
+    def cache_key(self):
+        """
+        Returns the cache key of the map for the toolchain and flags.
+
+        Returns
+        -------
+        str
+            A hex digest of the toolchain, flags and indexed headers
+        """
+
+        data = "\n".join([toolchain_id(COMPILER)] + self.__flags + list(STANDARD_HEADERS))
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def __scan__(self, header: str):
+        """
+        Returns the names a header declares in namespace std and the standard headers it includes, or None if the
+        toolchain does not have it.
+        """
+
+        try:
+            proc = proc_exec([COMPILER, *self.__flags, "-E", "-x", "c++", "-"], stdin=True)
+            stdout, _ = proc.communicate(f"#include {header}\n".encode())
+        except OSError:
+            return None
+        if proc.returncode != 0:
+            return None
+        output = stdout.decode(errors="replace")
+        included = set(f"<{name}>" for name in _LINE_MARKER.findall(output)).intersection(STANDARD_HEADERS)
+        return {"names": scan_namespaces(output).get("std", []), "includes": sorted(included | {header})}
+
+    def __build__(self, key: str):
+        """
+        Loads the map from disk, or builds and stores it.
+        """
+
+        path = f"{CACHE_DIR}/headers-{key}.json"
+        declared = None
+        try:
+            with open(path, "r") as file:
+                declared = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+        if not isinstance(declared, dict):
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                declared = {header: scan for header, scan in zip(STANDARD_HEADERS, pool.map(self.__scan__,
+                                                                                            STANDARD_HEADERS))
+                            if scan is not None}
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}"
+                with open(tmp_path, "w") as file:
+                    json.dump(declared, file)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+        providers = {}
+        for header, scan in declared.items():
+            for name in scan["names"]:
+                providers.setdefault(name, []).append(header)
+        with self.__lock:
+            self.__maps[key] = providers
+            self.__sizes[key] = {header: len(scan["names"]) for header, scan in declared.items()}
+            self.__closures[key] = {header: scan["includes"] for header, scan in declared.items()}
+            self.__building.discard(key)
+
+    def load(self):
+        """
+        Loads or builds the map in the background, if needed.
+        """
+
+        key = self.cache_key()
+        with self.__lock:
+            if key in self.__maps or key in self.__building:
+                return
+            self.__building.add(key)
+        threading.Thread(target=self.__build__, args=(key,), name="creppl-headers", daemon=True).start()
+
+    def ready(self):
+        """
+        Returns whether the map is available.
+
+        Returns
+        -------
+        bool
+            True once the map has been loaded or built
+        """
+
+        with self.__lock:
+            return self.cache_key() in self.__maps
+
+    def header_for(self, name: str):
+        """
+        Returns the header to include for a name of namespace std.
+
+        Parameters
+        ----------
+        name: str
+            The unqualified name, e.g. "vector"
+
+        Returns
+        -------
+        Optional[str]
+            The header, e.g. "<vector>", or None if the name is not known
+        """
+
+        if name in CANONICAL_HEADERS:
+            return CANONICAL_HEADERS[name]
+        with self.__lock:
+            key = self.cache_key()
+            providers = self.__maps.get(key, {}).get(name, [])
+            sizes = self.__sizes.get(key, {})
+        if f"<{name}>" in providers:
+            return f"<{name}>"
+        return min(providers, key=lambda header: sizes.get(header, 0), default=None)
+
+    def missing(self, statement: str, source: str):
+        """
+        Returns the names used by a statement that none of the session's includes provides, with their headers.
+
+        Names qualified with std:: are always checked; unqualified names are checked if the session is 'using
+        namespace std' and they are not identifiers of the session already. Names in comments and literals are
+        ignored. Nothing is reported until the map is
+        available.
+
+        Parameters
+        ----------
+        statement: str
+            The new statement
+        source: str
+            The session source, without the statement
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            Each name and the header to include for it, one name per header, in order of use
+        """
+
+        includes = set(parse_includes(source))
+        if "<bits/stdc++.h>" in includes or not self.ready():
+            return []
+        with self.__lock:
+            providers = self.__maps[self.cache_key()]
+            closures = self.__closures[self.cache_key()]
+        provided = set(includes)
+        for include in includes:
+            provided.update(closures.get(include, ()))
+
+        code = _IGNORED.sub(" ", statement)
+        names = _QUALIFIED.findall(code)
+        if "using namespace std" in source or "using namespace std" in code:
+            known = set(_IDENT.findall(source)) | set(KEYWORDS)
+            names += [name for name in _UNQUALIFIED.findall(code) if name not in known]
+        found = []
+        headers = set()
+        for name in names:
+            header = self.header_for(name)
+            if name not in CANONICAL_HEADERS and header != f"<{name}>" and \
+                    len(provided.intersection(providers.get(name, ()))) > 0:
+                continue
+            if header is not None and header not in provided and header not in headers:
+                headers.add(header)
+                found.append((name, header))
+        for name in _UNQUALIFIED.findall(code) + re.findall(r"\b[A-Z_]+\b", code):
+            header = MACRO_HEADERS.get(name)
+            if header is not None and header not in provided and header not in headers:
+                headers.add(header)
+                found.append((name, header))
+        return found
@@ -0,0 +1,180 @@
+# creppl/io/highlight.py
+
+import re
+from collections import OrderedDict
+
+"""Maximum number of lines whose tokens are cached"""
+MAX_CACHED_LINES = 8192
+
+"""Colour of each kind of token"""
+TOKEN_COLOURS = {
+    "comment": "\033[2m",
+    "directive": "\033[34m",
+    "keyword": "\033[35m",
+    "type": "\033[36m",
+    "string": "\033[32m",
+    "number": "\033[33m",
+}
+
+_KEYWORDS = frozenset((
+    "alignas", "alignof", "and", "asm", "break", "case", "catch", "class", "co_await", "co_return", "co_yield",
+    "concept", "const", "const_cast", "consteval", "constexpr", "constinit", "continue", "decltype", "default",
+    "delete", "do", "dynamic_cast", "else", "enum", "explicit", "export", "extern", "false", "final", "for", "friend",
+    "goto", "if", "inline", "mutable", "namespace", "new", "noexcept", "not", "nullptr", "operator", "or", "override",
+    "private", "protected", "public", "register", "reinterpret_cast", "requires", "return", "sizeof", "static",
+    "static_assert", "static_cast", "struct", "switch", "template", "this", "thread_local", "throw", "true", "try",
+    "typedef", "typeid", "typename", "union", "using", "virtual", "volatile", "while",
+))
+
+_TYPES = frozenset((
+    "auto", "bool", "char", "char8_t", "char16_t", "char32_t", "double", "float", "int", "long", "short", "signed",
+    "size_t", "unsigned", "void", "wchar_t", "int8_t", "int16_t", "int32_t", "int64_t", "uint8_t", "uint16_t",
+    "uint32_t", "uint64_t", "ptrdiff_t", "std",
+))
+
+_TOKEN_RE = re.compile(r"""
+    (?P<line_comment>//.*)
+  | (?P<block_comment>/\*)
+  | (?P<string>"(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?)
+  | (?P<number>\b\d[\w.']*)
+  | (?P<word>[A-Za-z_]\w*)
+""", re.VERBOSE)
+
+_DIRECTIVE_RE = re.compile(r"\s*#\s*\w*")
+_HEADER_RE = re.compile(r"\s*<[^>]*>")
+
+
+class Highlighter:
+    """
+    Splits lines of C++ into coloured tokens for $print, caching the tokens of every line.
+
+    Lines are lexed one at a time, so only the lines that are shown are ever lexed. The only state carried from one
+    line to the next is whether a block comment is open, which is part of the cache key; showing the same lines
+    again, e.g. when paging back, takes the tokens from the cache.
+
+    Attributes
+    ----------
+    __cache: OrderedDict[Tuple[str, bool], Tuple[List[Tuple[str, str]], bool]]
+        The tokens of each line and whether a block comment is open at its end, by line and whether a block comment
+        is open at its start, least recently used first
+
+    Methods
+    -------
+    tokens(line: str, in_comment: bool) -> Tuple[List[Tuple[str, str]], bool]
+        Returns the tokens of a line and whether a block comment is open at its end.
+    render(line: str, in_comment: bool, width: int) -> Tuple[str, bool]
+        Returns a line with colours, cut to a number of characters, and whether a block comment is open at its end.
+    """
+
+    def __init__(self):
+        self.__cache = OrderedDict()
+
+    @staticmethod
+    def __lex__(line: str, in_comment: bool):
+        """
+        Splits a line into tokens, as (text, kind) pairs where kind is a key of TOKEN_COLOURS or None.
+        """
+
+        tokens = []
+        pos = 0
+        if in_comment:
+            end = line.find("*/")
+            if end == -1:
+                return [(line, "comment")], True
+            pos = end + 2
+            tokens.append((line[:pos], "comment"))
+            in_comment = False
+        else:
+            directive = _DIRECTIVE_RE.match(line)
+            if directive is not None:
+                pos = directive.end()
+                tokens.append((line[:pos], "directive"))
+                header = _HEADER_RE.match(line, pos)
+                if header is not None:
+                    tokens.append((header.group(), "string"))
+                    pos = header.end()
+
+        while pos < len(line):
+            match = _TOKEN_RE.search(line, pos)
+            if match is None:
+                tokens.append((line[pos:], None))
+                break
+            if match.start() > pos:
+                tokens.append((line[pos:match.start()], None))
+            kind = match.lastgroup
+            if kind == "block_comment":
+                end = line.find("*/", match.end())
+                if end == -1:
+                    tokens.append((line[match.start():], "comment"))
+                    return tokens, True
+                tokens.append((line[match.start():end + 2], "comment"))
+                pos = end + 2
+                continue
+            text = match.group()
+            if kind == "line_comment":
+                kind = "comment"
+            elif kind == "word":
+                kind = "keyword" if text in _KEYWORDS else "type" if text in _TYPES else None
+            tokens.append((text, kind))
+            pos = match.end()
+        return tokens, in_comment
+
+    def tokens(self, line: str, in_comment=False):
+        """
+        Returns the tokens of a line and whether a block comment is open at its end, lexing the line only if it is
+        not cached.
+
+        Parameters
+        ----------
+        line: str
+            The line, without the endline
+        in_comment: bool
+            Whether a block comment is open at the start of the line
+
+        Returns
+        -------
+        Tuple[List[Tuple[str, str]], bool]
+            The (text, kind) pairs of the line, where kind is a key of TOKEN_COLOURS or None, and whether a block
+            comment is open at its end
+        """
+
+        key = (line, in_comment)
+        cached = self.__cache.get(key)
+        if cached is not None:
+            self.__cache.move_to_end(key)
+            return cached
+        cached = self.__cache[key] = self.__lex__(line, in_comment)
+        if len(self.__cache) > MAX_CACHED_LINES:
+            self.__cache.popitem(last=False)
+        return cached
+
+    def render(self, line: str, in_comment=False, width=None):
+        """
+        Returns a line with colours and whether a block comment is open at its end.
+
+        Parameters
+        ----------
+        line: str
+            The line, without the endline
+        in_comment: bool
+            Whether a block comment is open at the start of the line
+        width: int
+            The number of characters the line is cut to, or None to keep it whole
+
+        Returns
+        -------
+        Tuple[str, bool]
+            The line with ANSI colours and whether a block comment is open at its end
+        """
+
+        tokens, in_comment = self.tokens(line, in_comment)
+        parts = []
+        length = 0
+        for text, kind in tokens:
+            if width is not None and length + len(text) > width:
+                text = text[:width - length]
+            length += len(text)
+            parts.append(text if kind is None else f"{TOKEN_COLOURS[kind]}{text}\033[0m")
+            if width is not None and length >= width:
+                break
+        return "".join(parts), in_comment
@@ -0,0 +1,285 @@
+# creppl/io/history.py
+
+import threading
+from bisect import bisect_left
+
+
+class History:
+    """
+    The input history of the Terminal, persisted to an append-only file.
+
+    Entries are stored one per line, with backslashes and newlines escaped. The file is read the first time the history
+    is used (or in the background after preload()) and every new entry is appended to it immediately, so the history
+    survives exits and crashes. Consecutive duplicate entries are dropped.
+
+    Reverse search is backed by a trigram index: every entry is registered under each three-character substring it
+    contains, and a query is only compared against the entries listed under its rarest trigram. The index is built in
+    slices by preload() so that loading a large history never blocks the prompt; entries that are not indexed yet are
+    scanned directly.
+
+    Attributes
+    ----------
+    __N_GRAM__: int
+        The length of the substrings used as index keys.
+    __INDEX_SLICE__: int
+        The number of entries indexed at a time by the background thread.
+    __path: str
+        The path of the history file.
+    __entries: List[str]
+        The history entries, oldest first.
+    __index: Dict[str, List[int]]
+        Maps each trigram to the ascending positions of the entries that contain it.
+    __indexed: int
+        The number of entries, from the oldest, registered in the index.
+    __loaded: bool
+        True once the history file has been read.
+    __lock: threading.RLock
+        Guards the entries and the index.
+
+    Methods
+    -------
+    preload()
+        Starts reading and indexing the history file in a background thread.
+    add(entry: str)
+        Appends an entry to the history and to the history file.
+    restore(entries: List[str])
+        Appends the entries that are not in the history yet to the in-memory history only, e.g. those of a resumed
+        session.
+    get(position: int) -> str
+        Returns the entry at position.
+    size() -> int
+        Returns the number of entries.
+    search(query: str, before: int) -> int
+        Returns the position of the newest entry before 'before' that contains query.
+    """
+
+    __N_GRAM__ = 3
+    __INDEX_SLICE__ = 2048
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the history file. It is created on the first add().
+        """
+
+        self.__path = path
+        self.__entries = []
+        self.__index = {}
+        self.__indexed = 0
+        self.__loaded = False
+        self.__lock = threading.RLock()
+
+    @staticmethod
+    def __escape__(entry: str):
+        return entry.replace("\\", "\\\\").replace("\n", "\\n")
+
+    @staticmethod
+    def __unescape__(line: str):
+        out = []
+        idx = 0
+        while idx < len(line):
+            char = line[idx]
+            if char == "\\" and idx + 1 < len(line):
+                idx += 1
+                char = "\n" if line[idx] == "n" else line[idx]
+            out.append(char)
+            idx += 1
+        return "".join(out)
+
+    def __load__(self):
+        """
+        Reads the history file, if it has not been read yet.
+        """
+
+        with self.__lock:
+            if self.__loaded:
+                return
+            try:
+                with open(self.__path, "r", errors="replace") as file:
+                    for line in file:
+                        line = line.rstrip("\n")
+                        if len(line) > 0:
+                            self.__append__(self.__unescape__(line) if "\\" in line else line)
+            except FileNotFoundError:
+                pass
+            except OSError as _ex:
+                print(f'Exception: {_ex}.')
+            self.__loaded = True
+
+    def __append__(self, entry: str):
+        """
+        Adds an entry to the in-memory history.
+
+        Returns
+        -------
+        bool
+            False if the entry duplicates the newest entry and was dropped, otherwise True
+        """
+
+        if self.__entries and self.__entries[-1] == entry:
+            return False
+        self.__entries.append(entry)
+        return True
+
+    def __index_entries__(self, limit: int):
+        """
+        Registers up to 'limit' unindexed entries, oldest first, in the trigram index.
+
+        Returns
+        -------
+        bool
+            True if every entry is indexed, otherwise False
+        """
+
+        with self.__lock:
+            n = self.__N_GRAM__
+            index = self.__index
+            end = min(len(self.__entries), self.__indexed + limit)
+            for position in range(self.__indexed, end):
+                entry = self.__entries[position]
+                for gram in {entry[i:i + n] for i in range(len(entry) - n + 1)}:
+                    postings = index.get(gram)
+                    if postings is None:
+                        index[gram] = [position]
+                    else:
+                        postings.append(position)
+            self.__indexed = end
+            return end == len(self.__entries)
+
+    def __preload__(self):
+        self.__load__()
+        while not self.__index_entries__(self.__INDEX_SLICE__):
+            pass
+
+    def preload(self):
+        """
+        Starts reading and indexing the history file in a background thread.
+        """
+
+        threading.Thread(target=self.__preload__, name="creppl-history", daemon=True).start()
+
+    def add(self, entry: str):
+        """
+        Appends an entry to the history and to the history file.
+
+        Empty entries and entries equal to the newest entry are ignored.
+
+        Parameters
+        ----------
+        entry: str
+            The entry to add
+        """
+
+        self.__load__()
+        with self.__lock:
+            if len(entry) == 0 or not self.__append__(entry):
+                return
+            if self.__indexed == len(self.__entries) - 1:
+                self.__index_entries__(1)
+        try:
+            with open(self.__path, "a") as file:
+                file.write(self.__escape__(entry) + "\n")
+        except OSError as _ex:
+            print(f'Exception: {_ex}.')
+
+    def restore(self, entries):
+        """
+        Appends entries to the in-memory history only, so they are the newest entries of this run without being
+        written to the history file again.
+
+        Entries that are already in the history are skipped: the inputs of a resumed session were written to the
+        history file when they were entered.
+
+        Parameters
+        ----------
+        entries: List[str]
+            The entries, oldest first
+        """
+
+        self.__load__()
+        with self.__lock:
+            present = set(self.__entries)
+            for entry in entries:
+                if len(entry) > 0 and entry not in present:
+                    self.__append__(entry)
+                    present.add(entry)
+
+    def get(self, position: int):
+        """
+        Returns the entry at position.
+
+        Parameters
+        ----------
+        position: int
+            The position of the entry, where 0 is the oldest
+
+        Returns
+        -------
+        str
+            The entry, or an empty string if position is out of range
+        """
+
+        self.__load__()
+        if 0 <= position < len(self.__entries):
+            return self.__entries[position]
+        return ""
+
+    def size(self):
+        """
+        Returns the number of entries.
+
+        Returns
+        -------
+        int
+            The number of entries in the history
+        """
+
+        self.__load__()
+        return len(self.__entries)
+
+    def search(self, query: str, before: int):
+        """
+        Returns the position of the newest entry before 'before' that contains query.
+
+        Parameters
+        ----------
+        query: str
+            The substring to search for
+        before: int
+            Only entries at positions lower than this are considered
+
+        Returns
+        -------
+        int
+            The position of the matching entry, or -1 if there is none
+        """
+
+        self.__load__()
+        with self.__lock:
+            entries = self.__entries
+            before = min(before, len(entries))
+            n = self.__N_GRAM__
+
+            # Entries that are not indexed yet are scanned directly
+            indexed = self.__indexed if len(query) >= n else 0
+            for position in range(before - 1, indexed - 1, -1):
+                if query in entries[position]:
+                    return position
+            if indexed == 0:
+                return -1
+
+            candidates = None
+            for gram in {query[i:i + n] for i in range(len(query) - n + 1)}:
+                postings = self.__index.get(gram)
+                if postings is None:
+                    return -1
+                if candidates is None or len(postings) < len(candidates):
+                    candidates = postings
+
+            for idx in range(bisect_left(candidates, min(before, indexed)) - 1, -1, -1):
+                position = candidates[idx]
+                if query in entries[position]:
+                    return position
+            return -1
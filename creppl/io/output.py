@@ -0,0 +1,87 @@
+# creppl/io/output.py
+
+import difflib
+
+from creppl.cmd import Command
+
+"""Output modes: only what is new since the previous run, or the whole output of every run"""
+OUTPUT_MODES = ("new", "full")
+
+
+class OutputTracker:
+    """
+    Keeps the output of the previous run, so that only what a statement adds is shown.
+
+    The whole program runs again after every statement, so its output usually starts with the output of the previous
+    run. In "new" mode, only the suffix after that output is shown; if the previous output is not a prefix of the new
+    one, e.g. because a line printed earlier changed, a compact diff of the changed lines is shown instead, or the
+    whole output if the diff would be longer. In "full" mode, every run is shown in full.
+
+    Attributes
+    ----------
+    mode: str
+        One of OUTPUT_MODES
+    last: str
+        The output of the previous run
+
+    Methods
+    -------
+    render(output: str) -> str
+        Records the output of a run and returns the text to show for it.
+    """
+
+    def __init__(self, mode="new"):
+        """
+        Parameters
+        ----------
+        mode: str
+            One of OUTPUT_MODES
+        """
+
+        self.mode = mode
+        self.last = ""
+
+    @staticmethod
+    def __diff__(old: str, new: str):
+        """
+        Returns the changed lines between two outputs, or None if the diff is longer than new.
+        """
+
+        old_lines, new_lines = old.split("\n"), new.split("\n")
+        lines = [f"\033[2m(output changed; \"${Command.OUT}\" shows all of it)\033[0m"]
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            lines.append(f"\033[36m@@ line {new_start + 1} @@\033[0m")
+            lines.extend(f"\033[31m- {line}\033[0m" for line in old_lines[old_start:old_end])
+            lines.extend(f"\033[32m+ {line}\033[0m" for line in new_lines[new_start:new_end])
+        if len(lines) - 1 >= len(new_lines):
+            return None
+        return "\n".join(lines) + "\n"
+
+    def render(self, output: str):
+        """
+        Records the output of a run and returns the text to show for it.
+
+        Parameters
+        ----------
+        output: str
+            The standard output of the run
+
+        Returns
+        -------
+        str
+            The new suffix, a diff or the whole output, depending on the mode; empty if there is nothing new
+        """
+
+        last, self.last = self.last, output
+        if self.mode == "full":
+            return output + "\n"
+        if output == last:
+            return ""
+        if output.startswith(last):
+            # A partial last line is shown again in full, with what was added to it
+            return output[last.rfind("\n") + 1:]
+        diff = self.__diff__(last, output)
+        return diff if diff is not None else output + "\n"
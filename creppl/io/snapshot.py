@@ -0,0 +1,196 @@
+# creppl/io/snapshot.py
+
+import hashlib
+import json
+import os
+import time
+
+from creppl.io import COMPILER, WORKING_DIR
+from creppl.utils.helpers import toolchain_id
+
+"""Directory of the saved session manifests"""
+SESSION_DIR = WORKING_DIR + "/sessions"
+
+"""Number of input entries saved with a session"""
+MAX_HISTORY = 200
+
+"""Version of the manifest format; manifests of other versions are ignored"""
+MANIFEST_VERSION = 1
+
+
+def file_digest(path: str):
+    """
+    Returns the SHA-1 digest of a file.
+
+    Parameters
+    ----------
+    path: str
+        The path of the file
+
+    Returns
+    -------
+    Optional[str]
+        A hex digest, or None if the file cannot be read
+    """
+
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 16), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class SessionSnapshot:
+    """
+    The saved state of a REPL session, so that `creppl --resume` can continue it.
+
+    A snapshot is a JSON manifest in SESSION_DIR, named after the session file. It records the cursor, the write mode,
+    the attached translation units, the session's input history and the path of the last executable, with the digests
+    of the source, the units and the executable at the time it was saved. On resume, the executable is reused only if
+    all of them are unchanged and it was built by the same toolchain, so nothing is compiled until the session is
+    edited.
+
+    Attributes
+    ----------
+    name: str
+        The name of the session file, e.g. "main.cpp"
+    path: str
+        The path of the manifest
+
+    Methods
+    -------
+    latest(root: str) -> Optional[str]
+        Returns the name of the most recently saved session.
+    save(fileio: FileIO, history: List[str], units: List[str], binary_path: str)
+        Saves the state of the session.
+    load() -> Optional[dict]
+        Returns the saved manifest.
+    reusable_binary(manifest: dict, source_path: str, units: List[str]) -> Optional[str]
+        Returns the saved executable if it is still up to date.
+    """
+
+    def __init__(self, name: str, root=SESSION_DIR):
+        """
+        Parameters
+        ----------
+        name: str
+            The name of the session file. The .cpp extension may be omitted.
+        root: str
+            The directory of the manifests
+        """
+
+        self.name = name if name.endswith(".cpp") else name + ".cpp"
+        self.path = f"{root}/{self.name}.json"
+        self.__root = root
+
+    @staticmethod
+    def latest(root=SESSION_DIR):
+        """
+        Returns the name of the most recently saved session.
+
+        Parameters
+        ----------
+        root: str
+            The directory of the manifests
+
+        Returns
+        -------
+        Optional[str]
+            The name of the session file, or None if no session was saved
+        """
+
+        try:
+            with os.scandir(root) as entries:
+                manifests = [(entry.stat().st_mtime, entry.name) for entry in entries
+                             if entry.is_file() and entry.name.endswith(".cpp.json")]
+        except OSError:
+            return None
+        return max(manifests)[1][:-len(".json")] if len(manifests) > 0 else None
+
+    def save(self, fileio, history, units, binary_path: str):
+        """
+        Saves the state of the session.
+
+        Parameters
+        ----------
+        fileio: FileIO
+            The FileIO object of the session
+        history: List[str]
+            The inputs entered in the session, oldest first; the last MAX_HISTORY are saved
+        units: List[str]
+            The absolute paths of the attached translation units
+        binary_path: str
+            The path of the last executable, which must outlive the session
+        """
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "time": time.time(),
+            "source": file_digest(fileio.filepath),
+            "cursor": fileio.get_cursor(),
+            "write_mode": fileio.get_write_mode(),
+            "units": {unit: file_digest(unit) for unit in units},
+            "history": list(history)[-MAX_HISTORY:],
+            "toolchain": toolchain_id(COMPILER),
+            "binary": binary_path,
+            "binary_digest": file_digest(binary_path) if binary_path is not None else None,
+        }
+        os.makedirs(self.__root, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """
+        Returns the saved manifest.
+
+        Returns
+        -------
+        Optional[dict]
+            The manifest, or None if the session was not saved or the manifest is unreadable
+        """
+
+        try:
+            with open(self.path, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    @staticmethod
+    def reusable_binary(manifest: dict, source_path: str, units):
+        """
+        Returns the saved executable if it is still up to date.
+
+        Parameters
+        ----------
+        manifest: dict
+            The manifest returned by load()
+        source_path: str
+            The path of the session file
+        units: List[str]
+            The absolute paths of the translation units that are attached on resume
+
+        Returns
+        -------
+        Optional[str]
+            The path of the executable, or None if it is missing or the source, a unit or the toolchain has changed
+        """
+
+        binary = manifest.get("binary")
+        if binary is None or manifest.get("binary_digest") is None:
+            return None
+        if manifest.get("source") != file_digest(source_path) or manifest.get("toolchain") != toolchain_id(COMPILER):
+            return None
+        saved_units = manifest.get("units", {})
+        if sorted(saved_units) != sorted(units) or any(file_digest(unit) != saved_units[unit] for unit in units):
+            return None
+        if file_digest(binary) != manifest["binary_digest"]:
+            return None
+        return binary
@@ -1,31 +1,19 @@
 # creppl/io/terminal.py
 
+import atexit
+import os
+import select
+import signal
 import sys
 import termios
-import tty
+import threading
 import traceback
+from contextlib import contextmanager
 from typing import TextIO
 
-
-class KeyCode:
-    """
-    Keycodes used by Terminal
-    """
-    BKSP = 127
-    SIGINT = 3
-    ENTER = (10, 13)
-    PRCHR = range(ord(" "), ord("~") + 1)
-    # ANSI Codes
-    ESC = ord("\033")
-    # C0 Control Code
-    CLS = ESC + 12
-    # Xterm Sequences
-    UP = sum(map(ord, "\033[A"))
-    DOWN = sum(map(ord, "\033[B"))
-    RIGHT = sum(map(ord, "\033[C"))
-    LEFT = sum(map(ord, "\033[D"))
-    # VT Sequences
-    DEL = sum(map(ord, "\033[3~"))
+from creppl.io.decoder import Key, KeyDecoder, KeyEvent
+from creppl.io.editor import LineEditor
+from creppl.io.history import History
 
 
 class Terminal:
@@ -33,95 +21,360 @@ class Terminal:
     This class emulates a UNIX terminal which captures user input, maintains an input history, and writes output to
     display.
 
+    The terminal is put into raw mode once, the first time input is requested, and stays that way for the rest of the
+    session. The original settings are restored by release(), at interpreter exit, or when the process is terminated.
+
+    The input line is edited with a LineEditor, so a statement may span several lines (Alt+Enter starts a new one,
+    and pasted text keeps its lines). Lines longer than the terminal are soft-wrapped: the screen position of any
+    character is computed from the prompt width, the terminal width and the lengths of the lines before it, and only
+    the text from the first changed character onwards is redrawn, so a keystroke at the end of a long line writes a
+    single character. The editing keys follow readline:
+
+        Ctrl+A/Home, Ctrl+E/End     start/end of the line
+        Ctrl+B/Left, Ctrl+F/Right   one character left/right
+        Alt+B, Alt+F, Ctrl+Left/Right
+                                    one word left/right
+        Up, Down                    the line above/below, or the previous/next history entry
+        Ctrl+W, Alt+Backspace       delete the word before the cursor
+        Alt+D, Ctrl+Delete          delete the word after the cursor
+        Ctrl+U, Ctrl+K              delete to the start/end of the line
+        Ctrl+Y                      insert the text deleted last
+
     Attributes
     ----------
-    __MAX_HIST_LEN__: int
-        The max length of the input history list.
     __stdin: TextIO
         The input stream to acquire.
     __stdout: TextIO
         The output stream to direct output.
-    __old_in_fd: TextIO
-        The file descriptor of the original input stream.
-    __put_index: int
-        The index of the file where characters are inserted or added to the file.
-    __get_index: int
-        The index of the file where characters are retrieved.
+    __old_in_fd: list
+        The terminal attributes of the original input stream.
+    __history: History
+        The persistent input history. If None, the history is kept in memory only.
+    __hist_index: int
+        The position in the history of the entry shown by prev_hist()/next_hist(), or None past the newest entry.
+    __completer: Completer
+        Provides the candidates for Tab completion. If None, Tab is ignored.
+    __prompt: str
+        The prompt of the line being edited, or None when no line is being edited.
+    __lock: threading.RLock
+        Serialises writes to the stdout buffer between the input line and write_output().
+    __editor: LineEditor
+        The editor currently displayed after the prompt, or None if the display must be redrawn in full.
+    __row: int
+        The screen row of the cursor, relative to the first row of the prompt.
+    __col: int
+        The screen column of the cursor.
+    __width: int
+        The terminal width the display was laid out for.
+    __decoder: KeyDecoder
+        Decodes the raw input read from the stdin buffer.
+    __pending: List[KeyEvent]
+        Events read ahead of the end of the previous input line.
 
     Methods
     -------
     __acquire__(file_descr: str)
         Takes control of the stdin buffer to route all input to this Terminal.
+    __restore__()
+        Restores the original attributes of the stdin buffer, if they were changed.
     __print_except__()
         Prints the exception traceback using the original stdin buffer
+    __columns__() -> int
+        Returns the width of the terminal.
+    __locate__(editor: LineEditor, index: int) -> Tuple[int, int]
+        Returns the screen row and column of a position in the editor.
+    __render__(editor: LineEditor, full: bool)
+        Redraws the changed part of the input in a single write.
+    __read_events__() -> List[KeyEvent]
+        Reads the next chunk of input and returns the decoded key events.
+    is_acquired() -> bool
+        Returns whether the Terminal is in raw mode.
     release()
         Returns control of the stdin buffer to its original state.
+    suspended()
+        Context manager that temporarily returns the stdin buffer to its original state.
     set_stdin(stdin: TextIO)
         Sets the stdin buffer to use for the current session.
     set_stdout(stdout: TextIO)
         Sets the stdout buffer to use for the current session.
-    stdin_read(n_char: int) -> Any
-        Returns n characters from the stdin buffer.
+    stdin_read(n_bytes: int) -> bytes
+        Waits for input and returns up to n bytes from the stdin buffer in a single read.
     stdout_write(out_str: Any)
         Writes to the stdout buffer.
     stdout_flush()
         Flushes the stdout buffer.
+    write_output(out_str: str)
+        Writes output from another thread above the line being edited.
     put(in_str)
         Inserts the string into the history list for later retrieval.
     prev_hist() -> str
         Gets the previous entry in the history list (if available) and prints it to the Terminal.
     next_hist() -> str
         Gets the next entry in the history list (if available) and prints it to the Terminal.
+    reverse_search(events: List[KeyEvent]) -> Tuple[str, bool]
+        Runs an incremental reverse search of the history, started by Ctrl+R.
+    complete(editor: LineEditor, listing: bool)
+        Completes the word before the cursor, or lists the candidates.
+    page(fetch: Callable[[int, int, int], List[str]], first: int, last: int)
+        Shows a range of lines a screen at a time.
     input(prompt: str)
         Handles capturing input from the Terminal with optional message prompt.
     """
 
-    __MAX_HIST_LEN__ = 100
-    __old_in_fd = TextIO
+    __ESC_TIMEOUT__ = 0.05
+    __READ_SIZE__ = 4096
+    __old_in_fd = None
     __stdin = TextIO
     __stdout = TextIO
 
-    def __init__(self):
-        self.__hist_list = [""] * self.__MAX_HIST_LEN__
-        self.__put_index = 0
-        self.__get_index = -1
+    def __init__(self, history: History = None, completer=None):
+        """
+        Parameters
+        ----------
+        history: History
+            The persistent input history to use. It is loaded in the background.
+        completer: Completer
+            Provides the candidates for Tab completion
+        """
+
+        self.__completer = completer
+        self.__prompt = None
+        self.__lock = threading.RLock()
+        self.__history = history if history is not None else History(os.devnull)
+        self.__history.preload()
+        self.__hist_index = None
+        self.__editor = None
+        self.__row = 0
+        self.__col = 0
+        self.__width = 80
+        self.__decoder = KeyDecoder()
+        self.__pending = []
+        self.__stdout = sys.stdout
+        atexit.register(self.__restore__)
+        for signum in (signal.SIGTERM, signal.SIGHUP):
+            if signal.getsignal(signum) in (signal.SIG_DFL, None):
+                signal.signal(signum, self.__on_terminate__)
 
     def __acquire__(self, file_descr):
         """
         Takes control of the stdin buffer to route all input to this Terminal.
 
+        The line discipline, echo and signal keys are disabled, but output post-processing is kept so that anything
+        printed while the session is active still translates '\\n' into a new line. Bracketed paste is enabled so
+        pasted text can be told apart from typed keys.
+
         Parameter
         ---------
         file_descr: IO[str]
             The file descriptor of the stdin buffer to control
         """
 
-        self.__old_in_fd = termios.tcgetattr(file_descr.fileno())
-        tty.setraw(file_descr)
-        tty.setcbreak(True)
         self.__stdin = file_descr
+        if self.__old_in_fd is not None:
+            return
+
+        fd = file_descr.fileno()
+        self.__old_in_fd = termios.tcgetattr(fd)
+        mode = termios.tcgetattr(fd)
+        mode[0] &= ~(termios.BRKINT | termios.ICRNL | termios.INPCK | termios.ISTRIP | termios.IXON)
+        mode[2] |= termios.CS8
+        mode[3] &= ~(termios.ECHO | termios.ICANON | termios.IEXTEN | termios.ISIG)
+        mode[6][termios.VMIN] = 1
+        mode[6][termios.VTIME] = 0
+        termios.tcsetattr(fd, termios.TCSADRAIN, mode)
+        self.__set_bracketed_paste__(True)
+
+    def __restore__(self):
+        """
+        Restores the original attributes of the stdin buffer, if they were changed.
+        """
+
+        if self.__old_in_fd is None:
+            return
+        self.__set_bracketed_paste__(False)
+        try:
+            termios.tcsetattr(self.__stdin.fileno(), termios.TCSADRAIN, self.__old_in_fd)
+        except (termios.error, ValueError):
+            pass
+        self.__old_in_fd = None
+
+    def __set_bracketed_paste__(self, enable: bool):
+        """
+        Turns the terminal's bracketed paste mode on or off.
+        """
+
+        try:
+            if self.__stdout.isatty():
+                self.__stdout.write("\033[?2004h" if enable else "\033[?2004l")
+                self.__stdout.flush()
+        except (AttributeError, ValueError):
+            pass
+
+    def __on_terminate__(self, signum, _frame):
+        """
+        Restores the terminal and re-delivers the signal with its default action.
+        """
+
+        self.__restore__()
+        signal.signal(signum, signal.SIG_DFL)
+        signal.raise_signal(signum)
 
     def __print_except___(self):
         """
         Prints the exception traceback using the original stdin buffer
         """
 
-        stdin_backup = self.__stdin
-        stdout_backup = self.__stdout
-        self.release()
-        traceback.print_exc()
-        self.set_stdin(stdin_backup)
-        self.set_stdout(stdout_backup)
+        with self.suspended():
+            traceback.print_exc()
+
+    def __columns__(self):
+        """
+        Returns the width of the terminal, or 80 if it is unknown.
+        """
+
+        try:
+            return os.get_terminal_size(self.__stdout.fileno()).columns or 80
+        except (OSError, ValueError, AttributeError):
+            return 80
+
+    def __locate__(self, editor: LineEditor, index: int):
+        """
+        Returns the screen row and column of a position in the editor, relative to the first row of the prompt.
+
+        Every line of the editor starts after a prompt of the same width and wraps at the terminal width, so a line of
+        length n takes (width of the prompt + n) // width + 1 rows.
+        """
+
+        width = self.__width
+        offset = len(self.__prompt or "")
+        line, column = editor.position(index)
+        row = sum((offset + editor.line_length(pos)) // width + 1 for pos in range(line))
+        return row + (offset + column) // width, (offset + column) % width
+
+    @staticmethod
+    def __motion__(row: int, col: int, to_row: int, to_col: int):
+        """
+        Returns the escape sequences that move the cursor from one screen position to another.
+        """
+
+        motion = []
+        if to_row < row:
+            motion.append(f"\033[{row - to_row}A")
+        elif to_row > row:
+            motion.append(f"\033[{to_row - row}B")
+        if to_col == 0 and col != 0:
+            motion.append("\r")
+        elif to_col < col:
+            motion.append(f"\033[{col - to_col}D")
+        elif to_col > col:
+            motion.append(f"\033[{to_col - col}C")
+        return "".join(motion)
+
+    def __render__(self, editor: LineEditor, full=False):
+        """
+        Redraws the changed part of the input in a single write.
+
+        Only the text from the first position the editor reports as changed is rewritten; the cursor is moved with
+        relative motions. A line that ends exactly at the right margin is followed by a space and a carriage return,
+        so the cursor wraps to the next row as it would for any other line. The prompt is redrawn only if full is
+        True, the editor is not the one displayed, or the terminal width has changed.
+
+        Parameters
+        ----------
+        editor: LineEditor
+            The editor to display
+        full: bool
+            Whether to redraw the prompt and the whole input
+        """
+
+        with self.__lock:
+            width = self.__columns__()
+            if editor is not self.__editor or width != self.__width:
+                full = True
+            prompt = self.__prompt or ""
+            continuation = ("..." + " " * len(prompt))[:len(prompt)]
+            frame = []
+            dirty = editor.take_dirty()
+            row, col = self.__row, self.__col
+            if full:
+                frame.append(self.__motion__(row, col, 0, col) + "\r" + prompt)
+                self.__width = width
+                self.__editor = editor
+                dirty = 0
+                row, col = self.__locate__(editor, 0)
+            if dirty is not None:
+                to_row, to_col = self.__locate__(editor, dirty)
+                frame.append(self.__motion__(row, col, to_row, to_col))
+                line, _ = editor.position(dirty)
+                start = dirty
+                while True:
+                    end = editor.line_start(line) + editor.line_length(line)
+                    frame.append(editor.slice(start, end))
+                    if (len(prompt) + editor.line_length(line)) % width == 0:
+                        frame.append(" \r")
+                    if line + 1 >= editor.line_count():
+                        break
+                    frame.append("\033[K\n" + continuation)
+                    line += 1
+                    start = end + 1
+                frame.append("\033[J")
+                row, col = self.__locate__(editor, len(editor))
+            to_row, to_col = self.__locate__(editor, editor.cursor())
+            frame.append(self.__motion__(row, col, to_row, to_col))
+            self.__row, self.__col = to_row, to_col
+
+            frame = "".join(frame)
+            if len(frame) > 0:
+                self.stdout_write(frame)
+                self.stdout_flush()
+
+    def __end_line__(self):
+        """
+        Moves to a new line and marks the input line as no longer being edited.
+        """
+
+        with self.__lock:
+            self.__prompt = None
+            self.__editor = None
+            self.__row = self.__col = 0
+            self.stdout_write("\n")
+            self.stdout_flush()
+
+    def is_acquired(self):
+        """
+        Returns whether the Terminal is in raw mode.
+
+        Returns
+        -------
+        bool
+            True if the stdin buffer is controlled by this Terminal, otherwise False
+        """
+
+        return self.__old_in_fd is not None
 
     def release(self):
         """
         Returns control of the stdin buffer to its original state.
         """
 
-        self.__stdout.write(f"\033[1000D")
-        self.__stdout = None
-        tty.setcbreak(False)
-        termios.tcsetattr(0, termios.TCSAFLUSH, self.__old_in_fd)
+        self.__restore__()
+
+    @contextmanager
+    def suspended(self):
+        """
+        Temporarily returns control of the stdin buffer to its original state, e.g. for the builtin input().
+
+        The Terminal is acquired again on exit if it was acquired on entry.
+        """
+
+        stdin = self.__stdin
+        acquired = self.is_acquired()
+        self.__restore__()
+        try:
+            yield
+        finally:
+            if acquired:
+                self.__acquire__(stdin)
 
     def set_stdin(self, stdin: TextIO):
         """
@@ -147,27 +400,60 @@ class Terminal:
 
         self.__stdout = stdout
 
-    def stdin_read(self, n_char=0):
+    def stdin_read(self, n_bytes=__READ_SIZE__):
         """
-        Returns n characters from the stdin buffer.
+        Waits for input and returns up to n bytes from the stdin buffer in a single read.
 
         Parameter
         ---------
-        n_char: int
-            The number of characters to read and returned from the buffer. If empty, the entire contents of the
-            buffer will be returned.
+        n_bytes: int
+            The maximum number of bytes to read
 
         Returns
         -------
-        str
-            A string of n_char characters, or len(stdin) characters
+        bytes
+            The bytes available in the buffer, or an empty bytes object at end of file
+        """
+
+        fd = self.__stdin.fileno()
+        select.select([fd], [], [])
+        return os.read(fd, n_bytes)
 
+    def __read_events__(self):
         """
+        Reads the next chunk of input and returns the decoded key events.
+
+        If the chunk ends inside an escape sequence, the rest of the sequence is waited for briefly before a lone
+        escape is assumed.
+
+        Raises
+        ------
+        EOFError
+            If the stdin buffer is closed
 
-        if n_char == 0:
-            return self.__stdin.read()
+        Returns
+        -------
+        List[KeyEvent]
+            The decoded events
+        """
 
-        return self.__stdin.read(n_char)
+        if self.__pending:
+            events, self.__pending = self.__pending, []
+            return events
+
+        data = self.stdin_read()
+        if not data:
+            raise EOFError
+        events = self.__decoder.feed(data)
+        fd = self.__stdin.fileno()
+        while self.__decoder.pending():
+            ready, _, _ = select.select([fd], [], [], self.__ESC_TIMEOUT__)
+            data = os.read(fd, self.__READ_SIZE__) if ready else b""
+            if not data:
+                events += self.__decoder.flush()
+                break
+            events += self.__decoder.feed(data)
+        return events
 
     def stdout_write(self, out_str):
         """
@@ -188,6 +474,31 @@ class Terminal:
 
         self.__stdout.flush()
 
+    def write_output(self, out_str: str):
+        """
+        Writes output from another thread above the line being edited.
+
+        If a line is being edited, it is cleared, the output is written, and the prompt and line are redrawn below it
+        with the cursor where it was. Otherwise, the output is written as-is.
+
+        Parameter
+        ---------
+        out_str: str
+            The output to write
+        """
+
+        with self.__lock:
+            if self.__prompt is None:
+                self.stdout_write(out_str)
+                self.stdout_flush()
+                return
+            if len(out_str) > 0 and not out_str.endswith("\n"):
+                out_str += "\n"
+            self.stdout_write(self.__motion__(self.__row, self.__col, 0, self.__col) + "\r\033[J" + out_str)
+            self.__row = self.__col = 0
+            if self.__editor is not None:
+                self.__render__(self.__editor, full=True)
+
     def put(self, in_str):
         """
         Inserts the string into the history list for later retrieval
@@ -199,12 +510,10 @@ class Terminal:
         """
 
         try:
-            # noinspection PyTypeChecker
-            self.__hist_list[self.__put_index] = in_str
-            self.__get_index = self.__put_index
-            self.__put_index = ((self.__put_index + 1) % self.__MAX_HIST_LEN__)
+            self.__history.add(in_str)
         except Exception:
             self.__print_except___()
+        self.__hist_index = None
 
     def prev_hist(self):
         """
@@ -216,16 +525,10 @@ class Terminal:
             A string containing the previous history list entry, if found. Otherwise, an empty string
         """
 
-        entry = ""
-        try:
-            if len(self.__hist_list[self.__get_index]) != 0:
-                entry = self.__hist_list[self.__get_index]
-                self.__get_index = ((self.__get_index - 1) % self.__MAX_HIST_LEN__)
-            else:
-                entry = self.next_hist()
-        except Exception:
-            self.__print_except___()
-        return entry
+        if self.__hist_index is None:
+            self.__hist_index = self.__history.size()
+        self.__hist_index = max(0, self.__hist_index - 1)
+        return self.__history.get(self.__hist_index)
 
     def next_hist(self):
         """
@@ -237,17 +540,200 @@ class Terminal:
             A string containing the next history list entry, if found. Otherwise, an empty string
         """
 
-        entry = ""
+        if self.__hist_index is None:
+            return ""
+        self.__hist_index += 1
+        if self.__hist_index >= self.__history.size():
+            self.__hist_index = None
+            return ""
+        return self.__history.get(self.__hist_index)
+
+    def reverse_search(self, events: list):
+        """
+        Runs an incremental reverse search of the history, started by Ctrl+R.
+
+        Typing refines the query and Ctrl+R steps to the next older match. Enter accepts and submits the match, any
+        motion key accepts it for editing, and Ctrl+G or Esc cancels the search.
+
+        Parameters
+        ----------
+        events: List[KeyEvent]
+            The events that followed Ctrl+R in the same chunk of input
+
+        Raises
+        ------
+        KeyboardInterrupt
+            If the user enters Ctrl+C
+
+        Returns
+        -------
+        Tuple[str, bool]
+            The accepted entry, or None if the search was cancelled, and whether it was submitted with Enter
+        """
+
+        history = self.__history
+        display = LineEditor()
+        query = ""
+        position = history.size()
+        match = ""
+        failed = False
+
+        while True:
+            for pos, event in enumerate(events):
+                key = event.key
+                if key == Key.SIGINT:
+                    self.__end_line__()
+                    raise KeyboardInterrupt
+                elif key in (Key.CANCEL, Key.ESC):
+                    self.__pending = events[pos + 1:]
+                    return None, False
+                elif key == Key.ENTER:
+                    self.__pending = events[pos + 1:]
+                    return match, True
+                elif key in (Key.TEXT, Key.PASTE, Key.BKSP, Key.SEARCH):
+                    if key == Key.SEARCH:
+                        start = position
+                    else:
+                        if key == Key.BKSP:
+                            query = query[:-1]
+                        else:
+                            query += event.text.replace("\n", " ")
+                        start = history.size()
+                    found = history.search(query, start) if len(query) > 0 else -1
+                    failed = found == -1 and len(query) > 0
+                    if found != -1:
+                        position = found
+                        match = history.get(found)
+                else:
+                    self.__pending = events[pos:]
+                    return match, False
+
+            label = "failed reverse-i-search" if failed else "reverse-i-search"
+            display.set(f"({label})`{query}': {match}", len(label) + len(query) + 4)
+            self.__render__(display)
+            events = self.__read_events__()
+
+    def complete(self, editor: LineEditor, listing: bool):
+        """
+        Completes the word before the cursor, or lists the candidates.
+
+        The word is extended to the longest prefix shared by all candidates. If it cannot be extended and listing is
+        True (i.e. Tab was pressed twice), the candidates are printed below the input and the input is redrawn.
+
+        Parameters
+        ----------
+        editor: LineEditor
+            The editor of the input
+        listing: bool
+            Whether to list the candidates if the word cannot be extended
+        """
+
+        if self.__completer is None:
+            return
+
+        index = editor.cursor()
+        start, words = self.__completer.candidates(editor.text(), index)
+        if len(words) == 0:
+            return
+
+        common = os.path.commonprefix(words)
+        if len(common) > index - start:
+            editor.replace(start, index, common)
+            return
+
+        if listing and len(words) > 1:
+            columns = self.__columns__()
+            limit = 200
+            width = max(map(len, words[:limit])) + 2
+            per_row = max(1, columns // width)
+            rows = ["".join(word.ljust(width) for word in words[i:i + per_row]).rstrip()
+                    for i in range(0, min(len(words), limit), per_row)]
+            if len(words) > limit:
+                rows.append(f"... and {len(words) - limit} more")
+            with self.__lock:
+                to_row, to_col = self.__locate__(editor, len(editor))
+                self.stdout_write(self.__motion__(self.__row, self.__col, to_row, to_col))
+                self.stdout_write("\n" + "\n".join(rows) + "\n")
+                self.__row = self.__col = 0
+                self.__editor = None
+
+    def page(self, fetch, first: int, last: int):
+        """
+        Shows a range of lines a screen at a time, fetching only the lines of the screen being shown.
+
+        The page is redrawn in place below a status line. Space, PgDn or f shows the next page, and Space on the last
+        page closes the pager; b or PgUp shows the previous page, Enter, Down or j and Up or k scroll by a line, g or
+        Home and G or End go to the first and last page, and q, Esc or Ctrl+C close it. The last page shown is left
+        on the screen. Output from the build worker waits until the pager is closed. If the range fits on the screen,
+        or the Terminal is not in raw mode, the lines are written as they are.
+
+        Parameters
+        ----------
+        fetch: Callable[[int, int, int], List[str]]
+            Returns the display lines of the line numbers from start to end, included, each cut to a number of
+            characters so it takes a single row
+        first: int
+            The line number of the first line
+        last: int
+            The line number of the last line
+        """
+
         try:
-            self.__get_index = ((self.__get_index + 1) % self.__MAX_HIST_LEN__)
-            if len(self.__hist_list[self.__get_index]) != 0:
-                entry = self.__hist_list[self.__get_index]
-            else:
-                self.__get_index = ((self.__get_index - 1) % self.__MAX_HIST_LEN__)
-        except Exception:
-            self.__print_except___()
-            self.__get_index = ((self.__get_index - 1) % self.__MAX_HIST_LEN__)
-        return entry
+            columns, rows = os.get_terminal_size(self.__stdout.fileno())
+        except (OSError, ValueError, AttributeError):
+            columns, rows = 80, 24
+        # Terminals without a window size, e.g. some serial consoles, report 0
+        columns, rows = columns or 80, rows or 24
+        height = max(1, rows - 1)
+        if last - first + 1 <= height or not self.is_acquired():
+            for start in range(first, last + 1, height):
+                self.stdout_write("".join(line + "\n" for line in fetch(start, min(last, start + height - 1), None)))
+            self.stdout_flush()
+            return
+
+        bottom = last - height + 1
+        top = first
+        shown = 0
+        redraw = True
+        with self.__lock:
+            while True:
+                if redraw:
+                    lines = fetch(top, top + height - 1, columns)
+                    status = f" lines {top}-{top + len(lines) - 1} of {last}  Space/b: page, Up/Down: line, " \
+                             f"g/G: first/last, q: quit "[:columns]
+                    # The status line is the row below the page, so the page starts shown rows above it
+                    self.stdout_write("\r" + (f"\033[{shown}A" if shown > 0 else "") + "\033[J" +
+                                      "".join(line + "\n" for line in lines) + f"\033[7m{status}\033[0m")
+                    self.stdout_flush()
+                    shown = len(lines)
+
+                try:
+                    events = self.__read_events__()
+                except EOFError:
+                    events = [KeyEvent(Key.EOF)]
+                keys = []
+                for event in events:
+                    keys.extend(event.text if event.key == Key.TEXT else [event.key])
+                previous = top
+                for key in keys:
+                    if key in ("q", "Q", Key.ESC, Key.SIGINT, Key.EOF) or (key == " " and top == bottom):
+                        self.stdout_write("\r\033[K")
+                        self.stdout_flush()
+                        return
+                    elif key in (" ", "f", Key.PAGE_DOWN):
+                        top += height
+                    elif key in ("b", Key.PAGE_UP):
+                        top -= height
+                    elif key in ("j", Key.ENTER, Key.DOWN):
+                        top += 1
+                    elif key in ("k", Key.UP):
+                        top -= 1
+                    elif key in ("g", Key.HOME):
+                        top = first
+                    elif key in ("G", Key.END):
+                        top = bottom
+                    top = max(first, min(bottom, top))
+                redraw = top != previous
 
     def input(self, prompt=""):
         """
@@ -273,73 +759,101 @@ class Terminal:
         """
 
         # TODO: prompt + selected line
-        print(prompt, end="")
+        self.set_stdin(sys.stdin)
+        self.set_stdout(sys.stdout)
 
         while True:
-            self.set_stdin(sys.stdin)
-            self.set_stdout(sys.stdout)
-            self.stdout_flush()
-
-            input_str = ""
-            index = 0
-            while True:
-                char = ord(self.stdin_read(1))
-
-                if char == KeyCode.SIGINT:
-                    self.release()
-                    raise KeyboardInterrupt
-                elif char in KeyCode.PRCHR:
-                    input_str = input_str[:index] + chr(char) + input_str[index:]
-                    index += 1
-                elif char in KeyCode.ENTER:
-                    self.release()
-                    print(prompt + input_str)
-                    self.put(input_str)
-                    yield input_str
-                    break
-                elif char == KeyCode.BKSP:
-                    index = max(1, index)
-                    input_str = input_str[:index - 1] + input_str[index:]
-                    index -= 1
-                elif char != KeyCode.ESC:
-                    continue
-                else:
-                    csi = char + ord(sys.stdin.read(1)) + ord(sys.stdin.read(1))
-
-                    if csi == KeyCode.LEFT:
-                        index = max(0, index - 1)
-                    elif csi == KeyCode.RIGHT:
-                        index = min(len(input_str), index + 1)
-                    elif csi == KeyCode.UP:
-                        input_str = self.prev_hist()
-                        index = len(input_str)
-                    elif csi == KeyCode.DOWN:
-                        input_str = self.next_hist()
-                        index = len(input_str)
-                    else:
-                        next_char = sys.stdin.read(1)
-                        csi = csi + ord(next_char)
-                        if csi == KeyCode.DEL:
-                            input_str = input_str[:index] + input_str[index + 1:]
+            editor = LineEditor()
+            with self.__lock:
+                self.stdout_write(prompt)
+                self.stdout_flush()
+                self.__prompt = prompt
+                self.__editor = editor
+                self.__width = self.__columns__()
+                self.__row, self.__col = self.__locate__(editor, 0)
+
+            submitted = False
+            last_key = None
+            while not submitted:
+                events = self.__read_events__()
+                for pos, event in enumerate(events):
+                    key = event.key
+                    last_key, prev_key = key, last_key
+                    if key == Key.SIGINT:
+                        self.__end_line__()
+                        raise KeyboardInterrupt
+                    elif key == Key.TEXT and event.alt:
+                        if event.text == "b":
+                            editor.word_left()
+                        elif event.text == "f":
+                            editor.word_right()
+                        elif event.text == "d":
+                            editor.kill_word_forward()
+                    elif key in (Key.TEXT, Key.PASTE):
+                        editor.insert(event.text)
+                    elif key == Key.ENTER and event.alt:
+                        editor.insert("\n")
+                    elif key == Key.ENTER:
+                        self.__pending = events[pos + 1:]
+                        submitted = True
+                        break
+                    elif key == Key.BKSP:
+                        if event.alt or event.ctrl:
+                            editor.kill_word_back()
+                        else:
+                            editor.backspace()
+                    elif key == Key.DEL:
+                        if event.alt or event.ctrl:
+                            editor.kill_word_forward()
                         else:
-                            sys.stdin.write(next_char)
+                            editor.delete()
+                    elif key == Key.LEFT:
+                        if event.alt or event.ctrl:
+                            editor.word_left()
+                        else:
+                            editor.left()
+                    elif key == Key.RIGHT:
+                        if event.alt or event.ctrl:
+                            editor.word_right()
+                        else:
+                            editor.right()
+                    elif key == Key.HOME:
+                        editor.home()
+                    elif key == Key.END:
+                        editor.end()
+                    elif key == Key.KILL_END:
+                        editor.kill_end()
+                    elif key == Key.KILL_START:
+                        editor.kill_start()
+                    elif key == Key.KILL_WORD:
+                        editor.kill_word_back()
+                    elif key == Key.YANK:
+                        editor.yank()
+                    elif key == Key.UP:
+                        if not editor.up():
+                            editor.set(self.prev_hist())
+                    elif key == Key.DOWN:
+                        if not editor.down():
+                            editor.set(self.next_hist())
+                    elif key == Key.TAB:
+                        self.complete(editor, prev_key == Key.TAB)
+                    elif key == Key.SEARCH:
+                        found, submitted = self.reverse_search(events[pos + 1:])
+                        if found is not None:
+                            editor.set(found)
+                        break
 
                 # Print current input-string
                 try:
-                    # Move all the way left and move to the end of the prompt
-                    self.stdout_write(f"\033[1000D")
-                    self.stdout_write(f"\033[{str(len(prompt))}C")
-                    # Clear to the line
-                    self.stdout_write("\033[0K")
-                    self.stdout_write(input_str)
-                    # Move all the way left again
-                    self.stdout_write("\033[1000D")
-                    self.stdout_write(f"\033[{str(len(prompt))}C")
-                    if index > 0:
-                        # Move cursor to index
-                        self.stdout_write(f"\033[{index}C")
-                    self.stdout_flush()
+                    if submitted:
+                        editor.move(len(editor))
+                    self.__render__(editor)
                 except Exception:
                     self.release()
                     traceback.print_exc()
-                    break
+                    return
+
+            input_str = editor.text()
+            self.__end_line__()
+            self.put(input_str)
+            yield input_str
@@ -0,0 +1,252 @@
+# creppl/io/watch.py
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+"""Time without further changes after which a burst of changes is reported, in seconds"""
+DEBOUNCE = 0.2
+
+"""Interval between two checks of the watched files when inotify is not available, in seconds"""
+POLL_INTERVAL = 0.25
+
+"""Interval at which the list of watched files is refreshed, in seconds"""
+REFRESH_INTERVAL = 1.0
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """
+    Returns the C library if it provides inotify, otherwise None.
+    """
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def _file_stat(path: str):
+    """
+    Returns the modification time, size and inode of a file, or None if it does not exist.
+    """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class SourceWatcher:
+    """
+    Watches files for changes made by other programs, such as an editor, on a background thread.
+
+    The directories of the files are watched with inotify, through the C library, so that editors which save by
+    writing a new file and renaming it over the old one are noticed as well. Without inotify, the files are polled
+    with stat() every POLL_INTERVAL. A burst of changes, such as an editor writing a file in several steps or saving
+    several files, is reported once, DEBOUNCE after the last change.
+
+    Attributes
+    ----------
+    __paths: Callable[[], List[str]]
+        Returns the absolute paths of the files to watch; called again every REFRESH_INTERVAL
+    __on_change: Callable[[Set[str]], None]
+        Called on the watcher thread with the paths that changed
+    __stop: threading.Event
+        Set to stop the watcher thread
+    __thread: threading.Thread
+        The watcher thread, while the watcher is started
+    __inotify: bool
+        Whether the watcher thread uses inotify
+
+    Methods
+    -------
+    start()
+        Starts watching the files.
+    stop()
+        Stops watching the files.
+    watching() -> bool
+        Returns whether the watcher is started.
+    uses_inotify() -> bool
+        Returns whether changes are noticed through inotify rather than by polling.
+    """
+
+    def __init__(self, paths, on_change):
+        """
+        Parameters
+        ----------
+        paths: Callable[[], List[str]]
+            Returns the absolute paths of the files to watch
+        on_change: Callable[[Set[str]], None]
+            Called on the watcher thread with the paths that changed
+        """
+
+        self.__paths = paths
+        self.__on_change = on_change
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__inotify = False
+
+    def start(self):
+        """
+        Starts watching the files. Does nothing if the watcher is started already.
+        """
+
+        if self.watching():
+            return
+        self.__stop = threading.Event()
+        libc = _load_inotify()
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC) if libc is not None else -1
+        self.__inotify = fd >= 0
+        if self.__inotify:
+            target, args = self.__inotify_loop__, (self.__stop, libc, fd)
+        else:
+            target, args = self.__poll_loop__, (self.__stop,)
+        self.__thread = threading.Thread(target=target, args=args, name="creppl-watch", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops watching the files. A burst of changes that has not been reported yet is dropped.
+        """
+
+        self.__stop.set()
+        self.__thread = None
+
+    def watching(self):
+        """
+        Returns whether the watcher is started.
+
+        Returns
+        -------
+        bool
+            True if the watcher is started, otherwise False
+        """
+
+        return self.__thread is not None
+
+    def uses_inotify(self):
+        """
+        Returns whether changes are noticed through inotify rather than by polling.
+
+        Returns
+        -------
+        bool
+            True if the watcher is started and uses inotify, otherwise False
+        """
+
+        return self.watching() and self.__inotify
+
+    def __watched__(self):
+        """
+        Returns the absolute paths of the files to watch, ignoring errors of the paths callable.
+        """
+
+        try:
+            return {os.path.abspath(path) for path in self.__paths()}
+        except Exception:
+            return set()
+
+    def __report__(self, stop: threading.Event, changed):
+        """
+        Reports a burst of changes, unless the watcher was stopped in the meantime.
+        """
+
+        if len(changed) > 0 and not stop.is_set():
+            try:
+                self.__on_change(set(changed))
+            except Exception as _ex:
+                print(f'Exception: {_ex}.')
+
+    def __inotify_loop__(self, stop: threading.Event, libc, fd: int):
+        """
+        Watches the directories of the files with inotify until stop is set.
+        """
+
+        watches = {}
+        paths = set()
+        refreshed = 0.0
+        changed = set()
+        deadline = None
+        try:
+            while not stop.is_set():
+                now = time.monotonic()
+                if now - refreshed >= REFRESH_INTERVAL:
+                    paths = self.__watched__()
+                    directories = {os.path.dirname(path) for path in paths}
+                    for directory in set(watches) - directories:
+                        libc.inotify_rm_watch(fd, watches.pop(directory))
+                    for directory in directories - set(watches):
+                        wd = libc.inotify_add_watch(fd, directory.encode(), _IN_MASK)
+                        if wd >= 0:
+                            watches[directory] = wd
+                    refreshed = now
+                timeout = POLL_INTERVAL if deadline is None else max(0.0, deadline - now)
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if len(readable) == 0:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self.__report__(stop, changed)
+                        changed.clear()
+                        deadline = None
+                    continue
+                try:
+                    buf = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                directories = {wd: directory for directory, wd in watches.items()}
+                pos = 0
+                while pos + _EVENT.size <= len(buf):
+                    wd, _, _, length = _EVENT.unpack_from(buf, pos)
+                    name = buf[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0").decode(errors="replace")
+                    pos += _EVENT.size + length
+                    if wd in directories:
+                        path = os.path.join(directories[wd], name)
+                        if path in paths:
+                            changed.add(path)
+                            deadline = time.monotonic() + DEBOUNCE
+        finally:
+            os.close(fd)
+
+    def __poll_loop__(self, stop: threading.Event):
+        """
+        Polls the modification time, size and inode of the files until stop is set.
+        """
+
+        paths = set()
+        stats = {}
+        refreshed = 0.0
+        changed = set()
+        deadline = None
+        while not stop.wait(POLL_INTERVAL):
+            now = time.monotonic()
+            if now - refreshed >= REFRESH_INTERVAL:
+                paths = self.__watched__()
+                stats = {path: stats[path] if path in stats else _file_stat(path) for path in paths}
+                refreshed = now
+            for path in paths:
+                stat = _file_stat(path)
+                if stat != stats[path]:
+                    stats[path] = stat
+                    changed.add(path)
+                    deadline = now + DEBOUNCE
+            if deadline is not None and now >= deadline:
+                self.__report__(stop, changed)
+                changed.clear()
+                deadline = None
@@ -0,0 +1,559 @@
+# creppl/proc/build.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from creppl.io import COMPILER, CPP_STANDARD
+from creppl.proc.workspace import BuildWorkspace, runtime_dir
+from creppl.utils.helpers import toolchain_id
+
+"""Directory of the shared, content-addressed executable store"""
+ARTIFACT_DIR = runtime_dir() + "/artifacts"
+
+"""Directory of the recorded dependencies of each source file"""
+DEPS_DIR = runtime_dir() + "/deps"
+
+"""Directory of the shared object store of extra translation units"""
+OBJECT_DIR = runtime_dir() + "/objects"
+
+"""Default flags passed to the compiler; -pipe keeps the intermediate files between stages in memory"""
+DEFAULT_FLAGS = (f"-std=c++{CPP_STANDARD}", "-pipe")
+
+
+def build_key(source: bytes, flags, dependencies=(), compiler=COMPILER):
+    """
+    Returns the cache key of an executable built from source with flags by the installed toolchain.
+
+    Parameters
+    ----------
+    source: bytes
+        The contents of the translation unit
+    flags: Iterable[str]
+        The compiler flags
+    dependencies: Iterable[Tuple[str, str]]
+        The path and content digest of each header the translation unit includes, if they are tracked
+    compiler: str
+        The compiler executable
+
+    Returns
+    -------
+    str
+        A hex digest
+    """
+
+    digest = hashlib.sha1()
+    digest.update(toolchain_id(compiler).encode())
+    for flag in flags:
+        digest.update(b"\0" + flag.encode())
+    digest.update(b"\0\0" + source)
+    for path, file_digest in dependencies:
+        digest.update(f"\0\0{path}\0{file_digest}".encode())
+    return digest.hexdigest()
+
+
+def parse_depfile(text: str):
+    """
+    Returns the prerequisites listed in a make rule written by the compiler's -MMD, in order.
+
+    Parameters
+    ----------
+    text: str
+        The depfile contents
+
+    Returns
+    -------
+    List[str]
+        The paths, including the source file itself
+    """
+
+    text = text.replace("\\\n", " ")
+    if ":" not in text:
+        return []
+    # The first line is the rule for the target; with -MP, empty rules for each header follow it
+    rule = text.split("\n", 1)[0]
+    rule = rule[rule.find(": ") + 2 if ": " in rule else rule.find(":") + 1:]
+    paths, current, escaped = [], "", False
+    for char in rule:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char.isspace():
+            if len(current) > 0:
+                paths.append(current)
+            current = ""
+        else:
+            current += char
+    if len(current) > 0:
+        paths.append(current)
+    return paths
+
+
+class DependencyTracker:
+    """
+    Tracks the user headers that each source file includes, as reported by the compiler's -MMD depfiles.
+
+    The dependencies recorded by the last successful build of a source are kept in DEPS_DIR and are part of the build
+    key of the next build, so an executable is reused only if neither the source nor any header it includes changed.
+    Digests of headers are memoised by modification time and size, so unchanged headers are not read again.
+
+    Attributes
+    ----------
+    __root: str
+        The directory of the dependency records
+    __digests: Dict[str, Tuple[int, int, str]]
+        The modification time, size and digest of each header that has been hashed
+    __lock: threading.Lock
+        Guards __digests
+
+    Methods
+    -------
+    dependencies(source_path: str) -> Dict[str, str]
+        Returns the headers recorded for a source file, with their digests at that build.
+    digest(path: str) -> str
+        Returns the content digest of a file.
+    key_dependencies(source_path: str) -> List[Tuple[str, str]]
+        Returns the recorded headers of a source file with their current digests.
+    record(source_path: str, depfile: str)
+        Records the headers listed in a depfile for a source file.
+    """
+
+    def __init__(self, root=DEPS_DIR):
+        """
+        Parameters
+        ----------
+        root: str
+            The directory of the dependency records. It is created if it does not exist.
+        """
+
+        self.__root = root
+        self.__digests = {}
+        self.__lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def __record_path__(self, source_path: str):
+        return f"{self.__root}/{hashlib.sha1(os.path.abspath(source_path).encode()).hexdigest()}.json"
+
+    def dependencies(self, source_path: str):
+        """
+        Returns the headers recorded for a source file, with their digests at that build.
+
+        Parameters
+        ----------
+        source_path: str
+            The path of the source file
+
+        Returns
+        -------
+        Dict[str, str]
+            The digest of each header by absolute path, or an empty dictionary if the source has not been built
+        """
+
+        try:
+            with open(self.__record_path__(source_path), "r") as file:
+                recorded = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return recorded if isinstance(recorded, dict) else {}
+
+    def digest(self, path: str):
+        """
+        Returns the content digest of a file.
+
+        Parameters
+        ----------
+        path: str
+            The path of the file
+
+        Returns
+        -------
+        str
+            A hex digest, or "missing" if the file cannot be read
+        """
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return "missing"
+        with self.__lock:
+            cached = self.__digests.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        try:
+            with open(path, "rb") as file:
+                file_digest = hashlib.sha1(file.read()).hexdigest()
+        except OSError:
+            return "missing"
+        with self.__lock:
+            self.__digests[path] = (stat.st_mtime_ns, stat.st_size, file_digest)
+        return file_digest
+
+    def key_dependencies(self, source_path: str):
+        """
+        Returns the recorded headers of a source file with their current digests, for build_key().
+
+        Parameters
+        ----------
+        source_path: str
+            The path of the source file
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            The path and digest of each header
+        """
+
+        return [(path, self.digest(path)) for path in sorted(self.dependencies(source_path))]
+
+    def record(self, source_path: str, depfile: str):
+        """
+        Records the headers listed in a depfile for a source file.
+
+        Parameters
+        ----------
+        source_path: str
+            The path of the source file
+        depfile: str
+            The path of the depfile written by -MMD
+        """
+
+        try:
+            with open(depfile, "r") as file:
+                paths = parse_depfile(file.read())
+        except OSError:
+            return
+        directory = os.path.dirname(os.path.abspath(source_path))
+        # The first prerequisite is the file the compiler was given, the source or its copy from stage_source()
+        paths = [os.path.normpath(os.path.join(directory, path)) for path in paths[1:]]
+        recorded = {path: self.digest(path) for path in paths}
+        tmp_path = f"{self.__record_path__(source_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(recorded, file)
+        os.replace(tmp_path, self.__record_path__(source_path))
+
+
+def stage_source(source_path: str, source: bytes, dest: str):
+    """
+    Writes a copy of a source file for the compiler to read instead of the file itself.
+
+    A build key is computed from the source read before the build, and the file may have changed by the time the
+    compiler reads it, e.g. when the next statement is written or an editor saves it. Compiling the copy guarantees
+    that the output is built from exactly the bytes its key describes. A #line directive keeps diagnostics, __FILE__
+    and debug information pointing at the original file, and -iquote keeps its directory searched for quoted
+    includes.
+
+    Parameters
+    ----------
+    source_path: str
+        The path of the source file
+    source: bytes
+        The contents of the source file the build key was computed from
+    dest: str
+        The path of the output of the build; the copy is written next to it
+
+    Returns
+    -------
+    Tuple[str, List[str]]
+        The path of the copy and the flags to compile it with
+    """
+
+    path = f"{dest}.src{os.path.splitext(source_path)[1]}"
+    directory = os.path.dirname(os.path.abspath(source_path))
+    presumed = os.path.abspath(source_path).replace("\\", "\\\\").replace('"', '\\"')
+    with open(path, "wb") as file:
+        file.write(f'#line 1 "{presumed}"\n'.encode() + source)
+    return path, ["-iquote", directory]
+
+
+def place_file(src: str, dest: str):
+    """
+    Atomically makes dest a copy of src, hard-linking when possible.
+
+    Parameters
+    ----------
+    src: str
+        The path of the existing file
+    dest: str
+        The path to create or replace
+    """
+
+    # rename() does nothing if both paths are links to the same file, which would leave the temporary link behind
+    try:
+        if os.path.samefile(src, dest):
+            return
+    except OSError:
+        pass
+    tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+class ArtifactCache:
+    """
+    A content-addressed store of built executables, shared by every session and process.
+
+    Entries are files named after their build_key() in ARTIFACT_DIR, which lives next to the build workspaces so that
+    entries can be hard-linked into them. The least recently used entries are removed once
+    there are more than __MAX_ENTRIES__.
+
+    Attributes
+    ----------
+    __MAX_ENTRIES__: int
+        The number of executables kept.
+    __root: str
+        The directory of the store.
+
+    Methods
+    -------
+    get(key: str) -> Optional[str]
+        Returns the path of the cached executable for key, if any.
+    put(key: str, path: str)
+        Adds a built executable to the store.
+    """
+
+    __MAX_ENTRIES__ = 64
+
+    def __init__(self, root=ARTIFACT_DIR):
+        """
+        Parameters
+        ----------
+        root: str
+            The directory of the store. It is created if it does not exist.
+        """
+
+        self.__root = root
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, key: str):
+        """
+        Returns the path of the cached executable for key, if any.
+
+        Parameters
+        ----------
+        key: str
+            The build key
+
+        Returns
+        -------
+        Optional[str]
+            The path of the executable, or None on a miss
+        """
+
+        path = f"{self.__root}/{key}"
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, path: str):
+        """
+        Adds a built executable to the store.
+
+        Parameters
+        ----------
+        key: str
+            The build key
+        path: str
+            The path of the executable
+        """
+
+        try:
+            place_file(path, f"{self.__root}/{key}")
+            self.__prune__()
+        except OSError:
+            pass
+
+    def __prune__(self):
+        with os.scandir(self.__root) as entries:
+            files = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file()]
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.__MAX_ENTRIES__)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def compile_object(run: Callable, source_path: str, object_path: str, cache: ArtifactCache, flags=DEFAULT_FLAGS,
+                   workspace: BuildWorkspace = None, deps: DependencyTracker = None, compiler=COMPILER):
+    """
+    Compiles a translation unit into an object file, reusing a cached object of identical source, flags and headers.
+    The compiler is given a copy of the source written by stage_source().
+
+    Parameters
+    ----------
+    run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+        Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+    source_path: str
+        The path of the source file
+    object_path: str
+        The path of the object file to produce
+    cache: ArtifactCache
+        The object store
+    flags: Iterable[str]
+        The compiler flags, without -c
+    workspace: BuildWorkspace
+        The workspace that receives the compiler's temporary files, if any
+    deps: DependencyTracker
+        The tracker of the user headers of the source, if any
+    compiler: str
+        The compiler executable
+
+    Returns
+    -------
+    Tuple[int, bytes, str]
+        The exit code and stderr of the compiler, and the build key of the object
+    """
+
+    flags = [*flags, "-c"]
+    with open(source_path, "rb") as file:
+        source = file.read()
+    key = build_key(source, flags, deps.key_dependencies(source_path) if deps is not None else (), compiler)
+    cached = cache.get(key)
+    if cached is not None:
+        place_file(cached, object_path)
+        return 0, b"", key
+
+    dep_flags = ["-MMD", "-MF", object_path + ".d"] if deps is not None else []
+    env = workspace.env() if workspace is not None else None
+    compiled_path, stage_flags = stage_source(source_path, source, object_path)
+    try:
+        returncode, _, stderr = run([compiler, *flags, *stage_flags, *dep_flags, "-o", object_path, compiled_path],
+                                    env=env)
+    finally:
+        os.remove(compiled_path)
+    if returncode == 0:
+        if deps is not None:
+            deps.record(source_path, object_path + ".d")
+            key = build_key(source, flags, deps.key_dependencies(source_path), compiler)
+        if len(stderr) == 0:
+            cache.put(key, object_path)
+    return returncode, stderr, key
+
+
+def compile_objects(run: Callable, units, cache: ArtifactCache, flags=DEFAULT_FLAGS,
+                    workspace: BuildWorkspace = None, deps: DependencyTracker = None, max_workers: int = None,
+                    compiler=COMPILER):
+    """
+    Compiles translation units into object files in parallel, one compiler process per unit.
+
+    Parameters
+    ----------
+    run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+        Runs a command and returns its exit code, stdout and stderr. It must be safe to call from several threads,
+        like BuildWorker.run.
+    units: Iterable[Tuple[str, str]]
+        The path of each source file and of the object file to produce from it
+    cache: ArtifactCache
+        The object store
+    flags: Iterable[str]
+        The compiler flags, without -c
+    workspace: BuildWorkspace
+        The workspace that receives the compiler's temporary files, if any
+    deps: DependencyTracker
+        The tracker of the user headers of the sources, if any
+    max_workers: int
+        The number of compilers run at once; the number of CPUs by default
+    compiler: str
+        The compiler executable
+
+    Returns
+    -------
+    Tuple[int, bytes, List[Tuple[str, str]]]
+        The first non-zero exit code, or 0, the diagnostics of every unit, and the path and build key of each object
+    """
+
+    units = list(units)
+    if len(units) == 0:
+        return 0, b"", []
+    workers = min(len(units), max_workers or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda unit: compile_object(run, unit[0], unit[1], cache, flags, workspace, deps, compiler), units))
+    returncode = next((result[0] for result in results if result[0] != 0), 0)
+    stderr = b"".join(result[1] for result in results)
+    return returncode, stderr, [(unit[1], result[2]) for unit, result in zip(units, results)]
+
+
+def compile_program(run: Callable, source_path: str, exec_path: str, cache: ArtifactCache, flags=DEFAULT_FLAGS,
+                    workspace: BuildWorkspace = None, deps: DependencyTracker = None, objects=(), compiler=COMPILER):
+    """
+    Compiles a source file into an executable, reusing a cached executable of identical source and flags.
+
+    With a cache, the compiler is given a copy of the source written by stage_source(), so a cached executable is
+    always built from the source its key was computed from.
+
+    If deps is given, the compiler writes a -MMD depfile next to the executable, the user headers it lists are
+    recorded, and their contents become part of the build key, so a change to an included header forces a rebuild.
+    Objects built by compile_objects() are linked in without being recompiled; their keys are part of the build key.
+
+    Parameters
+    ----------
+    run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+        Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+    source_path: str
+        The path of the source file
+    exec_path: str
+        The path of the executable to produce
+    cache: ArtifactCache
+        The artifact store, or None to always compile
+    flags: Iterable[str]
+        The compiler flags
+    workspace: BuildWorkspace
+        The workspace that receives the compiler's temporary files, if any
+    deps: DependencyTracker
+        The tracker of the user headers of the source, if any
+    objects: Iterable[Tuple[str, str]]
+        The path and build key of each object file to link with the source
+    compiler: str
+        The compiler executable
+
+    Returns
+    -------
+    Tuple[int, bytes, bytes, bool]
+        The exit code, stdout and stderr of the compiler, and whether the executable came from the cache
+    """
+
+    flags: List[str] = list(flags)
+    objects = list(objects)
+    source = None
+    if cache is not None:
+        with open(source_path, "rb") as file:
+            source = file.read()
+        dependencies = deps.key_dependencies(source_path) if deps is not None else []
+        cached = cache.get(build_key(source, flags, [*dependencies, *objects], compiler))
+        if cached is not None:
+            place_file(cached, exec_path)
+            return 0, b"", b"", True
+
+    dep_flags = []
+    depfile = exec_path + ".d"
+    if deps is not None:
+        dep_flags = ["-MMD", "-MF", depfile]
+    env = workspace.env() if workspace is not None else None
+    compiled_path, stage_flags = source_path, []
+    if source is not None:
+        compiled_path, stage_flags = stage_source(source_path, source, exec_path)
+    try:
+        returncode, stdout, stderr = run([compiler, *flags, *stage_flags, *dep_flags, "-o", exec_path, compiled_path,
+                                          *(path for path, _ in objects)], env=env)
+    finally:
+        if compiled_path != source_path:
+            os.remove(compiled_path)
+    if returncode == 0 and deps is not None:
+        deps.record(source_path, depfile)
+    # Builds with diagnostics are not cached, so warnings are shown every time
+    if returncode == 0 and len(stderr) == 0 and source is not None:
+        dependencies = deps.key_dependencies(source_path) if deps is not None else []
+        cache.put(build_key(source, flags, [*dependencies, *objects], compiler), exec_path)
+    return returncode, stdout, stderr, False
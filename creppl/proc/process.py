@@ -1,9 +1,21 @@
 # creppl/proc/process.py
 
+import errno
+import hashlib
+import itertools
+import os
+import selectors
+import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+import time
 
+from creppl.io import COMPILER, WORKING_DIR
 
-def proc_exec(cmd_list, shell=False):
+
+def proc_exec(cmd_list, shell=False, stdin=False, cwd=None, detach=False, env=None):
     """
     A helper function to create a subprocess
 
@@ -13,6 +25,15 @@ def proc_exec(cmd_list, shell=False):
         The commands to invoke the subprocess
     shell: bool
         If true, the command will be executed through the shell
+    stdin: bool
+        If true, the standard input of the subprocess is a pipe. Otherwise, it is inherited.
+    cwd: str
+        The working directory of the subprocess
+    detach: bool
+        If true, the subprocess reads from /dev/null (unless stdin is true) and is started in a new session, so it
+        leads its own process group and can be killed together with its children.
+    env: Dict[str, str]
+        Environment variables to set for the subprocess, in addition to the current environment
 
     Examples
     --------
@@ -26,4 +47,509 @@ def proc_exec(cmd_list, shell=False):
         The output of the subprocess
     """
 
-    return subprocess.Popen(cmd_list, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if stdin:
+        stdin = subprocess.PIPE
+    else:
+        stdin = subprocess.DEVNULL if detach else None
+    if env is not None:
+        env = {**os.environ, **env}
+    return subprocess.Popen(cmd_list, shell=shell, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            cwd=cwd, start_new_session=detach, env=env)
+
+
+"""Signals reset to their default action in spawned processes, as Popen(restore_signals=True) does"""
+_DEFAULT_SIGNALS = tuple(getattr(signal, name) for name in ("SIGPIPE", "SIGXFSZ") if hasattr(signal, name))
+
+_devnull = None
+_devnull_lock = threading.Lock()
+
+
+def _devnull_fd():
+    """
+    Returns a descriptor of /dev/null that stays open for the lifetime of the process, so spawn() does not open it
+    for every process.
+    """
+
+    global _devnull
+    with _devnull_lock:
+        if _devnull is None:
+            _devnull = os.open(os.devnull, os.O_RDONLY | os.O_CLOEXEC)
+        return _devnull
+
+
+"""Source of the helper through which spawn() runs processes to measure them; see rusage_helper()"""
+_RUSAGE_HELPER_SOURCE = r"""
+#include <cerrno>
+#include <csignal>
+#include <cstdio>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+// Usage: creppl-rusage <usage file> <command> [args...]
+int main(int argc, char **argv) {
+    if (argc < 3) return 127;
+    pid_t pid = fork();
+    if (pid == 0) {
+        execvp(argv[2], argv + 2);
+        perror(argv[2]);
+        _exit(127);
+    }
+    if (pid < 0) {
+        perror("fork");
+        return 127;
+    }
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR) return 127;
+    }
+    if (FILE *out = fopen(argv[1], "w")) {
+        fprintf(out, "%ld %ld %ld\n", usage.ru_maxrss, usage.ru_minflt, usage.ru_majflt);
+        fclose(out);
+    }
+    if (WIFSIGNALED(status)) {
+        struct rlimit no_core = {0, 0};
+        setrlimit(RLIMIT_CORE, &no_core);
+        signal(WTERMSIG(status), SIG_DFL);
+        raise(WTERMSIG(status));
+    }
+    return WEXITSTATUS(status);
+}
+"""
+
+"""Directory of the files the helper writes the usage of a process to"""
+_USAGE_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+_helper = None
+_helper_lock = threading.Lock()
+_usage_ids = itertools.count()
+
+
+def rusage_helper():
+    """
+    Returns the path of the helper through which spawn() runs processes, building it on first use.
+
+    On Linux, a process inherits the peak resident set size of the process that forked it and keeps it across
+    exec(), so os.wait4() reports at least the memory of creppl itself for every process creppl starts, and the page
+    faults are skewed the same way. The helper is a small program that forks and execs the command, reaps it with
+    wait4() and writes its peak resident set size and page faults to a file. The command then inherits only the
+    helper's own peak, under 1 MiB. The helper is compiled once into the bin directory, named after a digest of its
+    source.
+
+    Returns
+    -------
+    Optional[str]
+        The path of the helper, or None if it cannot be built
+    """
+
+    global _helper
+    with _helper_lock:
+        if _helper is None:
+            digest = hashlib.sha1(_RUSAGE_HELPER_SOURCE.encode()).hexdigest()[:12]
+            path = f"{WORKING_DIR}/bin/creppl-rusage-{digest}"
+            _helper = path if os.access(path, os.X_OK) else ""
+            if len(_helper) == 0:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    result = subprocess.run([COMPILER, "-O2", "-x", "c++", "-", "-o", tmp_path],
+                                            input=_RUSAGE_HELPER_SOURCE.encode(), stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL)
+                    if result.returncode == 0:
+                        os.replace(tmp_path, path)
+                        _helper = path
+                except OSError:
+                    pass
+        return _helper or None
+
+
+def _check_executable(name: str, cwd=None, env=None):
+    """
+    Raises FileNotFoundError if a command cannot be executed, as posix_spawnp() would, for commands started through
+    the helper.
+    """
+
+    if "/" in name:
+        path = os.path.join(cwd, name) if cwd is not None else name
+        found = os.access(path, os.X_OK) and not os.path.isdir(path)
+    else:
+        found = shutil.which(name, path=(env or {}).get("PATH")) is not None
+    if not found:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), name)
+
+
+def _read_usage(usage_path: str):
+    """
+    Reads and removes the file the helper wrote the usage of a process to.
+
+    Returns
+    -------
+    Optional[Tuple[int, int, int]]
+        The peak resident set size in kilobytes and the minor and major page faults, or None if the helper did not
+        write them, e.g. because it was killed
+    """
+
+    if usage_path is None:
+        return None
+    try:
+        with open(usage_path, "r") as file:
+            values = file.read().split()
+        os.remove(usage_path)
+        return int(values[0]), int(values[1]), int(values[2])
+    except (OSError, ValueError, IndexError):
+        try:
+            os.remove(usage_path)
+        except OSError:
+            pass
+        return None
+
+
+class SpawnedProcess:
+    """
+    A process started by spawn().
+
+    It has the attributes of a Popen object that communicate_with_usage() and BuildWorker use, so both kinds of
+    process can be handled alike.
+
+    Attributes
+    ----------
+    pid: int
+        The process id, which is also the process group id if the process was detached
+    returncode: int
+        The exit code, or the negated signal number if the process was killed; None until it is reaped
+    stdout: BinaryIO
+        The read end of the pipe of the standard output
+    stderr: BinaryIO
+        The read end of the pipe of the standard error
+    usage_path: str
+        The file the helper writes the usage of the process to, or None if it was not started through the helper
+    """
+
+    __slots__ = ("pid", "returncode", "stdout", "stderr", "usage_path")
+
+    def __init__(self, pid: int, stdout_fd: int, stderr_fd: int, usage_path=None):
+        self.pid = pid
+        self.returncode = None
+        self.stdout = open(stdout_fd, "rb", buffering=0)
+        self.stderr = open(stderr_fd, "rb", buffering=0)
+        self.usage_path = usage_path
+
+
+def spawn(cmd_list, cwd=None, env=None, detach=True, measure=False):
+    """
+    Starts a process with os.posix_spawnp(), which the C library implements with vfork-style cloning, so the cost of
+    starting a process does not grow with the memory of this one.
+
+    The process reads from /dev/null and writes to two new pipes. Pipes cannot be reused between processes: the
+    parent detects the end of the output when the last write end is closed, and a child that leaves a process behind
+    would write into the next one's output. Signals that Python ignores, such as SIGPIPE, are reset to their default
+    action.
+
+    posix_spawn() cannot change the working directory before Python 3.13, so a process with a cwd is started by
+    proc_exec() instead, which uses vfork() as well on Linux.
+
+    If measure is true, the process is started through rusage_helper(), so that communicate_with_usage() reports its
+    own peak memory and page faults rather than those it inherited from creppl. The helper adds a fork() and exec()
+    to the launch, about a millisecond, so only the session program is measured, not the compiler and tools.
+
+    Parameter
+    ---------
+    cmd_list: List[str]
+        The command to run; the executable is looked up in PATH
+    cwd: str
+        The working directory of the process
+    env: Dict[str, str]
+        Environment variables to set for the process, in addition to the current environment
+    detach: bool
+        If true, the process is started in a new session, so it leads its own process group and can be killed
+        together with its children.
+    measure: bool
+        If true, the process is started through the helper, if it can be built
+
+    Raises
+    ------
+    OSError
+        If the process cannot be started, e.g. because the executable does not exist
+
+    Returns
+    -------
+    Union[SpawnedProcess, Popen]
+        The process
+    """
+
+    usage_path = None
+    helper = rusage_helper() if measure else None
+    if helper is not None:
+        _check_executable(cmd_list[0], cwd, env)
+        usage_path = f"{_USAGE_DIR}/creppl-usage-{os.getpid()}-{next(_usage_ids)}"
+        cmd_list = [helper, usage_path, *cmd_list]
+
+    if cwd is not None:
+        proc = proc_exec(cmd_list, cwd=cwd, detach=detach, env=env)
+        proc.usage_path = usage_path
+        return proc
+
+    stdout_r, stdout_w = os.pipe2(os.O_CLOEXEC)
+    stderr_r, stderr_w = os.pipe2(os.O_CLOEXEC)
+    try:
+        file_actions = [(os.POSIX_SPAWN_DUP2, _devnull_fd(), 0),
+                        (os.POSIX_SPAWN_DUP2, stdout_w, 1),
+                        (os.POSIX_SPAWN_DUP2, stderr_w, 2)]
+        pid = os.posix_spawnp(cmd_list[0], list(cmd_list), {**os.environ, **env} if env is not None else os.environ,
+                              file_actions=file_actions, setsid=detach, setsigdef=_DEFAULT_SIGNALS)
+    except BaseException:
+        os.close(stdout_r)
+        os.close(stderr_r)
+        raise
+    finally:
+        os.close(stdout_w)
+        os.close(stderr_w)
+    return SpawnedProcess(pid, stdout_r, stderr_r, usage_path)
+
+
+def spawn_and_wait(cmd_list, cwd=None, env=None, timeout=None):
+    """
+    Runs a process started by spawn() to completion.
+
+    Parameter
+    ---------
+    cmd_list: List[str]
+        The command to run
+    cwd: str
+        The working directory of the process
+    env: Dict[str, str]
+        Environment variables to set for the process
+    timeout: float
+        The maximum number of seconds the process may run before its process group is killed, or None
+
+    Returns
+    -------
+    Tuple[int, bytes, bytes, ProcessStats]
+        The exit code, stdout, stderr and resource usage of the process
+    """
+
+    start = time.monotonic()
+    proc = spawn(cmd_list, cwd=cwd, env=env)
+    stdout, stderr, usage = communicate_with_usage(proc, start, timeout)
+    return proc.returncode, stdout, stderr, usage
+
+
+def compare_launchers(runs=200, cmd_list=("true",)):
+    """
+    Measures the time to start, drain and reap a process with proc_exec() (Popen), with spawn() as the compiler and
+    tools are run, and with spawn() through the helper as the session program is run.
+
+    Parameter
+    ---------
+    runs: int
+        The number of processes started by each launcher
+    cmd_list: List[str]
+        The command to run; by default one that exits immediately, so only the launch overhead is measured
+
+    Returns
+    -------
+    Dict[str, float]
+        The mean time per process in seconds, by launcher
+    """
+
+    def popen():
+        proc = proc_exec(list(cmd_list), detach=True)
+        communicate_with_usage(proc)
+
+    def posix_spawn():
+        proc = spawn(cmd_list)
+        communicate_with_usage(proc)
+
+    def measured():
+        proc = spawn(cmd_list, measure=True)
+        communicate_with_usage(proc)
+
+    results = {}
+    for name, launch in (("popen", popen), ("posix_spawn", posix_spawn), ("measured", measured)):
+        launch()
+        start = time.perf_counter()
+        for _ in range(runs):
+            launch()
+        results[name] = (time.perf_counter() - start) / runs
+    return results
+
+
+def format_size(n_bytes: float):
+    """
+    Formats a size in bytes with a binary unit suited to its size.
+
+    Parameters
+    ----------
+    n_bytes: float
+        The size in bytes
+
+    Returns
+    -------
+    str
+        e.g. "3.4 MiB"
+    """
+
+    for unit, scale in (("GiB", 1 << 30), ("MiB", 1 << 20), ("KiB", 1 << 10)):
+        if n_bytes >= scale:
+            return f"{n_bytes / scale:.3g} {unit}"
+    return f"{n_bytes:.0f} B"
+
+
+def format_seconds(seconds: float):
+    """
+    Formats a duration in seconds as seconds or milliseconds.
+
+    Parameters
+    ----------
+    seconds: float
+        The duration
+
+    Returns
+    -------
+    str
+        e.g. "412 ms"
+    """
+
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    return f"{seconds * 1000:.3g} ms"
+
+
+class ProcessStats:
+    """
+    The resources used by a finished process, as reported by os.wait4() and, for the memory and page faults, by the
+    helper of spawn().
+
+    Attributes
+    ----------
+    wall: float
+        The elapsed time in seconds, from start to exit
+    user: float
+        The user CPU time in seconds
+    sys: float
+        The system CPU time in seconds
+    max_rss: int
+        The peak resident set size in bytes, or None if it was not measured
+    minor_faults: int
+        The page faults serviced without I/O, or None if they were not measured
+    major_faults: int
+        The page faults that required I/O, or None if they were not measured
+
+    Methods
+    -------
+    summary() -> str
+        Returns the numbers on one line.
+    to_dict() -> dict
+        Returns the attributes as a dictionary.
+    """
+
+    def __init__(self, wall: float, rusage, usage=None):
+        """
+        Parameters
+        ----------
+        wall: float
+            The elapsed time in seconds
+        rusage: resource.struct_rusage
+            The resource usage of the process
+        usage: Tuple[int, int, int]
+            The peak resident set size in kilobytes and the minor and major page faults measured by the helper of
+            spawn(), or None. Those of rusage include what the process inherited from creppl and are not used.
+        """
+
+        self.wall = wall
+        self.user = rusage.ru_utime
+        self.sys = rusage.ru_stime
+        self.max_rss = self.minor_faults = self.major_faults = None
+        if usage is not None:
+            # ru_maxrss is in kilobytes on Linux
+            self.max_rss = usage[0] * 1024
+            self.minor_faults, self.major_faults = usage[1], usage[2]
+
+    def summary(self):
+        """
+        Returns the numbers on one line. The memory and page faults are left out if they were not measured.
+
+        Returns
+        -------
+        str
+            e.g. "wall 3.2 ms  cpu 2.9 ms + 0.3 ms sys  rss 3.4 MiB  faults 120/0"
+        """
+
+        summary = f"wall {format_seconds(self.wall)}  cpu {format_seconds(self.user)} + {format_seconds(self.sys)} sys"
+        if self.max_rss is not None:
+            summary += f"  rss {format_size(self.max_rss)}  faults {self.minor_faults}/{self.major_faults}"
+        return summary
+
+    def to_dict(self):
+        """
+        Returns the attributes as a dictionary.
+
+        Returns
+        -------
+        dict
+            {"wall", "user", "sys", "max_rss", "minor_faults", "major_faults"}
+        """
+
+        return dict(vars(self))
+
+
+def communicate_with_usage(proc: subprocess.Popen, start: float = None, timeout: float = None):
+    """
+    Reads the output of a process started by proc_exec() or spawn() until it exits and reaps it with os.wait4().
+
+    Unlike Popen.communicate(), the resource usage of the process itself is returned, not that of all children of
+    this process. The memory and page faults are only measured for processes started by spawn() through its helper.
+    The standard input of the process must not be a pipe. proc.returncode is set as Popen.wait() would.
+
+    If the process runs longer than timeout, its process group is killed and a TimeoutError line is added to its
+    stderr, so the process must have been detached.
+
+    Parameters
+    ----------
+    proc: Popen
+        The process
+    start: float
+        The time.monotonic() value at which the process was started, if known
+    timeout: float
+        The maximum number of seconds from start to wait for the process, or None
+
+    Returns
+    -------
+    Tuple[bytes, bytes, ProcessStats]
+        The stdout and stderr of the process and the resources it used
+    """
+
+    if start is None:
+        start = time.monotonic()
+    deadline = start + timeout if timeout is not None else None
+    timed_out = False
+    chunks = {proc.stdout: [], proc.stderr: []}
+    with selectors.DefaultSelector() as selector:
+        for stream in chunks:
+            selector.register(stream, selectors.EVENT_READ)
+        while len(selector.get_map()) > 0:
+            if deadline is not None and not timed_out and time.monotonic() >= deadline:
+                timed_out = True
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+            wait = max(0.0, deadline - time.monotonic()) if deadline is not None and not timed_out else None
+            for key, _ in selector.select(wait):
+                data = os.read(key.fd, 65536)
+                if len(data) == 0:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                else:
+                    chunks[key.fileobj].append(data)
+
+    _, status, rusage = os.wait4(proc.pid, 0)
+    wall = time.monotonic() - start
+    proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    stderr = b"".join(chunks[proc.stderr])
+    if timed_out:
+        stderr += f"\nTimeoutError: Killed after {timeout} seconds.\n".encode()
+    usage = _read_usage(getattr(proc, "usage_path", None))
+    return b"".join(chunks[proc.stdout]), stderr, ProcessStats(wall, rusage, usage)
+
@@ -0,0 +1,62 @@
+# creppl/proc/warmup.py
+
+import threading
+
+from creppl.io import DEFAULT_FILE_CONTENTS
+from creppl.proc.build import ArtifactCache, compile_program
+from creppl.proc.process import rusage_helper, spawn_and_wait
+from creppl.proc.workspace import BuildWorkspace
+
+
+def _run(cmd_list, cwd=None, env=None):
+    """
+    Runs a process to completion and returns its exit code, stdout and stderr, like BuildWorker.run.
+    """
+
+    returncode, stdout, stderr, _ = spawn_and_wait(cmd_list, cwd=cwd, env=env)
+    return returncode, stdout, stderr
+
+
+def warm_up():
+    """
+    Prepares the caches the first statement of a session depends on, so it runs at the latency of later ones.
+
+    The header index for missing includes is loaded or built, and DEFAULT_FILE_CONTENTS is compiled with the flags of
+    a session build and run once. This brings the compiler, the standard headers and the C++ runtime into the page
+    cache and stores the executable of an empty session in the artifact store. The helper that measures the session
+    program is built as well. Failures are ignored: the session does the same work again when it needs it.
+    """
+
+    from creppl.io.headers import HeaderIndex
+
+    HeaderIndex().load()
+    rusage_helper()
+    workspace = BuildWorkspace("warmup-")
+    try:
+        source_path = workspace.path("warmup.cpp")
+        exec_path = workspace.path("warmup")
+        with open(source_path, "w") as file:
+            file.write(DEFAULT_FILE_CONTENTS)
+        # Without local headers, the build key is the one a session with the default contents computes
+        returncode, _, _, _ = compile_program(_run, source_path, exec_path, ArtifactCache(), workspace=workspace)
+        if returncode == 0:
+            _run([exec_path], cwd=workspace.directory)
+    except OSError:
+        pass
+    finally:
+        workspace.cleanup()
+
+
+def start_warm_up():
+    """
+    Runs warm_up() in a background thread, so it never delays the prompt.
+
+    Returns
+    -------
+    threading.Thread
+        The daemon thread running the warm-up
+    """
+
+    thread = threading.Thread(target=warm_up, name="creppl-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,254 @@
+# creppl/proc/worker.py
+
+import os
+import signal
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from typing import Callable
+
+from creppl.proc.process import communicate_with_usage, spawn
+
+
+class BuildCancelled(Exception):
+    """
+    Raised inside a job when it has been cancelled or superseded by a newer job.
+    """
+
+
+class BuildWorker:
+    """
+    Runs build-and-run jobs on a background thread so the prompt stays responsive.
+
+    Only one job runs at a time. Submitting a job cancels the job that is running, if any, so a newer commit always
+    supersedes an older build. Every process started through run() gets its own process group, which is killed as a
+    whole when its job is cancelled. A job may call run() from several threads to run processes in parallel.
+
+    Attributes
+    ----------
+    __cond: threading.Condition
+        Guards the state below and signals job hand-off and completion.
+    __generation: int
+        Incremented on every submit() and cancel(); a job is current while its generation matches.
+    __job: Tuple[int, Callable, tuple, str]
+        The job waiting to start, if any, with the profiler label of the input that submitted it.
+    __running: int
+        The generation of the job that is running, or None.
+    __procs: Set[SpawnedProcess]
+        The processes the running job is waiting on.
+    __usage: ProcessStats
+        The resources used by the last process of the running job, if any.
+    __profiler: SessionProfiler
+        Profiles the jobs and accounts their subprocess wait time, with `creppl --profile-self`; otherwise None.
+    __thread: threading.Thread
+        The worker thread.
+
+    Methods
+    -------
+    submit(job: Callable, *args)
+        Queues a job, cancelling the job that is running.
+    cancel() -> bool
+        Cancels the running and queued jobs and kills the process groups of the running processes.
+    busy() -> bool
+        Returns whether a job is running or queued.
+    wait(timeout: float) -> bool
+        Blocks until no job is running or queued.
+    cancelled() -> bool
+        Returns whether the job calling it has been cancelled.
+    run(cmd_list, cwd: str, env: Dict[str, str], measure: bool) -> Tuple[int, bytes, bytes]
+        Runs a process for the current job and returns its exit code and output.
+    usage() -> Optional[ProcessStats]
+        Returns the resources used by the last process the current job ran.
+    """
+
+    def __init__(self, profiler=None):
+        """
+        Parameters
+        ----------
+        profiler: SessionProfiler
+            The profiler of the session, if it is being profiled
+        """
+
+        self.__profiler = profiler
+        self.__cond = threading.Condition()
+        self.__generation = 0
+        self.__job = None
+        self.__running = None
+        self.__procs = set()
+        self.__usage = None
+        self.__thread = threading.Thread(target=self.__loop__, name="creppl-build", daemon=True)
+        self.__thread.start()
+
+    def __kill__(self):
+        """
+        Kills the process groups of the running processes. The condition must be held.
+        """
+
+        # The processes are reaped by run() with os.wait4(), so they must not be polled here
+        for proc in self.__procs:
+            if proc.returncode is None:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+
+    def __loop__(self):
+        while True:
+            with self.__cond:
+                while self.__job is None:
+                    self.__cond.wait()
+                generation, job, args, label = self.__job
+                self.__job = None
+                self.__running = generation
+                self.__usage = None
+            try:
+                with self.__profiler.job(label) if self.__profiler is not None else nullcontext():
+                    job(*args)
+            except BuildCancelled:
+                pass
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self.__cond:
+                    self.__running = None
+                    self.__cond.notify_all()
+
+    def submit(self, job: Callable, *args):
+        """
+        Queues a job, cancelling the job that is running.
+
+        Parameters
+        ----------
+        job: Callable
+            The function to call on the worker thread
+        args: Any
+            The arguments to pass to job
+        """
+
+        with self.__cond:
+            self.__generation += 1
+            label = self.__profiler.current() if self.__profiler is not None else None
+            self.__job = (self.__generation, job, args, label)
+            self.__kill__()
+            self.__cond.notify_all()
+
+    def cancel(self):
+        """
+        Cancels the running and queued jobs and kills the process groups of the running processes.
+
+        Returns
+        -------
+        bool
+            True if there was a job to cancel, otherwise False
+        """
+
+        with self.__cond:
+            if self.__job is None and self.__running is None:
+                return False
+            self.__generation += 1
+            self.__job = None
+            self.__kill__()
+            return True
+
+    def busy(self):
+        """
+        Returns whether a job is running or queued.
+
+        Returns
+        -------
+        bool
+            True if the worker is busy, otherwise False
+        """
+
+        with self.__cond:
+            return self.__job is not None or self.__running is not None
+
+    def wait(self, timeout=None):
+        """
+        Blocks until no job is running or queued.
+
+        Parameters
+        ----------
+        timeout: float
+            The maximum number of seconds to wait, or None to wait indefinitely
+
+        Returns
+        -------
+        bool
+            True if the worker is idle, False if the timeout expired
+        """
+
+        with self.__cond:
+            return self.__cond.wait_for(lambda: self.__job is None and self.__running is None, timeout)
+
+    def cancelled(self):
+        """
+        Returns whether the job calling it has been cancelled.
+
+        Returns
+        -------
+        bool
+            True if the running job is no longer current, otherwise False
+        """
+
+        with self.__cond:
+            return self.__running != self.__generation
+
+    def run(self, cmd_list, cwd=None, env=None, measure=False):
+        """
+        Runs a process for the current job and returns its exit code and output.
+
+        The process is started by spawn(), gets its own process group and reads from /dev/null, so it never competes
+        with the prompt for the terminal. The resources it used are available from usage() afterwards.
+
+        Parameters
+        ----------
+        cmd_list: List[str]
+            The command to run
+        cwd: str
+            The working directory of the process
+        env: Dict[str, str]
+            Environment variables to set for the process
+        measure: bool
+            If true, the peak memory and page faults of the process are measured as well; see spawn()
+
+        Raises
+        ------
+        BuildCancelled
+            If the job is cancelled before or while the process runs
+
+        Returns
+        -------
+        Tuple[int, bytes, bytes]
+            The exit code, stdout and stderr of the process
+        """
+
+        with self.__cond:
+            if self.__running != self.__generation:
+                raise BuildCancelled
+            start = time.monotonic()
+            proc = spawn(cmd_list, cwd=cwd, env=env, measure=measure)
+            self.__procs.add(proc)
+        try:
+            stdout, stderr, self.__usage = communicate_with_usage(proc, start)
+        finally:
+            with self.__cond:
+                self.__procs.discard(proc)
+            if self.__profiler is not None:
+                self.__profiler.waited(time.monotonic() - start)
+        if self.cancelled():
+            raise BuildCancelled
+        return proc.returncode, stdout, stderr
+
+    def usage(self):
+        """
+        Returns the resources used by the last process the current job ran.
+
+        Returns
+        -------
+        Optional[ProcessStats]
+            The resource usage, or None if the job has not run a process
+        """
+
+        return self.__usage
@@ -0,0 +1,144 @@
+# creppl/proc/workspace.py
+
+import atexit
+import os
+import shutil
+import tempfile
+
+"""Candidate parent directories for build workspaces, fastest first"""
+RUNTIME_CANDIDATES = ("/dev/shm", os.environ.get("XDG_RUNTIME_DIR", ""), tempfile.gettempdir())
+
+
+def _is_usable(directory: str):
+    """
+    Returns whether directory exists, is writable and allows executing files.
+    """
+
+    if len(directory) == 0 or not os.path.isdir(directory) or not os.access(directory, os.W_OK | os.X_OK):
+        return False
+    try:
+        return not os.statvfs(directory).f_flag & os.ST_NOEXEC
+    except OSError:
+        return False
+
+
+def runtime_dir():
+    """
+    Returns the per-user directory that holds the build workspaces and the artifact store.
+
+    It is placed on the first candidate of RUNTIME_CANDIDATES that is writable and not mounted noexec, normally the
+    /dev/shm tmpfs, and is created with mode 0700 if it does not exist.
+
+    Returns
+    -------
+    str
+        The absolute path of the directory
+    """
+
+    for candidate in RUNTIME_CANDIDATES:
+        if _is_usable(candidate):
+            path = f"{candidate}/creppl-{os.getuid()}"
+            try:
+                os.makedirs(path, mode=0o700, exist_ok=True)
+            except OSError:
+                continue
+            if os.stat(path).st_uid == os.getuid():
+                return path
+    raise OSError("No writable directory for build files")
+
+
+class BuildWorkspace:
+    """
+    A private scratch directory for compiler temporaries and per-statement executables.
+
+    The directory is created under runtime_dir(), normally in memory, and is removed at exit. The environment returned
+    by env() points the compiler's temporary files at it. Executables that should outlive the session are copied out
+    with keep().
+
+    Attributes
+    ----------
+    directory: str
+        The absolute path of the workspace
+
+    Methods
+    -------
+    path(name: str) -> str
+        Returns the path of a file in the workspace.
+    env() -> Dict[str, str]
+        Returns the environment overrides for processes that build in the workspace.
+    keep(name: str, dest: str) -> bool
+        Copies a file out of the workspace.
+    cleanup()
+        Removes the workspace.
+    """
+
+    def __init__(self, prefix="build-"):
+        """
+        Parameters
+        ----------
+        prefix: str
+            The prefix of the workspace directory name
+        """
+
+        self.directory = tempfile.mkdtemp(prefix=prefix, dir=runtime_dir())
+        os.mkdir(self.directory + "/tmp")
+        atexit.register(self.cleanup)
+
+    def path(self, name: str):
+        """
+        Returns the path of a file in the workspace.
+
+        Parameters
+        ----------
+        name: str
+            The file name
+
+        Returns
+        -------
+        str
+            The absolute path
+        """
+
+        return f"{self.directory}/{name}"
+
+    def env(self):
+        """
+        Returns the environment overrides for processes that build in the workspace.
+
+        Returns
+        -------
+        Dict[str, str]
+            TMPDIR set to the workspace's temporary directory
+        """
+
+        return {"TMPDIR": self.directory + "/tmp"}
+
+    def keep(self, name: str, dest: str):
+        """
+        Copies a file out of the workspace.
+
+        Parameters
+        ----------
+        name: str
+            The name of the file in the workspace
+        dest: str
+            The path to copy it to
+
+        Returns
+        -------
+        bool
+            True if the file was copied, otherwise False
+        """
+
+        try:
+            shutil.copy2(self.path(name), dest)
+            return True
+        except OSError:
+            return False
+
+    def cleanup(self):
+        """
+        Removes the workspace.
+        """
+
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,3 @@
+# creppl/server/__init__.py
+
+"""JSON-RPC server mode, started with 'creppl --serve'"""
@@ -0,0 +1,149 @@
+# creppl/server/client.py
+
+import argparse
+import itertools
+import json
+import socket
+import subprocess
+import sys
+
+
+class ClientError(Exception):
+    """
+    Raised when the server answers a request with a JSON-RPC error object.
+    """
+
+    def __init__(self, error: dict):
+        super().__init__(f"{error.get('message')} ({error.get('code')})")
+        self.error = error
+
+
+class Client:
+    """
+    A minimal client for the creppl JSON-RPC server.
+
+    It connects to a unix socket or, if no socket is given, starts "python -m creppl --serve" and talks to it over
+    its standard input and output.
+
+    Methods
+    -------
+    call(method: str, **params) -> Any
+        Sends a request and waits for its result.
+    close()
+        Closes the connection and waits for a spawned server to exit.
+    """
+
+    def __init__(self, socket_path=None):
+        """
+        Parameters
+        ----------
+        socket_path: str
+            The path of the server's unix socket, or None to spawn a server on stdio
+        """
+
+        self.__proc = None
+        self.__sock = None
+        if socket_path is None:
+            self.__proc = subprocess.Popen([sys.executable, "-m", "creppl", "--serve"], stdin=subprocess.PIPE,
+                                           stdout=subprocess.PIPE)
+            self.__reader, self.__writer = self.__proc.stdout, self.__proc.stdin
+        else:
+            self.__sock = socket.socket(socket.AF_UNIX)
+            self.__sock.connect(socket_path)
+            self.__reader = self.__sock.makefile("rb")
+            self.__writer = self.__sock.makefile("wb")
+        self.__ids = itertools.count(1)
+        self.__responses = {}
+
+    def call(self, method: str, **params):
+        """
+        Sends a request and waits for its result.
+
+        Parameters
+        ----------
+        method: str
+            The RPC method
+        params: Any
+            The parameters of the method
+
+        Raises
+        ------
+        ClientError
+            If the server answers with an error
+
+        Returns
+        -------
+        Any
+            The result of the request
+        """
+
+        request_id = next(self.__ids)
+        request = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        self.__writer.write(json.dumps(request).encode() + b"\n")
+        self.__writer.flush()
+
+        while request_id not in self.__responses:
+            line = self.__reader.readline()
+            if not line:
+                raise ConnectionError("The server closed the connection")
+            response = json.loads(line)
+            self.__responses[response.get("id")] = response
+        response = self.__responses.pop(request_id)
+        if "error" in response:
+            raise ClientError(response["error"])
+        return response.get("result")
+
+    def close(self):
+        """
+        Closes the connection and waits for a spawned server to exit.
+        """
+
+        self.__writer.close()
+        if self.__sock is not None:
+            self.__sock.close()
+        if self.__proc is not None:
+            self.__proc.wait()
+
+
+def main():
+    """
+    Sends one request, or runs a short demonstration session when no method is given.
+
+    Examples
+    --------
+    python -m creppl.server.client
+    python -m creppl.server.client --socket /tmp/creppl.sock session.list
+    python -m creppl.server.client --socket /tmp/creppl.sock run '{"session": "demo"}'
+    """
+
+    parser = argparse.ArgumentParser(description="creppl JSON-RPC client")
+    parser.add_argument("--socket", help="the unix socket of a running 'creppl --serve --socket' server")
+    parser.add_argument("method", nargs="?", help="the RPC method to call")
+    parser.add_argument("params", nargs="?", default="{}", help="the parameters, as a JSON object")
+    args = parser.parse_args()
+
+    client = Client(args.socket)
+    try:
+        if args.method is not None:
+            print(json.dumps(client.call(args.method, **json.loads(args.params)), indent=2))
+            return
+        client.call("session.open", name="client-demo")
+        client.call("edit", session="client-demo", statement='std::cout << "Hello from creppl --serve" << std::endl;')
+        result = client.call("run", session="client-demo")
+        print(result["compile"]["stderr"] or result["stdout"], end="")
+        print(client.call("command", session="client-demo", command="$print")["output"], end="")
+        client.call("session.close", name="client-demo")
+    except ClientError as _ex:
+        print(f"ClientError: {_ex}.")
+    finally:
+        if args.socket is None:
+            # The server may have died already, and the error that reported it must not be hidden
+            try:
+                client.call("shutdown")
+            except (OSError, ClientError):
+                pass
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# creppl/server/rpc.py
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from creppl.proc.build import ArtifactCache
+from creppl.proc.process import spawn_and_wait
+from creppl.server.session import Session
+
+"""JSON-RPC 2.0 error codes"""
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+"""Seconds a session program may run before it is killed"""
+RUN_TIMEOUT = 10
+
+
+def run_process(cmd_list, cwd=None, env=None, timeout=RUN_TIMEOUT):
+    """
+    Runs a process in its own process group and returns its exit code and output.
+
+    The whole process group is killed if the process runs longer than timeout.
+
+    Parameters
+    ----------
+    cmd_list: List[str]
+        The command to run
+    cwd: str
+        The working directory of the process
+    env: Dict[str, str]
+        Environment variables to set for the process
+    timeout: float
+        The maximum number of seconds to wait
+
+    Returns
+    -------
+    Tuple[int, bytes, bytes]
+        The exit code, stdout and stderr of the process
+    """
+
+    returncode, stdout, stderr, _ = spawn_and_wait(cmd_list, cwd=cwd, env=env, timeout=timeout)
+    return returncode, stdout, stderr
+
+
+class RpcError(Exception):
+    """
+    An error reported to the client as a JSON-RPC error object.
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class Server:
+    """
+    Serves creppl sessions over JSON-RPC 2.0, one JSON message per line, on stdio or a unix socket.
+
+    Any number of named sessions can be open at once, each with its own FileIO and working directory. Builds and runs
+    are executed on a bounded pool of worker threads; the artifact store and the header symbol indexes are shared by
+    every session. Requests of one connection may be answered out of order.
+
+    RPC Methods
+    -----------
+    session.open {name} -> state
+        Opens the session, creating it with the default contents if it is not open yet.
+    session.close {name}
+        Closes the session. Its files are kept.
+    session.list -> [name]
+        Lists the open sessions.
+    session.state {session} -> state
+        Returns the cursor, line count and source of the session.
+    edit {session, statement} -> {cursor}
+        Writes a statement at the cursor.
+    command {session, command} -> {output, cursor}
+        Runs an editing '$' command.
+    complete {session, line, index} -> {start, candidates}
+        Completes the word before index.
+    compile {session} -> {returncode, stderr, cached}
+        Compiles the session.
+    run {session} -> {returncode, stdout, stderr, compile}
+        Compiles, if needed, and runs the session.
+    shutdown
+        Stops the server after answering.
+
+    Attributes
+    ----------
+    __sessions: Dict[str, Session]
+        The open sessions, by name.
+    __lock: threading.Lock
+        Guards __sessions.
+    __pool: ThreadPoolExecutor
+        Runs the compile and run requests.
+    __artifacts: ArtifactCache
+        The artifact store shared by every session.
+    __stopped: threading.Event
+        Set by the shutdown method.
+
+    Methods
+    -------
+    stopped() -> bool
+        Returns whether the shutdown method has been called.
+    handle(request: dict) -> Optional[dict]
+        Handles one decoded JSON-RPC request.
+    serve_stream(reader: BinaryIO, writer: BinaryIO)
+        Serves requests read line by line from reader until end of file or shutdown.
+    serve_stdio()
+        Serves a single client on the standard input and output.
+    serve_unix(path: str)
+        Serves any number of clients on a unix socket until shutdown.
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        Parameters
+        ----------
+        max_workers: int
+            The maximum number of concurrent builds and runs. Defaults to the number of CPUs.
+        """
+
+        self.__sessions = {}
+        self.__lock = threading.Lock()
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 2,
+                                         thread_name_prefix="creppl-rpc")
+        self.__artifacts = ArtifactCache()
+        self.__stopped = threading.Event()
+        self.__methods = {
+            "session.open": self.__open__,
+            "session.close": self.__close__,
+            "session.list": self.__list__,
+            "session.state": lambda params: self.__session__(params).state(),
+            "edit": self.__edit__,
+            "command": self.__command__,
+            "complete": self.__complete__,
+            "compile": self.__compile__,
+            "run": self.__run__,
+            "shutdown": self.__shutdown__,
+        }
+        self.__pooled = {"compile", "run"}
+
+    @staticmethod
+    def __param__(params: dict, name: str, kind=str):
+        value = params.get(name)
+        if not isinstance(value, kind):
+            raise RpcError(INVALID_PARAMS, f'Missing or invalid parameter "{name}"')
+        return value
+
+    def __session__(self, params: dict):
+        name = self.__param__(params, "session")
+        with self.__lock:
+            session = self.__sessions.get(name)
+        if session is None:
+            raise RpcError(INVALID_PARAMS, f'Unknown session "{name}"')
+        return session
+
+    def __open__(self, params: dict):
+        name = self.__param__(params, "name")
+        with self.__lock:
+            session = self.__sessions.get(name)
+            if session is None:
+                try:
+                    session = Session(name, self.__artifacts)
+                except ValueError as _ex:
+                    raise RpcError(INVALID_PARAMS, str(_ex))
+                self.__sessions[name] = session
+        with session.lock:
+            return session.state()
+
+    def __close__(self, params: dict):
+        name = self.__param__(params, "name")
+        with self.__lock:
+            session = self.__sessions.pop(name, None)
+        if session is None:
+            raise RpcError(INVALID_PARAMS, f'Unknown session "{name}"')
+        with session.lock:
+            session.workspace.cleanup()
+        return None
+
+    def __list__(self, _params: dict):
+        with self.__lock:
+            return sorted(self.__sessions)
+
+    def __edit__(self, params: dict):
+        session = self.__session__(params)
+        statement = self.__param__(params, "statement")
+        with session.lock:
+            return session.edit(statement)
+
+    def __command__(self, params: dict):
+        session = self.__session__(params)
+        command = self.__param__(params, "command")
+        if not command.startswith("$"):
+            command = "$" + command
+        with session.lock:
+            try:
+                return session.command(command)
+            except ValueError as _ex:
+                raise RpcError(INVALID_PARAMS, str(_ex))
+
+    def __complete__(self, params: dict):
+        session = self.__session__(params)
+        line = self.__param__(params, "line")
+        index = params.get("index", len(line))
+        if not isinstance(index, int):
+            raise RpcError(INVALID_PARAMS, 'Invalid parameter "index"')
+        start, candidates = session.completer.candidates(line, index)
+        return {"start": start, "candidates": candidates}
+
+    def __compile__(self, params: dict):
+        session = self.__session__(params)
+        with session.lock:
+            return session.compile(run_process)
+
+    def __run__(self, params: dict):
+        session = self.__session__(params)
+        with session.lock:
+            return session.execute(run_process)
+
+    def __shutdown__(self, _params: dict):
+        self.__stopped.set()
+        return None
+
+    def stopped(self):
+        """
+        Returns whether the shutdown method has been called.
+
+        Returns
+        -------
+        bool
+            True if the server is stopping, otherwise False
+        """
+
+        return self.__stopped.is_set()
+
+    def handle(self, request):
+        """
+        Handles one decoded JSON-RPC request.
+
+        Parameters
+        ----------
+        request: Any
+            The decoded request object
+
+        Returns
+        -------
+        Optional[dict]
+            The response object, or None for a notification
+        """
+
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(INVALID_REQUEST, "Invalid request")
+            method = self.__methods.get(request["method"])
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f'Unknown method "{request["method"]}"')
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "Parameters must be an object")
+            response = {"jsonrpc": "2.0", "id": request_id, "result": method(params)}
+        except RpcError as _ex:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": _ex.code, "message": _ex.message}}
+        except Exception as _ex:
+            traceback.print_exc(file=sys.stderr)
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": INTERNAL_ERROR, "message": f"{type(_ex).__name__}: {_ex}"}}
+        if isinstance(request, dict) and "id" not in request:
+            return None
+        return response
+
+    def serve_stream(self, reader, writer):
+        """
+        Serves requests read line by line from reader until end of file or shutdown.
+
+        Compile and run requests are handed to the worker pool; all other requests are answered in order.
+
+        Parameters
+        ----------
+        reader: BinaryIO
+            The stream to read requests from
+        writer: BinaryIO
+            The stream to write responses to
+        """
+
+        write_lock = threading.Lock()
+        pending = []
+
+        def respond(response):
+            if response is None:
+                return
+            data = json.dumps(response).encode() + b"\n"
+            with write_lock:
+                writer.write(data)
+                writer.flush()
+
+        for line in reader:
+            if len(line.strip()) == 0:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                respond({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error"}})
+                continue
+            if isinstance(request, dict) and request.get("method") in self.__pooled:
+                pending.append(self.__pool.submit(lambda queued=request: respond(self.handle(queued))))
+            else:
+                respond(self.handle(request))
+            if self.__stopped.is_set():
+                break
+
+        for future in pending:
+            future.result()
+
+    def serve_stdio(self):
+        """
+        Serves a single client on the standard input and output.
+        """
+
+        self.serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+        self.__pool.shutdown()
+
+    def serve_unix(self, path: str):
+        """
+        Serves any number of clients on a unix socket until shutdown.
+
+        Parameters
+        ----------
+        path: str
+            The path of the socket. A stale socket file is replaced.
+        """
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.serve_stream(self.rfile, self.wfile)
+                if server.stopped():
+                    threading.Thread(target=listener.shutdown, daemon=True).start()
+
+        class Listener(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(path)
+                raise OSError(f"A server is already listening on {path}")
+            except ConnectionRefusedError:
+                os.remove(path)
+            finally:
+                probe.close()
+
+        listener = Listener(path, Handler)
+        try:
+            listener.serve_forever()
+        finally:
+            listener.server_close()
+            self.__pool.shutdown()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
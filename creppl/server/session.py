@@ -0,0 +1,223 @@
+# creppl/server/session.py
+
+import io
+import os
+import threading
+from contextlib import redirect_stdout
+
+from creppl.cmd import Command
+from creppl.cmd.on_command import on_command_del, on_command_goto, on_command_print, on_command_reset, \
+    on_command_set_write_mode
+from creppl.io import DEFAULT_FILE_CONTENTS, DEFAULT_FILENAME, WORKING_DIR
+from creppl.io.completion import Completer
+from creppl.io.fileio import FileIO
+from creppl.proc.build import ArtifactCache, DependencyTracker, compile_program
+from creppl.proc.workspace import BuildWorkspace
+from creppl.utils.helpers import extract_creppl_command, has_args, is_creppl_command
+
+"""Directory that holds a working directory per server session"""
+SESSIONS_DIR = WORKING_DIR + "/sessions"
+
+"""Serialises the redirection of sys.stdout while 'on_command' functions run"""
+_STDOUT_LOCK = threading.Lock()
+
+
+class Session:
+    """
+    A named REPL session hosted by the server, with its own FileIO and working directory.
+
+    Attributes
+    ----------
+    name: str
+        The session name
+    directory: str
+        The working directory of the session; the source is in 'src'
+    workspace: BuildWorkspace
+        The in-memory directory that receives the executable and the compiler's temporary files
+    fileio: FileIO
+        The session source
+    completer: Completer
+        Tab completion for the session; header indexes are shared between sessions
+    lock: threading.Lock
+        Serialises the operations on this session
+    __exec_path: str
+        The path of the session executable
+    __artifacts: ArtifactCache
+        The artifact store shared by every session
+    __deps: DependencyTracker
+        The user headers included by the session source
+
+    Methods
+    -------
+    edit(statement: str) -> dict
+        Writes a statement at the cursor, as a commit does in the REPL.
+    command(statement: str) -> dict
+        Runs a '$' command and returns its output.
+    compile(run: Callable) -> dict
+        Compiles the session source.
+    execute(run: Callable) -> dict
+        Compiles the session source, if needed, and runs the executable.
+    state() -> dict
+        Returns the cursor, line count and source of the session.
+    """
+
+    def __init__(self, name: str, artifacts: ArtifactCache, root=SESSIONS_DIR):
+        """
+        Parameters
+        ----------
+        name: str
+            The session name. It is used as a directory name.
+        artifacts: ArtifactCache
+            The artifact store shared by every session
+        root: str
+            The directory that holds the session directories
+        """
+
+        if len(name) == 0 or "/" in name or name.startswith("."):
+            raise ValueError(f'Invalid session name "{name}"')
+        self.name = name
+        self.directory = f"{root}/{name}"
+        os.makedirs(self.directory + "/src", exist_ok=True)
+        self.fileio = FileIO(f"{self.directory}/src/{DEFAULT_FILENAME}")
+        self.completer = Completer(self.fileio)
+        self.completer.refresh()
+        self.lock = threading.Lock()
+        self.workspace = BuildWorkspace(prefix=f"session-{name}-")
+        self.__exec_path = self.workspace.path(DEFAULT_FILENAME[:-len(".cpp")])
+        self.__artifacts = artifacts
+        self.__deps = DependencyTracker()
+
+    def __append_bracket__(self):
+        file_cursor = self.fileio.get_cursor()
+        self.fileio.erase_last_char("}")
+        self.fileio.write("}\n", "a+")
+        self.fileio.set_cursor(file_cursor)
+
+    def state(self):
+        """
+        Returns the cursor, line count and source of the session.
+
+        Returns
+        -------
+        dict
+            {"name", "cursor", "lines", "source"}
+        """
+
+        with open(self.fileio.filepath, "r") as file:
+            source = file.read()
+        return {"name": self.name, "cursor": self.fileio.get_cursor(), "lines": self.fileio.get_line_count(),
+                "source": source}
+
+    def edit(self, statement: str):
+        """
+        Writes a statement at the cursor, as a commit does in the REPL.
+
+        Parameters
+        ----------
+        statement: str
+            The C++ statement
+
+        Returns
+        -------
+        dict
+            {"cursor"}
+        """
+
+        self.fileio.write(statement + "\n", "i")
+        self.__append_bracket__()
+        return {"cursor": self.fileio.get_cursor()}
+
+    def command(self, statement: str):
+        """
+        Runs a '$' command and returns its output.
+
+        The editing commands are supported: $del, $ins, $rep, $goto, $print and $reset. As in the REPL, a statement
+        left after the command (e.g. "$ins 3 int x;") is written with edit().
+
+        Parameters
+        ----------
+        statement: str
+            The command, starting with '$'
+
+        Raises
+        ------
+        ValueError
+            If the command is unknown or not supported by the server
+
+        Returns
+        -------
+        dict
+            {"output", "cursor"}
+        """
+
+        statement, kwargs = extract_creppl_command(statement)
+        if kwargs is None or not is_creppl_command(kwargs[0]):
+            raise ValueError(f'Unknown command: "${statement}"')
+        cmd = kwargs[0]
+
+        if cmd in (Command.PRINT, Command.RESET) and has_args(statement, kwargs):
+            raise ValueError(f'Command "${cmd}" takes no arguments')
+
+        out = io.StringIO()
+        with _STDOUT_LOCK, redirect_stdout(out):
+            if cmd == Command.DEL:
+                on_command_del(self.fileio, statement, kwargs)
+                if "}" not in self.fileio.get_line(self.fileio.get_line_count()):
+                    self.__append_bracket__()
+            elif cmd in (Command.INSERT, Command.REPLACE):
+                on_command_set_write_mode(self.fileio, cmd, statement, kwargs)
+                if statement is None:
+                    statement = ""
+            elif cmd == Command.GOTO:
+                on_command_goto(self.fileio, statement, kwargs)
+            elif cmd == Command.PRINT:
+                on_command_print(self.fileio)
+            elif cmd == Command.RESET:
+                on_command_reset(self.fileio, DEFAULT_FILE_CONTENTS)
+            else:
+                raise ValueError(f'Command "${cmd}" is not available in server sessions')
+
+        if statement is not None:
+            self.edit(statement)
+        return {"output": out.getvalue(), "cursor": self.fileio.get_cursor()}
+
+    def compile(self, run):
+        """
+        Compiles the session source.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr
+
+        Returns
+        -------
+        dict
+            {"returncode", "stderr", "cached"}
+        """
+
+        returncode, _, stderr, cached = compile_program(run, self.fileio.filepath, self.__exec_path,
+                                                        self.__artifacts, workspace=self.workspace, deps=self.__deps)
+        return {"returncode": returncode, "stderr": stderr.decode(errors="replace"), "cached": cached}
+
+    def execute(self, run):
+        """
+        Compiles the session source, if needed, and runs the executable.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr
+
+        Returns
+        -------
+        dict
+            {"returncode", "stdout", "stderr", "compile"}
+        """
+
+        build = self.compile(run)
+        if build["returncode"] != 0:
+            return {"returncode": None, "stdout": "", "stderr": "", "compile": build}
+        returncode, stdout, stderr = run([self.__exec_path], cwd=self.directory)
+        return {"returncode": returncode, "stdout": stdout.decode(errors="replace"),
+                "stderr": stderr.decode(errors="replace"), "compile": build}
@@ -0,0 +1,9 @@
+# creppl/tools/__init__.py
+
+"""Analysis commands that build and run instrumented variants of the session program"""
+
+"""Optimisation flags accepted by the analysis commands"""
+OPT_LEVELS = ("-O0", "-O1", "-O2", "-O3", "-Os", "-Ofast", "-Og")
+
+"""Optimisation level used when a command is not given one"""
+DEFAULT_OPT_LEVEL = "-O2"
@@ -0,0 +1,212 @@
+# creppl/tools/asm.py
+
+import re
+import shutil
+from itertools import zip_longest
+
+from creppl.io import COMPILER
+from creppl.proc.build import ArtifactCache, DEFAULT_FLAGS, build_key
+from creppl.proc.workspace import runtime_dir
+
+"""Directory of the cached assembly listings"""
+ASM_DIR = runtime_dir() + "/asm"
+
+"""Flags added to every listing; unwind tables only add directives"""
+ASM_FLAGS = ("-S", "-fno-asynchronous-unwind-tables")
+
+_FUNCTION_RE = re.compile(r"^\s*\.type\s+([^,\s]+),\s*@function")
+_LABEL_RE = re.compile(r"^([^\s#][^:\s]*):")
+_LOCAL_LABEL_RE = re.compile(r"\.L\w+")
+_MANGLED_RE = re.compile(r"\b_Z[\w.$]+")
+_TEMPLATE_ARGS_RE = re.compile(r"<.*>")
+
+
+def parse_functions(asm: str):
+    """
+    Splits compiler assembly output into functions with the noise removed.
+
+    Directives, comments and labels that are not referenced by an instruction of the same function are dropped.
+
+    Parameters
+    ----------
+    asm: str
+        The output of the compiler's -S
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        The lines of each function, by (mangled) symbol name, in order of appearance
+    """
+
+    names = set(match.group(1) for match in map(_FUNCTION_RE.match, asm.split("\n")) if match is not None)
+    functions = {}
+    current = None
+    for line in asm.split("\n"):
+        label = _LABEL_RE.match(line)
+        if label is not None:
+            if label.group(1) in names:
+                current = functions.setdefault(label.group(1), [])
+            elif current is not None:
+                current.append(label.group(1) + ":")
+            continue
+        text = line.strip()
+        if current is None or len(text) == 0 or text.startswith("#"):
+            continue
+        if text.startswith(".size"):
+            current = None
+        elif not text.startswith("."):
+            parts = text.split(None, 1)
+            current.append(f"    {parts[0]:<7} {parts[1] if len(parts) > 1 else ''}".rstrip())
+
+    for name, lines in functions.items():
+        referenced = set()
+        for line in lines:
+            if not line.endswith(":"):
+                referenced.update(_LOCAL_LABEL_RE.findall(line))
+        functions[name] = [line for line in lines if not line.endswith(":") or line[:-1] in referenced]
+    return functions
+
+
+class Disassembly:
+    """
+    A filtered, demangled assembly listing of a function of the session at one or two optimisation levels.
+
+    The compiler output is cached in ASM_DIR by source and flags, so listing other functions or repeating a level
+    does not recompile.
+
+    Attributes
+    ----------
+    function: str
+        The name of the function, e.g. "main" or "foo"; all overloads and member functions of that name are listed
+    opt_levels: List[str]
+        One optimisation level, or two to compare side by side
+    __source: bytes
+        The session source
+
+    Methods
+    -------
+    run(run: Callable, workspace: BuildWorkspace) -> str
+        Builds the listings and returns them as text.
+    """
+
+    def __init__(self, source: str, function: str, opt_levels):
+        """
+        Parameters
+        ----------
+        source: str
+            The session source
+        function: str
+            The name of the function to list
+        opt_levels: List[str]
+            One optimisation level, or two to compare side by side
+        """
+
+        self.function = function
+        self.opt_levels = list(opt_levels)
+        self.__source = source.encode()
+        self.__cache = ArtifactCache(ASM_DIR)
+
+    def __assemble__(self, run, workspace, opt_level: str):
+        """
+        Returns the compiler assembly output of the session at opt_level, from the cache if possible.
+        """
+
+        flags = [*DEFAULT_FLAGS, *ASM_FLAGS, opt_level]
+        key = build_key(self.__source, flags)
+        path = self.__cache.get(key)
+        if path is None:
+            source_path = workspace.path("asm.cpp")
+            path = workspace.path(f"asm{opt_level}.s")
+            with open(source_path, "wb") as file:
+                file.write(self.__source)
+            returncode, _, stderr = run([COMPILER, *flags, "-o", path, source_path], env=workspace.env())
+            if returncode != 0:
+                raise RuntimeError("Compilation failed:\n" + stderr.decode(errors="replace"))
+            self.__cache.put(key, path)
+        with open(path, "r") as file:
+            return file.read()
+
+    def __matches__(self, demangled: str):
+        # "int ns::foo<int>(int) [clone .cold]" -> "ns::foo"
+        name = _TEMPLATE_ARGS_RE.sub("", demangled.split(" [clone", 1)[0].split("(", 1)[0]).split()[-1]
+        return name == self.function or name.endswith("::" + self.function)
+
+    def __listing__(self, functions, names):
+        lines = []
+        for mangled, body in functions.items():
+            if self.__matches__(names.get(mangled, mangled)):
+                if len(lines) > 0:
+                    lines.append("")
+                lines.append(names.get(mangled, mangled) + ":")
+                lines.extend(_MANGLED_RE.sub(lambda match: names.get(match.group(0), match.group(0)), line)
+                             for line in body)
+        return lines
+
+    def run(self, run, workspace):
+        """
+        Builds the listings and returns them as text.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+        workspace: BuildWorkspace
+            The workspace that receives the compiler output
+
+        Raises
+        ------
+        RuntimeError
+            If the session fails to compile or the function is not found
+
+        Returns
+        -------
+        str
+            The listing, or two listings side by side
+        """
+
+        parsed = [parse_functions(self.__assemble__(run, workspace, level)) for level in self.opt_levels]
+        symbols = set()
+        for functions in parsed:
+            symbols.update(functions)
+            for lines in functions.values():
+                for line in lines:
+                    symbols.update(_MANGLED_RE.findall(line))
+        names = demangle(run, sorted(symbols))
+
+        listings = [self.__listing__(functions, names) for functions in parsed]
+        if all(len(listing) == 0 for listing in listings):
+            raise RuntimeError(f'No function named "{self.function}" in the assembly; it may have been inlined.')
+        if len(listings) == 1:
+            return "\n".join(listings[0])
+
+        width = max(20, (shutil.get_terminal_size().columns - 3) // 2)
+        lines = [f"{self.opt_levels[0]:<{width}} | {self.opt_levels[1]}", f"{'-' * width}-+-{'-' * width}"]
+        for left, right in zip_longest(*listings, fillvalue=""):
+            lines.append(f"{left[:width]:<{width}} | {right[:width]}".rstrip())
+        return "\n".join(lines)
+
+
+def demangle(run, symbols):
+    """
+    Demangles C++ symbol names with c++filt.
+
+    Parameters
+    ----------
+    run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+        Runs a command and returns its exit code, stdout and stderr
+    symbols: List[str]
+        The mangled names
+
+    Returns
+    -------
+    Dict[str, str]
+        The demangled name of each symbol; empty if c++filt is not installed
+    """
+
+    if len(symbols) == 0 or shutil.which("c++filt") is None:
+        return {}
+    returncode, stdout, _ = run(["c++filt", *symbols])
+    demangled = stdout.decode(errors="replace").split("\n")
+    if returncode != 0 or len(demangled) < len(symbols):
+        return {}
+    return dict(zip(symbols, demangled))
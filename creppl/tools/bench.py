@@ -0,0 +1,375 @@
+# creppl/tools/bench.py
+
+import json
+import math
+import os
+import re
+import statistics
+import time
+
+from creppl.io import WORKING_DIR
+from creppl.proc.build import DEFAULT_FLAGS, compile_program
+from creppl.tools import DEFAULT_OPT_LEVEL
+
+"""Directory that holds the stored benchmark results of each session"""
+BENCH_DIR = WORKING_DIR + "/bench"
+
+"""Number of results kept per session"""
+MAX_RESULTS = 50
+
+"""The code generated around the benchmarked statements. The statements run in a lambda, so they can see the
+variables declared by the setup code and may return a value, which is passed to the sink."""
+HARNESS = """\
+{preamble}
+#include <chrono>
+#include <cstddef>
+#include <cstdio>
+#include <type_traits>
+#include <vector>
+
+namespace creppl {{
+template <class T>
+inline void DoNotOptimize(T const& value) {{ asm volatile("" : : "r,m"(value) : "memory"); }}
+inline void ClobberMemory() {{ asm volatile("" : : : "memory"); }}
+
+template <class F>
+__attribute__((noinline)) double bench_run(F& body, std::size_t iterations) {{
+    auto start = std::chrono::steady_clock::now();
+    for (std::size_t i = 0; i < iterations; ++i) {{
+        if constexpr (std::is_void_v<decltype(body())>) {{
+            body();
+        }} else {{
+            DoNotOptimize(body());
+        }}
+        ClobberMemory();
+    }}
+    return std::chrono::duration<double, std::nano>(std::chrono::steady_clock::now() - start).count();
+}}
+}}  // namespace creppl
+
+int main(int argc, char** argv) {{
+    using creppl::DoNotOptimize;
+    using creppl::ClobberMemory;
+{setup}
+    auto creppl_body = [&]() {{
+{body}
+    }};
+
+    std::FILE* creppl_out = std::fopen(argv[argc - 1], "w");
+    if (creppl_out == nullptr) {{
+        return 2;
+    }}
+    // Warm up caches and branch predictors
+    double creppl_elapsed = 0;
+    for (std::size_t n = 1; creppl_elapsed < {warmup_ns}; n *= 2) {{
+        creppl_elapsed += creppl::bench_run(creppl_body, n);
+    }}
+    // Calibrate the iterations of one sample to the target sample time
+    std::size_t creppl_iterations = 1;
+    for (;;) {{
+        double ns = creppl::bench_run(creppl_body, creppl_iterations);
+        if (ns >= {sample_ns} || creppl_iterations >= ((std::size_t) 1 << 40)) {{
+            break;
+        }}
+        double scale = ns > 0 ? 1.4 * {sample_ns} / ns : 10;
+        creppl_iterations = (std::size_t) (creppl_iterations * (scale < 2 ? 2 : scale > 10 ? 10 : scale));
+    }}
+    std::vector<double> creppl_samples;
+    creppl_elapsed = 0;
+    while (creppl_samples.size() < {max_samples} &&
+           (creppl_samples.size() < {min_samples} || creppl_elapsed < {budget_ns})) {{
+        double ns = creppl::bench_run(creppl_body, creppl_iterations);
+        creppl_elapsed += ns;
+        creppl_samples.push_back(ns / creppl_iterations);
+    }}
+    std::fprintf(creppl_out, "%zu\\n", creppl_iterations);
+    for (double sample : creppl_samples) {{
+        std::fprintf(creppl_out, "%.17g\\n", sample);
+    }}
+    return std::fclose(creppl_out) == 0 ? 0 : 2;
+}}
+"""
+
+_MAIN_RE = re.compile(r"^\s*int\s+main\s*\([^)]*\)\s*\{?\s*$")
+_RETURN_RE = re.compile(r"^\s*return\b[^;]*;\s*$")
+
+
+def split_main(source: str):
+    """
+    Splits a session source into the code before main() and the statements in the body of main().
+
+    Parameters
+    ----------
+    source: str
+        The session source
+
+    Returns
+    -------
+    Tuple[str, List[str]]
+        The code before main() and the lines of its body, or the whole source and an empty list if main() is not found
+    """
+
+    lines = source.split("\n")
+    for idx, line in enumerate(lines):
+        if _MAIN_RE.match(line):
+            start = idx + 1
+            if "{" not in line and start < len(lines) and lines[start].strip() == "{":
+                start += 1
+            end = len(lines)
+            while end > start and "}" not in lines[end - 1]:
+                end -= 1
+            body = lines[start:end - 1] if end > start else lines[start:]
+            return "\n".join(lines[:idx]), [line for line in body if len(line.strip()) > 0]
+    return source, []
+
+
+def format_duration(ns: float):
+    """
+    Formats a duration given in nanoseconds with a unit suited to its size.
+
+    Parameters
+    ----------
+    ns: float
+        The duration in nanoseconds
+
+    Returns
+    -------
+    str
+        e.g. "12.3 us"
+    """
+
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if abs(ns) >= scale:
+            return f"{ns / scale:.3g} {unit}"
+    return f"{ns:.3g} ns"
+
+
+def percentile(values, fraction: float):
+    """
+    Returns the percentile of values by linear interpolation between the closest ranks.
+
+    Parameters
+    ----------
+    values: List[float]
+        The samples, sorted in ascending order
+    fraction: float
+        The percentile as a fraction, e.g. 0.99
+
+    Returns
+    -------
+    float
+        The percentile
+    """
+
+    position = (len(values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class Benchmark:
+    """
+    A microbenchmark of statements from the session, built and run in a generated harness.
+
+    The harness warms up, calibrates the number of iterations so one sample takes about __SAMPLE_NS__ and then takes up
+    to __MAX_SAMPLES__ samples within __BUDGET_NS__. The statements may call DoNotOptimize(value) and ClobberMemory()
+    to keep the compiler from removing the work; a value they return is passed to DoNotOptimize().
+
+    Attributes
+    ----------
+    label: str
+        The benchmarked statements, on one line
+    flags: List[str]
+        The compiler flags of the benchmark build
+    __source: str
+        The generated harness
+
+    Methods
+    -------
+    run(run: Callable, workspace: BuildWorkspace, cache: ArtifactCache) -> dict
+        Builds and runs the harness and returns its statistics.
+    """
+
+    __WARMUP_NS__ = 50e6
+    __SAMPLE_NS__ = 5e6
+    __BUDGET_NS__ = 1e9
+    __MIN_SAMPLES__ = 5
+    __MAX_SAMPLES__ = 100
+
+    def __init__(self, source: str, statements=None, opt_level=DEFAULT_OPT_LEVEL):
+        """
+        Parameters
+        ----------
+        source: str
+            The session source
+        statements: str
+            The statements to benchmark. The body of main() is run once before them as setup. If None, the body of
+            main() is benchmarked instead.
+        opt_level: str
+            One of OPT_LEVELS
+        """
+
+        preamble, body = split_main(source)
+        body = [line for line in body if not _RETURN_RE.match(line)]
+        if statements is None:
+            setup, statements = [], body
+        else:
+            setup, statements = body, [statements]
+        self.label = " ".join(" ".join(statements).split())
+        self.flags = [*DEFAULT_FLAGS, opt_level]
+        self.__source = HARNESS.format(
+            preamble=preamble, setup="\n".join(setup), body="\n".join(statements),
+            warmup_ns=self.__WARMUP_NS__, sample_ns=self.__SAMPLE_NS__, budget_ns=self.__BUDGET_NS__,
+            min_samples=self.__MIN_SAMPLES__, max_samples=self.__MAX_SAMPLES__)
+
+    def run(self, run, workspace, cache):
+        """
+        Builds and runs the harness and returns its statistics.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+        workspace: BuildWorkspace
+            The workspace that receives the harness, its executable and the results
+        cache: ArtifactCache
+            The artifact store, or None to always compile
+
+        Raises
+        ------
+        RuntimeError
+            If the harness fails to compile or to run
+
+        Returns
+        -------
+        dict
+            {"label", "flags", "time", "iterations", "samples", "mean", "p50", "p99", "stddev"}, durations in
+            nanoseconds per iteration
+        """
+
+        source_path = workspace.path("bench.cpp")
+        exec_path = workspace.path("bench")
+        results_path = workspace.path("bench.out")
+        with open(source_path, "w") as file:
+            file.write(self.__source)
+
+        returncode, _, stderr, _ = compile_program(run, source_path, exec_path, cache, self.flags, workspace)
+        if returncode != 0:
+            raise RuntimeError("Benchmark failed to compile:\n" + stderr.decode(errors="replace"))
+        try:
+            os.remove(results_path)
+        except OSError:
+            pass
+        returncode, _, stderr = run([exec_path, results_path], cwd=workspace.directory)
+        try:
+            with open(results_path, "r") as file:
+                values = file.read().split()
+        except OSError:
+            values = []
+        if returncode != 0 or len(values) < 2:
+            message = stderr.decode(errors="replace").strip() or f"exit code {returncode}"
+            raise RuntimeError(f"Benchmark did not complete: {message}")
+
+        samples = sorted(float(value) for value in values[1:])
+        return {
+            "label": self.label,
+            "flags": self.flags,
+            "time": time.time(),
+            "iterations": int(values[0]),
+            "samples": len(samples),
+            "mean": statistics.fmean(samples),
+            "p50": percentile(samples, 0.5),
+            "p99": percentile(samples, 0.99),
+            "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        }
+
+
+class BenchStore:
+    """
+    The benchmark results of a session, kept in a JSON file so later runs can be compared with them.
+
+    Methods
+    -------
+    last() -> Optional[dict]
+        Returns the most recent result.
+    add(result: dict)
+        Appends a result, keeping the last MAX_RESULTS.
+    """
+
+    def __init__(self, session: str, root=BENCH_DIR):
+        """
+        Parameters
+        ----------
+        session: str
+            The session name, e.g. the source filename
+        root: str
+            The directory of the result files
+        """
+
+        self.__path = f"{root}/{session}.json"
+        os.makedirs(root, exist_ok=True)
+
+    def __load__(self):
+        try:
+            with open(self.__path, "r") as file:
+                results = json.load(file)
+        except (OSError, ValueError):
+            return []
+        return results if isinstance(results, list) else []
+
+    def last(self):
+        """
+        Returns the most recent result.
+
+        Returns
+        -------
+        Optional[dict]
+            The result, or None if there is none
+        """
+
+        results = self.__load__()
+        return results[-1] if len(results) > 0 else None
+
+    def add(self, result: dict):
+        """
+        Appends a result, keeping the last MAX_RESULTS.
+
+        Parameters
+        ----------
+        result: dict
+            A result returned by Benchmark.run()
+        """
+
+        results = (self.__load__() + [result])[-MAX_RESULTS:]
+        tmp_path = self.__path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(results, file)
+        os.replace(tmp_path, self.__path)
+
+
+def format_report(result: dict, baseline=None):
+    """
+    Formats a benchmark result and its change from a baseline.
+
+    Parameters
+    ----------
+    result: dict
+        A result returned by Benchmark.run()
+    baseline: dict
+        The previous result, if any
+
+    Returns
+    -------
+    str
+        The report
+    """
+
+    lines = [f"{result['label'][:60]}  [{' '.join(result['flags'][len(DEFAULT_FLAGS):])}]",
+             f"  {result['samples']} samples x {result['iterations']} iterations"]
+    stats = "  ".join(f"{name} {format_duration(result[name])}" for name in ("mean", "p50", "p99", "stddev"))
+    lines.append("  " + stats)
+    if baseline is not None and baseline.get("mean", 0) > 0:
+        change = (result["mean"] - baseline["mean"]) / baseline["mean"] * 100
+        lines.append(f"  {change:+.1f}% mean vs previous {format_duration(baseline['mean'])} "
+                     f"({baseline['label'][:40]}  [{' '.join(baseline['flags'][len(DEFAULT_FLAGS):])}])")
+    return "\n".join(lines)
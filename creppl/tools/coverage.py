@@ -0,0 +1,160 @@
+# creppl/tools/coverage.py
+
+import math
+import os
+import shutil
+
+from creppl.io import COMPILER
+from creppl.proc.build import DEFAULT_FLAGS
+
+"""Flags of the coverage build. Optimisation would merge and move lines, so counts are taken at -O0."""
+COVERAGE_FLAGS = ("--coverage", "-O0")
+
+"""Colours from coldest to hottest executed line"""
+HEAT_COLOURS = ("\033[32m", "\033[33m", "\033[31m", "\033[1;31m")
+
+_SOURCE_NAME = "hot.cpp"
+
+
+def parse_gcov(text: str, source_name: str):
+    """
+    Parses the line counts of one source file from the text output of gcov -t.
+
+    Parameters
+    ----------
+    text: str
+        The gcov output
+    source_name: str
+        The name of the source file, as gcov reports it
+
+    Returns
+    -------
+    Dict[int, int]
+        The execution count of each line that has code; lines that were never executed have a count of 0
+    """
+
+    counts = {}
+    current = None
+    for line in text.split("\n"):
+        parts = line.split(":", 2)
+        if len(parts) < 3:
+            continue
+        count, line_num = parts[0].strip(), parts[1].strip()
+        if line_num == "0":
+            if parts[2].startswith("Source:"):
+                current = os.path.basename(parts[2][len("Source:"):].strip())
+            continue
+        if current != source_name or count == "-" or not line_num.isnumeric():
+            continue
+        count = count.rstrip("*")
+        counts[int(line_num)] = int(count) if count.isnumeric() else 0
+    return counts
+
+
+class Coverage:
+    """
+    The execution count of every line of the session, from a gcov build.
+
+    The coverage build lives in its own directory of the workspace, apart from the normal executables, and is reused
+    while the source is unchanged. The counters are reset before every run, so the counts are those of one run.
+
+    Attributes
+    ----------
+    __source: str
+        The session source
+
+    Methods
+    -------
+    run(run: Callable, workspace: BuildWorkspace) -> str
+        Builds and runs the program with coverage and returns the annotated source.
+    """
+
+    def __init__(self, source: str):
+        """
+        Parameters
+        ----------
+        source: str
+            The session source
+        """
+
+        self.__source = source
+
+    @staticmethod
+    def __heat__(count: int, max_count: int):
+        """
+        Returns the colour of a line executed count times.
+        """
+
+        if max_count <= 1:
+            return HEAT_COLOURS[0]
+        level = math.log(count) / math.log(max_count) if count > 1 else 0
+        return HEAT_COLOURS[min(len(HEAT_COLOURS) - 1, int(level * len(HEAT_COLOURS)))]
+
+    def run(self, run, workspace):
+        """
+        Builds and runs the program with coverage and returns the annotated source.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+        workspace: BuildWorkspace
+            The workspace that receives the coverage build and data
+
+        Raises
+        ------
+        RuntimeError
+            If gcov is not installed, or the program fails to compile or does not write coverage data
+
+        Returns
+        -------
+        str
+            The source with the execution count of each line, coloured by heat
+        """
+
+        if shutil.which("gcov") is None:
+            raise RuntimeError("gcov is not installed. It is part of GCC.")
+        directory = workspace.path("coverage")
+        os.makedirs(directory, exist_ok=True)
+        source_path = f"{directory}/{_SOURCE_NAME}"
+        exec_path = f"{directory}/hot"
+        data_path = f"{directory}/{_SOURCE_NAME[:-len('.cpp')]}.gcda"
+
+        try:
+            with open(source_path, "r") as file:
+                unchanged = file.read() == self.__source and os.path.exists(exec_path)
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            with open(source_path, "w") as file:
+                file.write(self.__source)
+            # Compiled and linked separately, so the notes and data files are named after the object
+            returncode, _, stderr = run([COMPILER, *DEFAULT_FLAGS, *COVERAGE_FLAGS, "-c", "-o", "hot.o", _SOURCE_NAME],
+                                        cwd=directory, env=workspace.env())
+            if returncode == 0:
+                returncode, _, stderr = run([COMPILER, "--coverage", "-o", exec_path, "hot.o"], cwd=directory,
+                                            env=workspace.env())
+            if returncode != 0:
+                os.remove(source_path)
+                raise RuntimeError("Compilation failed:\n" + stderr.decode(errors="replace"))
+
+        for name in os.listdir(directory):
+            if name.endswith(".gcda"):
+                os.remove(f"{directory}/{name}")
+        returncode, _, _ = run([exec_path], cwd=directory)
+        if not os.path.exists(data_path):
+            raise RuntimeError(f"The program exited with code {returncode} without writing coverage data.")
+        counts = parse_gcov(run(["gcov", "-t", "-o", directory, data_path], cwd=directory)[1].decode(errors="replace"),
+                            _SOURCE_NAME)
+
+        max_count = max(counts.values(), default=0)
+        lines = [] if returncode == 0 else [f"The program exited with code {returncode}."]
+        for line_num, text in enumerate(self.__source.rstrip("\n").split("\n"), 1):
+            count = counts.get(line_num)
+            if count is None:
+                lines.append(f"{'':>10} {line_num:^4}| {text}")
+            elif count == 0:
+                lines.append(f"\033[2m{'#####':>10} {line_num:^4}| {text}\033[0m")
+            else:
+                lines.append(f"{self.__heat__(count, max_count)}{count:>10}\033[0m {line_num:^4}| {text}")
+        return "\n".join(lines)
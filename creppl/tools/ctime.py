@@ -0,0 +1,229 @@
+# creppl/tools/ctime.py
+
+import os
+import re
+
+from creppl.io import COMPILER
+from creppl.io.completion import parse_includes
+from creppl.proc.build import ArtifactCache, DEFAULT_FLAGS, build_key
+from creppl.proc.workspace import runtime_dir
+
+"""Directory of the cached compile-time reports"""
+CTIME_DIR = runtime_dir() + "/ctime"
+
+"""Flags that make the compiler report its time per phase and the headers it opens"""
+CTIME_FLAGS = ("-ftime-report", "-H")
+
+"""Number of individual compiler passes listed"""
+TOP_PASSES = 5
+
+"""Share of the compile time above which a header or phase gets a suggestion"""
+HEAVY_SHARE = 0.25
+
+_TIME_RE = re.compile(r"^\s*(\|?[^:]*?)\s*:\s*([\d.]+)\s*(?:\(\s*\d+%\))?\s+([\d.]+)\s*(?:\(\s*\d+%\))?\s+"
+                      r"([\d.]+)")
+
+
+def parse_time_report(text: str):
+    """
+    Parses the output of -ftime-report.
+
+    Parameters
+    ----------
+    text: str
+        The compiler's stderr
+
+    Returns
+    -------
+    Dict[str, Tuple[float, float, float]]
+        The user, system and wall seconds of each time variable, including the "phase ..." summaries and "TOTAL"
+    """
+
+    times = {}
+    for line in text.split("\n"):
+        match = _TIME_RE.match(line)
+        if match is not None:
+            times[match.group(1)] = (float(match.group(2)), float(match.group(3)), float(match.group(4)))
+    return times
+
+
+def parse_include_tree(text: str):
+    """
+    Counts the headers opened under each top-level header, from the output of -H.
+
+    Parameters
+    ----------
+    text: str
+        The compiler's stderr
+
+    Returns
+    -------
+    List[Tuple[str, int]]
+        The path of each top-level header and the number of headers it opened, in order
+    """
+
+    tree = []
+    for line in text.split("\n"):
+        depth = len(line) - len(line.lstrip("."))
+        if depth == 0 or not line[depth:].startswith(" "):
+            continue
+        if depth == 1:
+            tree.append([line[depth:].strip(), 0])
+        elif len(tree) > 0:
+            tree[-1][1] += 1
+    return [(path, count) for path, count in tree]
+
+
+def diagnostics(text: str):
+    """
+    Returns the compiler diagnostics in output produced with CTIME_FLAGS, without the include tree and timings.
+
+    Parameters
+    ----------
+    text: str
+        The compiler's stderr
+
+    Returns
+    -------
+    str
+        The diagnostics
+    """
+
+    for marker in ("Multiple include guards may be useful for:", "Time variable"):
+        text = text.split(marker, 1)[0]
+    return "\n".join(line for line in text.split("\n") if not line.startswith(".")).strip()
+
+
+class CompileTimeReport:
+    """
+    A summary of where the compiler spends its time on the session: by phase, by pass and by top-level header.
+
+    The session is compiled once with CTIME_FLAGS, then every include is compiled alone to measure what it costs.
+    Reports are cached in CTIME_DIR by source, so asking again for unchanged code is immediate.
+
+    Attributes
+    ----------
+    __source: str
+        The session source
+    __include_dir: str
+        The directory that quoted includes are relative to
+
+    Methods
+    -------
+    run(run: Callable, workspace: BuildWorkspace) -> str
+        Compiles the session with timing and returns the report.
+    """
+
+    def __init__(self, source: str, include_dir: str):
+        """
+        Parameters
+        ----------
+        source: str
+            The session source
+        include_dir: str
+            The directory of the session source, which quoted includes are relative to
+        """
+
+        self.__source = source
+        self.__include_dir = include_dir
+        self.__cache = ArtifactCache(CTIME_DIR)
+
+    def __compile__(self, run, workspace, source: str, *flags):
+        """
+        Compiles source with CTIME_FLAGS and returns the compiler's exit code and stderr.
+        """
+
+        source_path = workspace.path("ctime.cpp")
+        with open(source_path, "w") as file:
+            file.write(source)
+        returncode, _, stderr = run([COMPILER, *DEFAULT_FLAGS, *CTIME_FLAGS, "-iquote", self.__include_dir, *flags,
+                                     source_path], env=workspace.env())
+        return returncode, stderr.decode(errors="replace")
+
+    def __report__(self, run, workspace):
+        returncode, stderr = self.__compile__(run, workspace, self.__source, "-c", "-o", workspace.path("ctime.o"))
+        times = parse_time_report(stderr)
+        if returncode != 0 or "TOTAL" not in times:
+            raise RuntimeError("Compilation failed:\n" + diagnostics(stderr))
+        user, system, total = times["TOTAL"]
+        lines = [f"Compile time: {total:.2f} s wall ({user:.2f} s user, {system:.2f} s sys)", "By phase:"]
+        for name, (_, _, wall) in times.items():
+            if name.startswith("phase ") and wall > 0:
+                lines.append(f"  {name[len('phase '):]:<24} {wall:>6.2f} s {wall / max(total, 1e-9):>5.0%}")
+
+        passes = sorted(((wall, name.lstrip("|")) for name, (_, _, wall) in times.items()
+                         if not name.startswith("phase ") and name != "TOTAL"), reverse=True)[:TOP_PASSES]
+        lines.append("Slowest passes:")
+        lines.extend(f"  {name:<24} {wall:>6.2f} s {wall / max(total, 1e-9):>5.0%}" for wall, name in passes)
+
+        includes = parse_includes(self.__source)
+        tree = parse_include_tree(stderr)
+        headers = []
+        for include in includes:
+            name = include[1:-1]
+            nested = next((count for path, count in tree if path == name or path.endswith("/" + name)), 0)
+            returncode, header_stderr = self.__compile__(run, workspace, f"#include {include}\n", "-fsyntax-only")
+            cost = parse_time_report(header_stderr).get("TOTAL", (0, 0, 0))[2] if returncode == 0 else 0
+            headers.append((cost, include, nested))
+        if len(headers) > 0:
+            lines.append("By header (parsed alone):")
+            for cost, include, nested in sorted(headers, reverse=True):
+                lines.append(f"  {include:<24} {cost:>6.2f} s {cost / max(total, 1e-9):>5.0%}  "
+                             f"{nested:>4} nested headers")
+
+        suggestions = []
+        if "<bits/stdc++.h>" in includes:
+            suggestions.append("Replace <bits/stdc++.h> with the headers the code uses; it parses the whole standard "
+                               "library on every build.")
+        for cost, include, _ in sorted(headers, reverse=True):
+            if include != "<bits/stdc++.h>" and cost >= HEAVY_SHARE * total and cost >= 0.1:
+                suggestions.append(f"{include} costs {cost:.2f} s on its own: remove it if it is unused, or "
+                                   f"precompile it.")
+        parsing = times.get("phase parsing", (0, 0, 0))[2]
+        if parsing >= 0.5 * total:
+            suggestions.append(f"Parsing headers takes {parsing / max(total, 1e-9):.0%} of the build; a precompiled "
+                               f"header of the includes would save most of it on every rebuild.")
+        templates = times.get("template instantiation", (0, 0, 0))[2]
+        if templates >= HEAVY_SHARE * total:
+            suggestions.append(f"Template instantiation takes {templates / max(total, 1e-9):.0%}: instantiate heavy "
+                               f"templates with fewer distinct types, or hide them behind non-template functions.")
+        if len(suggestions) > 0:
+            lines.append("Suggestions:")
+            lines.extend(f"  - {suggestion}" for suggestion in suggestions)
+        return "\n".join(lines)
+
+    def run(self, run, workspace):
+        """
+        Compiles the session with timing and returns the report.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+        workspace: BuildWorkspace
+            The workspace that receives the timing builds
+
+        Raises
+        ------
+        RuntimeError
+            If the session fails to compile
+
+        Returns
+        -------
+        str
+            The report
+        """
+
+        key = build_key(self.__source.encode(), [*DEFAULT_FLAGS, *CTIME_FLAGS, self.__include_dir])
+        path = self.__cache.get(key)
+        if path is not None:
+            with open(path, "r") as file:
+                return file.read() + "\n(cached)"
+
+        report = self.__report__(run, workspace)
+        report_path = workspace.path("ctime.txt")
+        with open(report_path, "w") as file:
+            file.write(report)
+        self.__cache.put(key, report_path)
+        os.remove(report_path)
+        return report
@@ -0,0 +1,259 @@
+# creppl/tools/matrix.py
+
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from creppl.proc.build import ArtifactCache, DEFAULT_FLAGS, OBJECT_DIR, compile_objects, compile_program
+from creppl.proc.process import format_seconds
+from creppl.tools import DEFAULT_OPT_LEVEL
+
+"""Language standards accepted by $matrix"""
+STANDARDS = ("c++11", "c++14", "c++17", "c++20", "c++23")
+
+"""Compilers accepted by $matrix; those that are not installed are skipped by default"""
+COMPILERS = ("g++", "clang++")
+
+"""Maximum number of builds in one matrix"""
+MAX_CELLS = 40
+
+"""Number of lines shown of each distinct output"""
+MAX_OUTPUT_LINES = 8
+
+_SOURCE_NAME = "matrix.cpp"
+_ERROR_RE = re.compile(r":(\d+):(?:\d+:)? (?:fatal )?error: (.*)$", re.MULTILINE)
+
+
+def installed_compilers():
+    """
+    Returns the compilers of COMPILERS that are installed.
+
+    Returns
+    -------
+    List[str]
+        The compiler executables, in the order of COMPILERS
+    """
+
+    return [compiler for compiler in COMPILERS if shutil.which(compiler) is not None]
+
+
+def first_error(stderr: str):
+    """
+    Returns the first error of a compiler's diagnostics on one line.
+
+    Parameters
+    ----------
+    stderr: str
+        The diagnostics
+
+    Returns
+    -------
+    str
+        e.g. "line 4: 'auto' not allowed here", or the first line of stderr if it has no located error
+    """
+
+    match = _ERROR_RE.search(stderr)
+    if match is not None:
+        return f"line {match.group(1)}: {match.group(2).strip()}"
+    lines = [line for line in stderr.split("\n") if len(line.strip()) > 0]
+    return lines[0].strip() if len(lines) > 0 else "failed"
+
+
+class Matrix:
+    """
+    Builds and runs the session program with every combination of language standard, compiler and optimisation
+    level, and compares the results.
+
+    The builds run in parallel, at most one per CPU, through the shared artifact cache, so an unchanged combination is
+    never compiled twice. The attached translation units are compiled for every combination as well. The programs are
+    run one after the other once all the builds are done, so their run times are not skewed by the compilers or by
+    each other.
+
+    Attributes
+    ----------
+    cells: List[Tuple[str, str, str]]
+        The compiler, standard and optimisation level of every build
+    __source: str
+        The session source
+    __include_dir: str
+        The directory of the session file, searched for its local headers
+    __units: List[str]
+        The absolute paths of the attached translation units
+    __cache: ArtifactCache
+        The shared store of executables
+    __objects: ArtifactCache
+        The shared store of objects
+
+    Methods
+    -------
+    run(run: Callable, workspace: BuildWorkspace) -> str
+        Builds and runs every combination and returns the report.
+    """
+
+    def __init__(self, source: str, include_dir: str, units, standards, compilers, opt_levels):
+        """
+        Parameters
+        ----------
+        source: str
+            The session source
+        include_dir: str
+            The directory of the session file
+        units: List[str]
+            The absolute paths of the attached translation units
+        standards: List[str]
+            The language standards, from STANDARDS
+        compilers: List[str]
+            The compiler executables
+        opt_levels: List[str]
+            The optimisation levels, from OPT_LEVELS
+        """
+
+        self.cells = [(compiler, standard, opt_level)
+                      for compiler in compilers for standard in standards for opt_level in opt_levels]
+        self.__source = source
+        self.__include_dir = include_dir
+        self.__units = list(units)
+        self.__cache = ArtifactCache()
+        self.__objects = ArtifactCache(OBJECT_DIR)
+
+    def __flags__(self, standard: str, opt_level: str):
+        """
+        Returns the compiler flags of a combination: the session's flags with its standard replaced.
+        """
+
+        flags = [flag for flag in DEFAULT_FLAGS if not flag.startswith("-std=")]
+        return [f"-std={standard}", *flags, opt_level, "-iquote", self.__include_dir]
+
+    def __build__(self, run, workspace, directory: str, index: int):
+        """
+        Builds one combination in a directory of its own and returns its result.
+        """
+
+        compiler, standard, opt_level = self.cells[index]
+        cell_dir = f"{directory}/{index}"
+        os.makedirs(cell_dir, exist_ok=True)
+        flags = self.__flags__(standard, opt_level)
+        result = {"exec_path": None, "compile": None, "error": None}
+        start = time.monotonic()
+        units = [(unit, f"{cell_dir}/{pos}-{os.path.splitext(os.path.basename(unit))[0]}.o")
+                 for pos, unit in enumerate(self.__units)]
+        returncode, stderr, objects = compile_objects(run, units, self.__objects, flags, workspace, max_workers=1,
+                                                      compiler=compiler)
+        cached = True
+        if returncode == 0:
+            exec_path = f"{cell_dir}/matrix"
+            returncode, _, stderr, cached = compile_program(run, f"{directory}/{_SOURCE_NAME}", exec_path,
+                                                            self.__cache, flags, workspace, objects=objects,
+                                                            compiler=compiler)
+            if returncode == 0:
+                result["exec_path"] = exec_path
+        if returncode != 0:
+            result["error"] = first_error(stderr.decode(errors="replace"))
+        if not cached or returncode != 0:
+            result["compile"] = time.monotonic() - start
+        return result
+
+    def run(self, run, workspace):
+        """
+        Builds and runs every combination and returns the report.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr. It must be safe to call from several threads,
+            like BuildWorker.run.
+        workspace: BuildWorkspace
+            The workspace that receives the builds
+
+        Returns
+        -------
+        str
+            A table of the combinations with their compile time, run time, exit code and output, followed by the
+            distinct outputs
+        """
+
+        directory = workspace.path("matrix")
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{directory}/{_SOURCE_NAME}", "w") as file:
+            file.write(self.__source)
+
+        workers = min(len(self.cells), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda index: self.__build__(run, workspace, directory, index),
+                                    range(len(self.cells))))
+
+        outputs = []
+        for result in results:
+            result["output"] = None
+            if result["exec_path"] is None:
+                continue
+            start = time.monotonic()
+            returncode, stdout, stderr = run([result["exec_path"]])
+            result["run"] = time.monotonic() - start
+            result["returncode"] = returncode
+            output = stdout.decode(errors="replace")
+            if output not in outputs:
+                outputs.append(output)
+            result["output"] = outputs.index(output)
+
+        return self.__report__(results, outputs)
+
+    def __report__(self, results, outputs):
+        """
+        Formats the results of run().
+        """
+
+        rows = [("compiler", "std", "opt", "compile", "run", "exit", "output")]
+        for (compiler, standard, opt_level), result in zip(self.cells, results):
+            compile_str = "cached" if result["compile"] is None else format_seconds(result["compile"])
+            if result["error"] is not None:
+                rows.append((compiler, standard, opt_level, compile_str, "-", "-", f"error: {result['error']}"))
+                continue
+            label = chr(ord("A") + result["output"]) if result["output"] < 26 else str(result["output"] + 1)
+            rows.append((compiler, standard, opt_level, compile_str, format_seconds(result["run"]),
+                         str(result["returncode"]), label))
+        widths = [max(len(row[col]) for row in rows) for col in range(len(rows[0]) - 1)]
+        lines = ["  ".join(value.ljust(width) for value, width in zip(row, widths)) + "  " + row[-1]
+                 for row in rows]
+        lines[0] = f"\033[1m{lines[0]}\033[0m"
+
+        for pos, output in enumerate(outputs):
+            label = chr(ord("A") + pos) if pos < 26 else str(pos + 1)
+            output_lines = output.rstrip("\n").split("\n") if len(output) > 0 else ["(no output)"]
+            heading = "All builds print:" if len(outputs) == 1 else f"Output {label}:"
+            lines.append(f"\033[1m{heading}\033[0m")
+            lines.extend("  " + line for line in output_lines[:MAX_OUTPUT_LINES])
+            if len(output_lines) > MAX_OUTPUT_LINES:
+                lines.append(f"  ... {len(output_lines) - MAX_OUTPUT_LINES} more lines")
+        return "\n".join(lines)
+
+
+def default_matrix(standards, compilers, opt_levels):
+    """
+    Fills in the dimensions of a matrix that were not given.
+
+    With no arguments at all, every standard is built with every installed compiler. Otherwise, a missing dimension
+    is the session's: the first installed compiler and C++17. The optimisation level defaults to DEFAULT_OPT_LEVEL.
+
+    Parameters
+    ----------
+    standards: List[str]
+        The standards given, if any
+    compilers: List[str]
+        The compilers given, if any
+    opt_levels: List[str]
+        The optimisation levels given, if any
+
+    Returns
+    -------
+    Tuple[List[str], List[str], List[str]]
+        The standards, compilers and optimisation levels
+    """
+
+    session_standard = next(flag for flag in DEFAULT_FLAGS if flag.startswith("-std="))[len("-std="):]
+    if len(standards) == 0 and len(compilers) == 0 and len(opt_levels) == 0:
+        return list(STANDARDS), installed_compilers(), [DEFAULT_OPT_LEVEL]
+    return (standards or [session_standard], compilers or installed_compilers()[:1],
+            opt_levels or [DEFAULT_OPT_LEVEL])
@@ -0,0 +1,228 @@
+# creppl/tools/profile.py
+
+import os
+import re
+import shutil
+
+from creppl.proc.build import ArtifactCache, DEFAULT_FLAGS, compile_program
+from creppl.tools import DEFAULT_OPT_LEVEL
+
+"""Flags of the instrumented build; -g lets the profile be mapped to source lines"""
+PROFILE_FLAGS = ("-pg", "-g")
+
+"""Number of functions and lines reported by default"""
+DEFAULT_TOP = 10
+
+_SOURCE_NAME = "profile.cpp"
+_LOCATION_RE = re.compile(r"\s*\((?:.*/)?" + re.escape(_SOURCE_NAME) + r":(\d+) @ [0-9a-f]+\)$")
+_DEFINITION_RE = re.compile(r"^(?:.*/)?" + re.escape(_SOURCE_NAME) + r":(\d+)$")
+_CALLS_RE = re.compile(r"^(\d+)(?:\s+[\d.]+\s+[\d.]+)?\s+(.*)$")
+_GRAPH_NAME_RE = re.compile(r"^\s*(?:\[\d+\]\s+[\d.]+\s+)?(?:[\d.]+\s+[\d.]+\s+)?(?:[\d+/]+\s+)?(.*?)\s*\[\d+\]$")
+
+
+def parse_flat_profile(text: str):
+    """
+    Parses a gprof flat profile, as printed with -b -p.
+
+    Parameters
+    ----------
+    text: str
+        The gprof output
+
+    Returns
+    -------
+    List[Tuple[float, float, Optional[int], str]]
+        The percentage of time, self seconds, number of calls (None if the function was not instrumented) and name
+        of each entry, in gprof's order
+    """
+
+    entries = []
+    for line in text.split("\n"):
+        parts = line.split(None, 3)
+        if len(parts) < 4:
+            continue
+        try:
+            percent, self_seconds = float(parts[0]), float(parts[2])
+            float(parts[1])
+        except ValueError:
+            continue
+        calls = _CALLS_RE.match(parts[3])
+        if calls is not None:
+            entries.append((percent, self_seconds, int(calls.group(1)), calls.group(2).strip()))
+        else:
+            entries.append((percent, self_seconds, None, parts[3].strip()))
+    return entries
+
+
+def parse_call_graph(text: str):
+    """
+    Parses a gprof call graph, as printed with -b -q.
+
+    Parameters
+    ----------
+    text: str
+        The gprof output
+
+    Returns
+    -------
+    Dict[str, Tuple[List[str], List[str]]]
+        The callers and callees of each function
+    """
+
+    graph = {}
+    for block in text.split("-----------------------------------------------"):
+        callers, callees, primary = [], [], None
+        for line in block.split("\n"):
+            match = _GRAPH_NAME_RE.match(line)
+            if match is None:
+                continue
+            if line.startswith("["):
+                primary = match.group(1)
+            elif primary is None:
+                callers.append(match.group(1))
+            else:
+                callees.append(match.group(1))
+        if primary is not None:
+            graph[primary] = (callers, callees)
+    return graph
+
+
+class Profile:
+    """
+    A gprof profile of the session program.
+
+    The session is built with PROFILE_FLAGS into its own artifact, which is cached like any other build, and run in a
+    private directory that receives gmon.out. gprof samples the program counter every 10 ms, so a program that runs
+    for less than that has call counts but no time.
+
+    Attributes
+    ----------
+    top: int
+        The number of functions and lines reported
+    flags: List[str]
+        The compiler flags of the instrumented build
+    __source: str
+        The session source
+    __cache: ArtifactCache
+        The shared artifact store, which keeps the instrumented executable
+
+    Methods
+    -------
+    run(run: Callable, workspace: BuildWorkspace) -> str
+        Builds and runs the instrumented program and returns the report.
+    """
+
+    def __init__(self, source: str, top=DEFAULT_TOP, opt_level=DEFAULT_OPT_LEVEL):
+        """
+        Parameters
+        ----------
+        source: str
+            The session source
+        top: int
+            The number of functions and lines reported
+        opt_level: str
+            The optimisation level of the instrumented build
+        """
+
+        self.top = top
+        self.flags = [*DEFAULT_FLAGS, *PROFILE_FLAGS, opt_level]
+        self.__source = source
+        self.__cache = ArtifactCache()
+
+    def __definitions__(self, run, exec_path: str):
+        """
+        Returns the source line that defines each function of the program, by demangled name.
+        """
+
+        if shutil.which("nm") is None:
+            return {}
+        returncode, stdout, _ = run(["nm", "-C", "-l", "--defined-only", exec_path])
+        definitions = {}
+        for line in stdout.decode(errors="replace").split("\n"):
+            name, _, location = line.partition("\t")
+            parts = name.split(None, 2)
+            match = _DEFINITION_RE.match(location.strip())
+            if returncode == 0 and len(parts) == 3 and match is not None:
+                definitions[parts[2]] = int(match.group(1))
+        return definitions
+
+    def run(self, run, workspace):
+        """
+        Builds and runs the instrumented program and returns the report.
+
+        Parameters
+        ----------
+        run: Callable[[List[str]], Tuple[int, bytes, bytes]]
+            Runs a command and returns its exit code, stdout and stderr, e.g. BuildWorker.run
+        workspace: BuildWorkspace
+            The workspace that receives the instrumented build and the profile data
+
+        Raises
+        ------
+        RuntimeError
+            If gprof is not installed, or the program fails to compile or does not write profile data
+
+        Returns
+        -------
+        str
+            The top functions with their callers and callees, and the hottest source lines
+        """
+
+        if shutil.which("gprof") is None:
+            raise RuntimeError("gprof is not installed. It is part of GNU binutils.")
+        directory = workspace.path("profile")
+        os.makedirs(directory, exist_ok=True)
+        source_path = f"{directory}/{_SOURCE_NAME}"
+        exec_path = f"{directory}/profile"
+        gmon_path = f"{directory}/gmon.out"
+        with open(source_path, "w") as file:
+            file.write(self.__source)
+
+        returncode, _, stderr, _ = compile_program(run, source_path, exec_path, self.__cache, self.flags, workspace)
+        if returncode != 0:
+            raise RuntimeError("Compilation failed:\n" + stderr.decode(errors="replace"))
+        try:
+            os.remove(gmon_path)
+        except OSError:
+            pass
+        returncode, _, _ = run([exec_path], cwd=directory)
+        if not os.path.exists(gmon_path):
+            raise RuntimeError(f"The program exited with code {returncode} without writing profile data.")
+
+        functions = parse_flat_profile(run(["gprof", "-b", "-p", exec_path, gmon_path])[1].decode(errors="replace"))
+        graph = parse_call_graph(run(["gprof", "-b", "-q", exec_path, gmon_path])[1].decode(errors="replace"))
+        by_line = run(["gprof", "-b", "-l", "-p", exec_path, gmon_path])[1].decode(errors="replace")
+        definitions = self.__definitions__(run, exec_path)
+        source_lines = self.__source.split("\n")
+
+        lines = []
+        if returncode != 0:
+            lines.append(f"The program exited with code {returncode}.")
+        total = sum(entry[1] for entry in functions)
+        lines.append(f"Functions ({total:.2f} s sampled):")
+        lines.append(f"  {'%time':>6} {'self s':>8} {'calls':>8}  {'line':>4}  function")
+        for percent, self_seconds, calls, name in functions[:self.top]:
+            line_num = definitions.get(name)
+            lines.append(f"  {percent:>6.1f} {self_seconds:>8.2f} {'' if calls is None else calls:>8}  "
+                         f"{'' if line_num is None else line_num:>4}  {name}")
+            callers, callees = graph.get(name, ([], []))
+            callers = [caller for caller in callers if caller != "<spontaneous>"]
+            if len(callers) > 0:
+                lines.append(f"  {'':>30}called by {', '.join(callers)}")
+            if len(callees) > 0:
+                lines.append(f"  {'':>30}calls {', '.join(callees)}")
+        if len(functions) == 0:
+            lines.append("  No profile data; the program may exit before any function is sampled.")
+
+        hot_lines = {}
+        for percent, _, _, name in parse_flat_profile(by_line):
+            match = _LOCATION_RE.search(name)
+            if match is not None and percent > 0:
+                line_num = int(match.group(1))
+                hot_lines[line_num] = hot_lines.get(line_num, 0.0) + percent
+        if len(hot_lines) > 0:
+            lines.append("Lines:")
+            for line_num, percent in sorted(hot_lines.items(), key=lambda item: -item[1])[:self.top]:
+                text = source_lines[line_num - 1].strip() if line_num <= len(source_lines) else ""
+                lines.append(f"  {percent:>6.1f}% {line_num:>4} | {text}")
+        return "\n".join(lines)
@@ -53,6 +53,26 @@ def overwrite_prompt(filename: str):
     return True if answer.startswith("y") else False
 
 
+def include_prompt(header: str, name: str):
+    """
+    Prompt the user for confirmation to add a missing include
+
+    Parameters
+    ----------
+    header: str
+        The header to include, e.g. "<vector>"
+    name: str
+        The name that needs the header
+
+    Returns
+    -------
+    bool
+        True if user enters nothing or a string starting with "y", otherwise False
+    """
+    answer = input(f"'{name}' needs #include {header}, add it? (Y/n): ").lower()
+    return True if len(answer) == 0 or answer.startswith("y") else False
+
+
 def get_filename_prompt():
     """
     Prompts and gets user for a filename
@@ -1,8 +1,15 @@
 # creppl/utils/helpers.py
 
+import functools
+import os
+import re
+import shutil
+
 from creppl.cmd import Command
 from creppl.proc.process import proc_exec
 
+_STDIN_RE = re.compile(r"\b(?:w?cin|stdin)\b|\b(?:scanf|getchar|gets)\s*\(")
+
 
 def verify_compiler():
     """
@@ -11,11 +18,55 @@ def verify_compiler():
     If the assertion fails, a message will be display.
     """
 
-    output = proc_exec("which g++", True).stdout.read().decode().strip()
+    output = shutil.which("g++")
     assert output == "/usr/bin/g++", "GCC not installed! Install GCC by running \'sudo apt install build-essential\'" \
                                      " and rerun the program."
 
 
+@functools.lru_cache(maxsize=None)
+def toolchain_id(compiler: str):
+    """
+    Returns a string that identifies the installed compiler, for use in cache keys.
+
+    The result is memoised for the lifetime of the process.
+
+    Parameters
+    ----------
+    compiler: str
+        The name of the compiler executable
+
+    Returns
+    -------
+    str
+        The resolved path, modification time, version and target of the compiler
+    """
+
+    path = shutil.which(compiler)
+    if path is None:
+        return compiler
+    path = os.path.realpath(path)
+    output = proc_exec([path, "-dumpfullversion", "-dumpmachine"]).communicate()[0].decode().split()
+    return f"{path}:{os.stat(path).st_mtime_ns}:{':'.join(output)}"
+
+
+def reads_stdin(statement: str):
+    """
+    Returns whether a statement reads the standard input, through std::cin, stdin or the C input functions.
+
+    Parameters
+    ----------
+    statement: str
+        The input statement of the user
+
+    Returns
+    -------
+    bool
+        True if the statement uses the standard input, otherwise False
+    """
+
+    return _STDIN_RE.search(statement) is not None
+
+
 def has_args(statement: str, kwargs: tuple):
     """
     Returns whether the statement and/or kwargs has arguments
@@ -99,6 +150,31 @@ def extract_creppl_command(__s):
     return __s, (cmd, None)
 
 
+def split_command_args(statement, kwargs: tuple, maxsplit=-1):
+    """
+    Returns the words following a command, for commands that take free-form arguments.
+
+    extract_creppl_command() separates a leading numeric or hyphenated word (e.g. "-O3") into kwargs[1]; this
+    rejoins it with the rest of the statement.
+
+    Parameters
+    ----------
+    statement: str
+        The user input statement, without the command
+    kwargs: Tuple[str, str]
+        The command and command arguments: ({command}, {args})
+    maxsplit: int
+        The maximum number of splits, as for str.split(); the remainder is returned as the last element
+
+    Returns
+    -------
+    List[str]
+        The words, in order
+    """
+
+    return " ".join(arg for arg in (kwargs[1], statement) if arg is not None).split(maxsplit=maxsplit)
+
+
 def is_creppl_command(cmd: str):
     """
     Returns whether the cmd is a Creppl command.
@@ -115,7 +191,10 @@ def is_creppl_command(cmd: str):
 
     return cmd in (
         Command.CLS, Command.INSERT, Command.REPLACE, Command.HELP,
-        Command.DEL, Command.GOTO, Command.QUIT, Command.PRINT, Command.RESET)
+        Command.DEL, Command.GOTO, Command.QUIT, Command.PRINT, Command.RESET,
+        Command.ADD, Command.ASM, Command.AUTOINCLUDE, Command.BENCH, Command.CTIME, Command.DEPS, Command.HOT,
+        Command.MATRIX, Command.OUT, Command.PROFILE, Command.REMOVE, Command.STATS, Command.TIME,
+        Command.WATCH)
 
 
 def file_reset(filename: str, __s=""):
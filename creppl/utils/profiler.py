@@ -0,0 +1,259 @@
+# creppl/utils/profiler.py
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+from creppl.io import WORKING_DIR
+from creppl.proc.process import format_seconds
+
+"""Directory of the profiles written by `creppl --profile-self` when no path is given"""
+PROFILE_DIR = WORKING_DIR + "/profiles"
+
+"""Label of the time spent editing the input line, between two commands"""
+INPUT_LABEL = "(input)"
+
+"""Label of C++ statements, as opposed to $ commands"""
+STATEMENT_LABEL = "(statement)"
+
+
+def command_label(statement: str):
+    """
+    Returns the label under which the handling of an input is accounted.
+
+    Parameters
+    ----------
+    statement: str
+        The input
+
+    Returns
+    -------
+    str
+        The command, e.g. "$print", or STATEMENT_LABEL for a C++ statement
+    """
+
+    if statement.startswith("$"):
+        words = statement[1:].split(None, 1)
+        return "$" + (words[0] if len(words) > 0 else "")
+    return STATEMENT_LABEL
+
+
+class SessionProfiler:
+    """
+    Profiles creppl itself for a whole interactive session, enabled with `creppl --profile-self`.
+
+    The main thread runs under cProfile from start() to stop(), and so does every job of the build worker, with a
+    profiler of its own for the worker thread. Every input is also accounted to a label (see command_label()): the
+    Python CPU time of its handling and of the build jobs it submitted, the time those jobs spent waiting on
+    subprocesses, and the wall time. stop() merges the profiles into a single pstats file, which can be read with
+    `python -m pstats` or turned into a flame graph with tools such as flameprof or snakeviz.
+
+    The thread pools that compile translation units and scan headers are not profiled, but the time their
+    processes take is accounted to the running job.
+
+    Attributes
+    ----------
+    path: str
+        The path of the pstats file written by stop()
+    __profiles: Dict[int, cProfile.Profile]
+        The profiler of each profiled thread, by thread id
+    __totals: Dict[str, List[float]]
+        The number of inputs, Python CPU time, subprocess wait time and wall time of each label
+    __label: str
+        The label of the input being handled on the main thread, which the jobs it submits are accounted to
+    __job_label: str
+        The label of the job running on the build worker
+    __local: threading.local
+        The label of the current thread
+    __lock: threading.Lock
+        Guards __totals
+
+    Methods
+    -------
+    start()
+        Starts profiling the calling thread.
+    stop()
+        Stops profiling and writes the pstats file.
+    current() -> str
+        Returns the label of the input being handled.
+    command(label: str)
+        Context manager that accounts the block to label.
+    job(label: str)
+        Context manager that profiles a build job and accounts it to label.
+    waited(seconds: float)
+        Accounts time spent waiting on a subprocess to the label of the calling thread.
+    report() -> str
+        Returns the per-label breakdown as a table.
+    """
+
+    def __init__(self, path=None):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the pstats file. Defaults to a file named after the current time in PROFILE_DIR.
+        """
+
+        if path is None or len(path) == 0:
+            path = PROFILE_DIR + time.strftime("/creppl-%Y%m%d-%H%M%S.prof")
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.__profiles = {}
+        self.__totals = {}
+        self.__label = None
+        self.__job_label = None
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+
+    def __account__(self, label: str, count=0, cpu=0.0, wait=0.0, wall=0.0):
+        with self.__lock:
+            totals = self.__totals.setdefault(label, [0, 0.0, 0.0, 0.0])
+            totals[0] += count
+            totals[1] += cpu
+            totals[2] += wait
+            totals[3] += wall
+
+    def __thread_profile__(self):
+        """
+        Returns the profiler of the calling thread, creating it if needed.
+        """
+
+        ident = threading.get_ident()
+        profile = self.__profiles.get(ident)
+        if profile is None:
+            profile = self.__profiles[ident] = cProfile.Profile()
+        return profile
+
+    def start(self):
+        """
+        Starts profiling the calling thread.
+        """
+
+        self.__thread_profile__().enable()
+
+    def stop(self):
+        """
+        Stops profiling and writes the pstats file of all the profiled threads.
+
+        Returns
+        -------
+        bool
+            True if the file was written, otherwise False
+        """
+
+        stats = None
+        self.__thread_profile__().disable()
+        for profile in list(self.__profiles.values()):
+            # The build worker has finished, so every profiler is disabled
+            profile.create_stats()
+            if len(profile.stats) == 0:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        if stats is None:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            stats.dump_stats(self.path)
+        except OSError as e:
+            print(f'OSError: Cannot write the profile "{self.path}": {e.strerror}.')
+            return False
+        return True
+
+    def current(self):
+        """
+        Returns the label of the input being handled on the main thread.
+
+        Returns
+        -------
+        Optional[str]
+            The label, or None between inputs
+        """
+
+        return self.__label
+
+    @contextmanager
+    def command(self, label: str):
+        """
+        Accounts the Python CPU time and wall time of the block to label. Build jobs submitted within the block are
+        accounted to label as well.
+
+        Parameters
+        ----------
+        label: str
+            The label, e.g. from command_label()
+        """
+
+        self.__label = self.__local.label = label
+        cpu, wall = time.thread_time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__account__(label, 1, time.thread_time() - cpu, 0.0, time.perf_counter() - wall)
+            self.__label = self.__local.label = None
+
+    @contextmanager
+    def job(self, label: str):
+        """
+        Profiles a build job on the calling thread and accounts its Python CPU time and wall time to label.
+
+        Parameters
+        ----------
+        label: str
+            The label of the input that submitted the job, or None for jobs submitted between inputs
+        """
+
+        label = label or "(other)"
+        profile = self.__thread_profile__()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active; since Python 3.12 it sees every thread
+            profile = None
+        self.__job_label = self.__local.label = label
+        cpu, wall = time.thread_time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__account__(label, 0, time.thread_time() - cpu, 0.0, time.perf_counter() - wall)
+            self.__job_label = self.__local.label = None
+            if profile is not None:
+                profile.disable()
+
+    def waited(self, seconds: float):
+        """
+        Accounts time spent waiting on a subprocess to the label of the calling thread, or to that of the running
+        build job if the thread has none.
+
+        Parameters
+        ----------
+        seconds: float
+            The time waited
+        """
+
+        label = getattr(self.__local, "label", None) or self.__job_label
+        if label is not None:
+            self.__account__(label, wait=seconds)
+
+    def report(self):
+        """
+        Returns the per-label breakdown as a table, sorted by Python CPU time.
+
+        Returns
+        -------
+        str
+            The table, one label per line
+        """
+
+        with self.__lock:
+            rows = sorted(self.__totals.items(), key=lambda item: item[1][1], reverse=True)
+        width = max([len("command")] + [len(label) for label, _ in rows])
+        lines = [f"{'command'.ljust(width)}  {'count':>6}  {'python':>10}  {'subprocess':>10}  {'wall':>10}"]
+        for label, (count, cpu, wait, wall) in rows:
+            lines.append(f"{label.ljust(width)}  {count:>6}  {format_seconds(cpu):>10}  {format_seconds(wait):>10}  "
+                         f"{format_seconds(wall):>10}")
+        return "\n".join(lines)
@@ -0,0 +1,94 @@
+# tests/test_build.py
+
+import os
+import shutil
+
+import pytest
+
+from creppl.proc.build import DEFAULT_FLAGS, ArtifactCache, DependencyTracker, build_key, compile_program, \
+    parse_depfile
+
+
+def late_edit_compiler(source_path: str, statement: bytes):
+    """
+    Returns a stand-in for BuildWorker.run that appends statement to the source file before 'compiling' it, like an
+    edit saved while the compiler starts. The 'executable' is a copy of the file the compiler was given.
+    """
+
+    def run(cmd_list, env=None):
+        exec_path, compiled_path = cmd_list[cmd_list.index("-o") + 1:cmd_list.index("-o") + 3]
+        with open(source_path, "ab") as file:
+            file.write(statement)
+        shutil.copyfile(compiled_path, exec_path)
+        return 0, b"", b""
+
+    return run
+
+
+def test_compile_program_builds_the_hashed_source(tmp_path):
+    source_path, exec_path = str(tmp_path / "main.cpp"), str(tmp_path / "main")
+    source = b"int main() {\n}\n"
+    with open(source_path, "wb") as file:
+        file.write(source)
+    cache = ArtifactCache(str(tmp_path / "artifacts"))
+
+    returncode, _, _, cached = compile_program(late_edit_compiler(source_path, b"int late;\n"), source_path,
+                                               exec_path, cache)
+    assert (returncode, cached) == (0, False)
+    with open(exec_path, "rb") as file:
+        built = file.read()
+    assert built.endswith(b"\n" + source)
+    assert built.startswith(f'#line 1 "{source_path}"'.encode())
+    with open(cache.get(build_key(source, DEFAULT_FLAGS)), "rb") as file:
+        assert file.read() == built
+    assert sorted(os.listdir(tmp_path)) == ["artifacts", "main", "main.cpp"]
+
+
+@pytest.mark.parametrize("text, paths", [
+    ("main: main.cpp util.h\n", ["main.cpp", "util.h"]),
+    ("main: main.cpp \\\n  util.h \\\n  lib/vec.h\n", ["main.cpp", "util.h", "lib/vec.h"]),
+    ("main: main.cpp my\\ dir/a.h\nutil.h:\nmy\\ dir/a.h:\n", ["main.cpp", "my dir/a.h"]),
+    ("/tmp/x/main.o: /tmp/x/main.cpp\n", ["/tmp/x/main.cpp"]),
+    ("", []),
+])
+def test_parse_depfile(text, paths):
+    assert parse_depfile(text) == paths
+
+
+@pytest.fixture
+def project(tmp_path):
+    for name, text in [("main.cpp", '#include "util.h"\n'), ("util.h", "int f();\n"), ("lib/vec.h", "int g();\n")]:
+        os.makedirs(os.path.dirname(tmp_path / name), exist_ok=True)
+        with open(tmp_path / name, "w") as file:
+            file.write(text)
+    with open(tmp_path / "main.d", "w") as file:
+        file.write("main: main.cpp.src.cpp util.h \\\n lib/../lib/vec.h\nutil.h:\nlib/../lib/vec.h:\n")
+    return tmp_path
+
+
+def test_dependency_tracker_records_headers(project):
+    deps = DependencyTracker(str(project / "deps"))
+    source_path = str(project / "main.cpp")
+    assert deps.dependencies(source_path) == {}
+    assert deps.key_dependencies(source_path) == []
+
+    deps.record(source_path, str(project / "main.d"))
+    headers = [str(project / "lib" / "vec.h"), str(project / "util.h")]
+    assert sorted(deps.dependencies(source_path)) == headers
+    assert DependencyTracker(str(project / "deps")).dependencies(source_path) == deps.dependencies(source_path)
+    assert [path for path, _ in deps.key_dependencies(source_path)] == headers
+
+
+def test_dependency_tracker_sees_header_changes(project):
+    deps = DependencyTracker(str(project / "deps"))
+    source_path = str(project / "main.cpp")
+    deps.record(source_path, str(project / "main.d"))
+    before = deps.key_dependencies(source_path)
+    assert deps.key_dependencies(source_path) == before
+
+    with open(project / "util.h", "w") as file:
+        file.write("int f(int);\n")
+    after = deps.key_dependencies(source_path)
+    assert after[0] == before[0] and after[1] != before[1]
+    os.remove(project / "util.h")
+    assert deps.key_dependencies(source_path)[1] == (str(project / "util.h"), "missing")
@@ -0,0 +1,26 @@
+# tests/test_completion.py
+
+from creppl.io.completion import scan_namespaces
+
+
+def test_scan_namespaces_groups_names_by_top_level_namespace():
+    text = "int global;\nnamespace std {\n  class vector;\n  namespace chrono { class duration; }\n}\n"
+    scopes = scan_namespaces(text)
+    assert "global" in scopes[""]
+    assert {"vector", "duration"} <= set(scopes["std"])
+    assert "vector" not in scopes[""]
+
+
+def test_scan_namespaces_sees_through_linkage_specifications():
+    text = 'extern "C++" {\nnamespace std __attribute__ ((__visibility__ ("default"))) {\n  using ::abs;\n}\n}\n' \
+           'extern "C" { int atoi(const char *); }\n'
+    scopes = scan_namespaces(text)
+    assert "abs" in scopes["std"]
+    assert "abs" not in scopes[""]
+    assert "atoi" in scopes[""]
+
+
+def test_scan_namespaces_skips_reserved_names_and_literals():
+    scopes = scan_namespaces('namespace std { int __detail; const char *s = "{ hidden }"; }')
+    assert "__detail" not in scopes["std"]
+    assert "hidden" not in scopes["std"]
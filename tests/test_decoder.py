@@ -0,0 +1,75 @@
+# tests/test_decoder.py
+
+import pytest
+
+from creppl.io.decoder import Key, KeyDecoder, KeyEvent
+
+
+def decode(*chunks):
+    decoder = KeyDecoder()
+    events = []
+    for chunk in chunks:
+        events += decoder.feed(chunk)
+    return events + decoder.flush()
+
+
+def test_printable_characters_are_merged_into_one_event():
+    assert decode(b"int x;") == [KeyEvent(Key.TEXT, "int x;")]
+
+
+def test_control_characters():
+    assert decode(b"a\rb\x7f\t\x03\x04") == [
+        KeyEvent(Key.TEXT, "a"), KeyEvent(Key.ENTER), KeyEvent(Key.TEXT, "b"), KeyEvent(Key.BKSP),
+        KeyEvent(Key.TAB), KeyEvent(Key.SIGINT), KeyEvent(Key.EOF),
+    ]
+
+
+def test_utf8_split_across_chunks():
+    data = "π = 3;".encode()
+    decoder = KeyDecoder()
+    assert decoder.feed(data[:1]) == []
+    assert decoder.feed(data[1:]) == [KeyEvent(Key.TEXT, "π = 3;")]
+
+
+@pytest.mark.parametrize("data, key", [
+    (b"\033[A", Key.UP), (b"\033[B", Key.DOWN), (b"\033[C", Key.RIGHT), (b"\033[D", Key.LEFT),
+    (b"\033OH", Key.HOME), (b"\033OF", Key.END), (b"\033[3~", Key.DEL), (b"\033[5~", Key.PAGE_UP),
+    (b"\033[6~", Key.PAGE_DOWN), (b"\033[1~", Key.HOME), (b"\033[4~", Key.END),
+])
+def test_escape_sequences(data, key):
+    assert decode(data) == [KeyEvent(key)]
+
+
+def test_escape_sequence_split_across_chunks():
+    decoder = KeyDecoder()
+    assert decoder.feed(b"\033[") == []
+    assert decoder.pending()
+    assert decoder.feed(b"1;5C") == [KeyEvent(Key.RIGHT, ctrl=True)]
+    assert not decoder.pending()
+
+
+def test_modifiers():
+    assert decode(b"\033[1;5D", b"\033[1;3A", b"\033[3;5~") == [
+        KeyEvent(Key.LEFT, ctrl=True), KeyEvent(Key.UP, alt=True), KeyEvent(Key.DEL, ctrl=True),
+    ]
+
+
+def test_alt_and_lone_escape():
+    assert decode(b"\033b") == [KeyEvent(Key.TEXT, "b", alt=True)]
+    assert decode(b"\033\x7f") == [KeyEvent(Key.BKSP, alt=True)]
+    assert decode(b"\033") == [KeyEvent(Key.ESC)]
+    assert decode(b"\033\033[A") == [KeyEvent(Key.ESC), KeyEvent(Key.UP)]
+
+
+def test_unknown_sequences_are_dropped():
+    assert decode(b"\033[99~x\033[Z") == [KeyEvent(Key.TEXT, "x")]
+
+
+def test_bracketed_paste():
+    assert decode(b"a\033[200~line 1\r\nline 2\033[B\033[201~b") == [
+        KeyEvent(Key.TEXT, "a"), KeyEvent(Key.PASTE, "line 1\nline 2\033[B"), KeyEvent(Key.TEXT, "b"),
+    ]
+
+
+def test_bracketed_paste_split_across_chunks():
+    assert decode(b"\033[200~std::", b"cout\033[20", b"1~") == [KeyEvent(Key.PASTE, "std::cout")]
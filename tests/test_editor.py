@@ -0,0 +1,128 @@
+# tests/test_editor.py
+
+import random
+
+from creppl.io.editor import GapBuffer, LineEditor
+
+
+def test_gap_buffer_matches_a_string():
+    rng = random.Random(7)
+    buffer, model, cursor = GapBuffer("int main() {}"), "int main() {}", 13
+    for _ in range(2000):
+        op = rng.randrange(4)
+        if op == 0:
+            text = "".join(rng.choice("ab\n_ ") for _ in range(rng.randrange(1, 200)))
+            buffer.insert(text)
+            model, cursor = model[:cursor] + text + model[cursor:], cursor + len(text)
+        elif op == 1:
+            count = rng.randrange(10)
+            assert buffer.delete_before(count) == model[max(0, cursor - count):cursor]
+            model, cursor = model[:max(0, cursor - count)] + model[cursor:], max(0, cursor - count)
+        elif op == 2:
+            count = rng.randrange(10)
+            assert buffer.delete_after(count) == model[cursor:cursor + count]
+            model = model[:cursor] + model[cursor + count:]
+        else:
+            cursor = max(0, min(len(model), rng.randrange(-5, len(model) + 5)))
+            buffer.move(cursor)
+        assert buffer.cursor() == cursor
+        assert len(buffer) == len(model)
+        start, end = rng.randrange(-2, len(model) + 2), rng.randrange(-2, len(model) + 2)
+        assert buffer.slice(start, end) == model[max(0, start):max(0, end)]
+    assert buffer.text() == model
+    assert [buffer.char(index) for index in range(-1, len(model) + 1)] == [""] + list(model) + [""]
+
+
+def test_insert_backspace_and_delete():
+    editor = LineEditor("int x;")
+    editor.left()
+    editor.insert(" = 1")
+    assert editor.text() == "int x = 1;"
+    editor.backspace()
+    editor.move(0)
+    editor.backspace()
+    editor.delete()
+    assert (editor.text(), editor.cursor()) == ("nt x = ;", 0)
+    editor.replace(0, 2, "auto")
+    assert (editor.text(), editor.cursor()) == ("auto x = ;", 4)
+
+
+def test_word_motion():
+    editor = LineEditor("std::vector<int> v_1;")
+    editor.move(0)
+    positions = []
+    for _ in range(5):
+        editor.word_right()
+        positions.append(editor.cursor())
+    assert positions == [3, 11, 15, 20, 21]
+    positions = []
+    for _ in range(5):
+        editor.word_left()
+        positions.append(editor.cursor())
+    assert positions == [17, 12, 5, 0, 0]
+
+
+def test_lines():
+    editor = LineEditor("if (x) {\n    y++;\n}")
+    assert editor.line_count() == 3
+    assert [editor.line_start(line) for line in range(3)] == [0, 9, 18]
+    assert [editor.line_length(line) for line in range(3)] == [8, 8, 1]
+    assert editor.position(editor.cursor()) == (2, 1)
+    assert editor.up() and editor.position(editor.cursor()) == (1, 1)
+    editor.end()
+    assert editor.up() and editor.position(editor.cursor()) == (0, 8)
+    assert not editor.up()
+    editor.home()
+    assert editor.cursor() == 0
+    assert editor.down() and editor.down() and not editor.down()
+    assert editor.position(editor.cursor()) == (2, 0)
+
+
+def test_line_starts_follow_edits():
+    editor = LineEditor("a\nb\nc")
+    editor.move(2)
+    editor.insert("x\ny\n")
+    assert editor.text() == "a\nx\ny\nb\nc"
+    assert [editor.line_start(line) for line in range(editor.line_count())] == [0, 2, 4, 6, 8]
+    editor.replace(1, 7, "")
+    assert editor.text() == "a\nc"
+    assert [editor.line_start(line) for line in range(editor.line_count())] == [0, 2]
+    editor.set("one\ntwo", 2)
+    assert (editor.line_count(), editor.cursor()) == (2, 2)
+
+
+def test_kill_and_yank():
+    editor = LineEditor("int value = compute(a, b);")
+    editor.kill_word_back()
+    editor.kill_word_back()
+    assert editor.text() == "int value = compute("
+    editor.yank()
+    assert editor.text() == "int value = compute(a, b);"
+    editor.move(4)
+    editor.kill_end()
+    editor.kill_start()
+    assert editor.text() == ""
+    editor.yank()
+    assert editor.text() == "int value = compute(a, b);"
+    editor.move(0)
+    editor.kill_word_forward()
+    assert editor.text() == " value = compute(a, b);"
+
+
+def test_kill_end_joins_lines():
+    editor = LineEditor("a;\nb;")
+    editor.move(2)
+    editor.kill_end()
+    assert editor.text() == "a;b;"
+
+
+def test_take_dirty():
+    editor = LineEditor("int x;")
+    assert editor.take_dirty() == 0
+    assert editor.take_dirty() is None
+    editor.move(4)
+    assert editor.take_dirty() is None
+    editor.insert("y")
+    editor.move(1)
+    editor.delete()
+    assert editor.take_dirty() == 1
@@ -0,0 +1,85 @@
+# tests/test_fileio.py
+
+import os
+
+import pytest
+
+from creppl.cmd.on_command import on_command_quit
+from creppl.io.fileio import FileIO
+
+
+@pytest.fixture
+def fileio(tmp_path):
+    return FileIO(str(tmp_path / "main.cpp"))
+
+
+def read(fileio):
+    with open(fileio.filepath, "r") as file:
+        return file.read()
+
+
+def edit_externally(fileio, transform):
+    source = transform(read(fileio))
+    # Editors often save by writing a new file and renaming it over the old one
+    tmp_path = fileio.filepath + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(source)
+    os.replace(tmp_path, fileio.filepath)
+
+
+def test_line_offsets(fileio):
+    fileio.write("int a = 1;\n", "i")
+    assert [fileio.get_line(n) for n in range(1, 6)] == ["#include <iostream>", "", "int main() {", "int a = 1;", ""]
+    assert fileio.get_lines(3, 4) == ["int main() {", "int a = 1;"]
+
+
+def test_own_writes_are_not_changes(fileio):
+    fileio.write("int a = 1;\n", "i")
+    assert not fileio.changed_on_disk()
+    assert not fileio.reload()
+
+
+def test_quit_is_not_a_change(fileio):
+    fileio.write("int a = 1;\n", "i")
+    on_command_quit(fileio)
+    assert read(fileio).endswith("\n}")
+    assert not fileio.changed_on_disk()
+    assert not fileio.reload()
+
+
+def test_saving_without_changes_is_not_a_change(fileio):
+    os.utime(fileio.filepath, ns=(0, 0))
+    assert not fileio.changed_on_disk()
+    assert not fileio.reload()
+
+
+def test_changed_on_disk_does_not_update(fileio):
+    cursor, line_count = fileio.get_cursor(), fileio.get_line_count()
+    edit_externally(fileio, lambda source: "#include <vector>\n" + source)
+    assert fileio.changed_on_disk()
+    assert fileio.changed_on_disk()
+    assert (fileio.get_cursor(), fileio.get_line_count()) == (cursor, line_count)
+
+    assert fileio.reload()
+    assert (fileio.get_cursor(), fileio.get_line_count()) == (cursor + 1, line_count + 1)
+
+
+def test_external_edit_is_not_overwritten(fileio):
+    fileio.write("int a = 1;\n", "i")
+    edit_externally(fileio, lambda source: "#include <vector>\n" + source.replace("int a = 1;", "int a = 2;"))
+
+    assert fileio.reload()
+    assert not fileio.changed_on_disk()
+    fileio.write("int b = a;\n", "i")
+
+    assert read(fileio) == "#include <vector>\n#include <iostream>\n\nint main() {\nint a = 2;\nint b = a;\n\n}\n"
+
+
+def test_cursor_follows_the_code_after_an_edit_above(fileio):
+    fileio.write("int a = 1;\n", "i")
+    cursor = fileio.get_cursor()
+    edit_externally(fileio, lambda source: "// one\n// two\n" + source)
+
+    assert fileio.reload()
+    assert fileio.get_cursor() == cursor + 2
+    assert fileio.get_line(fileio.get_cursor() - 1) == "int a = 1;"
@@ -0,0 +1,46 @@
+# tests/test_headers.py
+
+import shutil
+import time
+
+import pytest
+
+from creppl.io import COMPILER
+from creppl.io.headers import HeaderIndex
+
+pytestmark = pytest.mark.skipif(shutil.which(COMPILER) is None, reason="needs the compiler")
+
+_NO_INCLUDES = "int main() {\n\n}\n"
+_IOSTREAM = "#include <iostream>\n\nint main() {\n\n}\n"
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = HeaderIndex()
+    index.load()
+    deadline = time.monotonic() + 120
+    while not index.ready() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert index.ready()
+    return index
+
+
+def test_header_named_after_a_name(index):
+    assert index.missing("std::vector<int> v;", _IOSTREAM) == [("vector", "<vector>")]
+    assert index.missing("std::vector<int> v;", "#include <vector>\n" + _IOSTREAM) == []
+
+
+def test_c_library_names_come_from_their_c_headers(index):
+    assert index.missing("std::abs(-1);", _NO_INCLUDES) == [("abs", "<cstdlib>")]
+    assert index.missing("std::sqrt(2.0);", _NO_INCLUDES) == [("sqrt", "<cmath>")]
+    assert index.missing("std::abs(-1);", "#include <cmath>\n" + _NO_INCLUDES) == []
+
+
+def test_comments_and_literals_are_ignored(index):
+    assert index.missing("// std::regex r;", _IOSTREAM) == []
+    assert index.missing("int x; /* std::regex */", _IOSTREAM) == []
+    assert index.missing('auto s = "std::regex // */"; std::deque<int> d;', _IOSTREAM) == [("deque", "<deque>")]
+
+
+def test_macros(index):
+    assert index.missing("assert(INT_MAX > 0);", _IOSTREAM) == [("assert", "<cassert>"), ("INT_MAX", "<climits>")]
@@ -0,0 +1,18 @@
+# tests/test_helpers.py
+
+import pytest
+
+from creppl.utils.helpers import reads_stdin
+
+
+@pytest.mark.parametrize("statement", [
+    "std::cin >> x;", "std::getline(std::cin, line);", 'scanf("%d", &n);', "int c = getchar();",
+    "fgets(buffer, sizeof buffer, stdin);", "std::wcin >> w;",
+])
+def test_reads_stdin(statement):
+    assert reads_stdin(statement)
+
+
+@pytest.mark.parametrize("statement", ["std::cout << x;", "int cinema = 1;", "std::string stdin_name;", "sscanf_s();"])
+def test_does_not_read_stdin(statement):
+    assert not reads_stdin(statement)
@@ -0,0 +1,100 @@
+# tests/test_history.py
+
+import threading
+
+import pytest
+
+from creppl.io.history import History
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history")
+
+
+def preloaded(path):
+    history = History(path)
+    history.preload()
+    for thread in threading.enumerate():
+        if thread.name == "creppl-history":
+            thread.join()
+    return history
+
+
+def test_entries_survive_a_restart(path):
+    history = History(path)
+    for entry in ["int x = 1;", "x++;", "std::cout << x;"]:
+        history.add(entry)
+    reopened = History(path)
+    assert reopened.size() == 3
+    assert [reopened.get(position) for position in range(3)] == ["int x = 1;", "x++;", "std::cout << x;"]
+
+
+def test_multiline_entries_and_backslashes_are_escaped(path):
+    entries = ["for (int i = 0; i < 3; ++i) {\n    std::cout << i;\n}", 'puts("a\\nb");', "char c = '\\\\';"]
+    history = History(path)
+    for entry in entries:
+        history.add(entry)
+    with open(path) as file:
+        assert len(file.readlines()) == 3
+    reopened = History(path)
+    assert [reopened.get(position) for position in range(3)] == entries
+
+
+def test_empty_and_consecutive_duplicates_are_dropped(path):
+    history = History(path)
+    for entry in ["x++;", "x++;", "", "y++;", "x++;"]:
+        history.add(entry)
+    assert [history.get(position) for position in range(history.size())] == ["x++;", "y++;", "x++;"]
+    assert History(path).size() == 3
+
+
+def test_get_out_of_range(path):
+    history = History(path)
+    history.add("x++;")
+    assert history.get(-1) == ""
+    assert history.get(1) == ""
+
+
+def test_search_without_the_file(path):
+    history = History(path)
+    assert history.size() == 0
+    assert history.search("int", 0) == -1
+
+
+@pytest.mark.parametrize("preload", [False, True])
+def test_search(path, preload):
+    writer = History(path)
+    entries = ["int x = 1;", "std::vector<int> v;", "x++;", "v.push_back(x);", "int y = x;", "v.size();"]
+    for entry in entries:
+        writer.add(entry)
+    history = preloaded(path) if preload else History(path)
+    assert history.search("int", 6) == 4
+    assert history.search("int", 4) == 1
+    assert history.search("int", 1) == 0
+    assert history.search("int", 0) == -1
+    assert history.search("x", 6) == 4
+    assert history.search("push_back", 6) == 3
+    assert history.search("missing", 6) == -1
+    assert history.search("int", 100) == 4
+
+
+def test_search_finds_entries_added_after_preload(path):
+    writer = History(path)
+    for entry in ["int x = 1;", "x++;"]:
+        writer.add(entry)
+    history = preloaded(path)
+    history.add("int y = 2;")
+    assert history.search("int", 3) == 2
+    assert history.search("int", 2) == 0
+    assert history.search("x++", 3) == 1
+
+
+def test_restore_skips_entries_already_in_history(path):
+    writer = History(path)
+    for entry in ["int x = 1;", "x++;"]:
+        writer.add(entry)
+    history = History(path)
+    history.restore(["int x = 1;", "", "int y = x;", "int y = x;"])
+    assert [history.get(position) for position in range(history.size())] == ["int x = 1;", "x++;", "int y = x;"]
+    assert History(path).size() == 2
@@ -0,0 +1,43 @@
+# tests/test_output.py
+
+import re
+
+from creppl.io.output import OutputTracker
+
+
+def plain(text: str):
+    return re.sub(r"\033\[[0-9;]*m", "", text)
+
+
+def test_only_the_new_suffix_is_shown():
+    tracker = OutputTracker()
+    assert tracker.render("1\n") == "1\n"
+    assert tracker.render("1\n2\n") == "2\n"
+    assert tracker.render("1\n2\n") == ""
+    assert tracker.last == "1\n2\n"
+
+
+def test_a_partial_last_line_is_shown_in_full():
+    tracker = OutputTracker()
+    tracker.render("a\nsum = ")
+    assert tracker.render("a\nsum = 3\n") == "sum = 3\n"
+
+
+def test_a_changed_line_is_shown_as_a_diff():
+    tracker = OutputTracker()
+    tracker.render("".join(f"line {i}\n" for i in range(10)))
+    shown = plain(tracker.render("".join(f"line {i}\n" if i != 4 else "changed\n" for i in range(10))))
+    assert shown.split("\n")[1:] == ["@@ line 5 @@", "- line 4", "+ changed", ""]
+    assert "$out" in shown.split("\n")[0]
+
+
+def test_the_whole_output_is_shown_if_the_diff_is_longer():
+    tracker = OutputTracker()
+    tracker.render("a\nb\n")
+    assert tracker.render("c\nd\n") == "c\nd\n\n"
+
+
+def test_full_mode_shows_every_run():
+    tracker = OutputTracker("full")
+    assert tracker.render("1\n") == "1\n\n"
+    assert tracker.render("1\n") == "1\n\n"
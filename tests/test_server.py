@@ -0,0 +1,80 @@
+# tests/test_server.py
+
+import shutil
+import uuid
+
+import pytest
+
+from creppl.io import COMPILER
+from creppl.server.client import Client, ClientError
+from creppl.server.rpc import INVALID_PARAMS, METHOD_NOT_FOUND
+
+
+@pytest.fixture
+def client():
+    client = Client()
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def session(client):
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    client.call("session.open", name=name)
+    yield name
+    if name in client.call("session.list"):
+        client.call("session.close", name=name)
+
+
+def test_open_edit_and_command(client, session):
+    state = client.call("session.state", session=session)
+    assert state["name"] == session
+    assert session in client.call("session.list")
+
+    result = client.call("edit", session=session, statement="int answer = 6 * 7;")
+    assert result["cursor"] == state["cursor"] + 1
+    output = client.call("command", session=session, command="$print")["output"]
+    assert "int answer = 6 * 7;" in output
+
+    client.call("session.close", name=session)
+    assert session not in client.call("session.list")
+
+
+@pytest.mark.skipif(shutil.which(COMPILER) is None, reason="needs the compiler")
+def test_run(client, session):
+    client.call("edit", session=session, statement="std::cout << 6 * 7 << std::endl;")
+    result = client.call("run", session=session)
+    assert result["compile"]["returncode"] == 0
+    assert result["returncode"] == 0
+    assert result["stdout"] == "42\n"
+
+
+def test_unknown_session(client):
+    with pytest.raises(ClientError) as info:
+        client.call("edit", session="no-such-session", statement="int x;")
+    assert info.value.error["code"] == INVALID_PARAMS
+
+
+def test_bad_command(client, session):
+    with pytest.raises(ClientError) as info:
+        client.call("command", session=session, command="$no-such-command")
+    assert info.value.error["code"] == INVALID_PARAMS
+
+
+def test_bad_method_and_params(client, session):
+    with pytest.raises(ClientError) as info:
+        client.call("no.such.method")
+    assert info.value.error["code"] == METHOD_NOT_FOUND
+    with pytest.raises(ClientError) as info:
+        client.call("edit", session=session)
+    assert info.value.error["code"] == INVALID_PARAMS
+
+
+def test_shutdown():
+    client = Client()
+    try:
+        assert client.call("shutdown") is None
+        with pytest.raises(ConnectionError):
+            client.call("session.list")
+    finally:
+        client.close()